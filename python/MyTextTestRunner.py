@@ -1,15 +1,135 @@
 # File: roottest/python/MyTextTestRunner.py
 # Author: Wim Lavrijsen (WLavrijsen@lbl.gov)
 # Created: 03/18/05
-# Last: 03/18/05
+# Last: 10/19/26
 
-import unittest
+"""Text test runner with per-test timing and machine-readable reports.
+
+Reporting is controlled through the environment, so that ctest can enable it
+for all suites at once:
+
+   ROOTTEST_SLOWEST      print a summary of the N slowest tests
+   ROOTTEST_REPORT_DIR   write <suite>.json and <suite>.xml (JUnit) reports
+                         into this directory
+
+The pytest based suites (see common.run_pytest) honour the same variables and
+write reports in the same format.
+"""
+
+import os, sys, time, json, unittest
+from xml.sax.saxutils import quoteattr, escape
+
+__all__ = [ 'MyTextTestRunner', 'write_reports', 'report_settings' ]
+
+if hasattr( time, 'perf_counter' ):
+   walltime, cputime = time.perf_counter, time.process_time
+else:
+   walltime, cputime = time.time, time.clock
+
+
+def report_settings():
+   """Return (slowest, report_dir) as configured in the environment."""
+
+   try:
+      slowest = int( os.environ.get( 'ROOTTEST_SLOWEST', 0 ) )
+   except ValueError:
+      slowest = 0
+   return slowest, os.environ.get( 'ROOTTEST_REPORT_DIR' ) or None
+
+
+def _suite_name():
+   main = sys.modules.get( '__main__' )
+   mainfile = getattr( main, '__file__', None ) or 'unittest'
+   return os.path.splitext( os.path.basename( mainfile ) )[0]
+
+
+def write_reports( records, report_dir, suite = None ):
+   """Write JSON and JUnit reports for the given timing records.
+
+   Each record is a dict with the keys name, classname, description, outcome
+   ('passed', 'failed', 'error' or 'skipped'), wall, cpu (in seconds) and
+   message."""
+
+   suite = suite or _suite_name()
+   if not os.path.isdir( report_dir ):
+      os.makedirs( report_dir )
+
+   summary = {
+      'suite'     : suite,
+      'timestamp' : time.strftime( '%Y-%m-%dT%H:%M:%S' ),
+      'tests'     : len( records ),
+      'wall'      : sum( r[ 'wall' ] for r in records ),
+      'cpu'       : sum( r[ 'cpu' ] for r in records ),
+      'results'   : records,
+   }
+   with open( os.path.join( report_dir, suite + '.json' ), 'w' ) as f:
+      json.dump( summary, f, indent = 1 )
+
+   count = lambda outcome: len( [ r for r in records if r[ 'outcome' ] == outcome ] )
+   with open( os.path.join( report_dir, suite + '.xml' ), 'w' ) as f:
+      f.write( '<?xml version="1.0" encoding="utf-8"?>\n' )
+      f.write( '<testsuite name=%s tests="%d" failures="%d" errors="%d" skipped="%d" time="%.6f" timestamp=%s>\n' % \
+         ( quoteattr( suite ), len( records ), count( 'failed' ), count( 'error' ), count( 'skipped' ),
+           summary[ 'wall' ], quoteattr( summary[ 'timestamp' ] ) ) )
+      for r in records:
+         f.write( '  <testcase classname=%s name=%s time="%.6f">' % \
+            ( quoteattr( r[ 'classname' ] ), quoteattr( r[ 'name' ] ), r[ 'wall' ] ) )
+         f.write( '<properties><property name="cpu" value="%.6f"/></properties>' % r[ 'cpu' ] )
+         if r[ 'outcome' ] == 'failed':
+            f.write( '<failure>%s</failure>' % escape( r[ 'message' ] ) )
+         elif r[ 'outcome' ] == 'error':
+            f.write( '<error>%s</error>' % escape( r[ 'message' ] ) )
+         elif r[ 'outcome' ] == 'skipped':
+            f.write( '<skipped message=%s/>' % quoteattr( r[ 'message' ] ) )
+         f.write( '</testcase>\n' )
+      f.write( '</testsuite>\n' )
 
 
 if hasattr( unittest, 'TextTestResult' ):
    class MyTextTestResult( unittest.TextTestResult ):
+      def __init__( self, *args, **kwds ):
+         super( MyTextTestResult, self ).__init__( *args, **kwds )
+         self.timings = []
+         self._current = None
+
       def getDescription(self, test):
          return test.shortDescription()
+
+      def startTest( self, test ):
+         self._current = { 'outcome' : 'passed', 'message' : '' }
+         self._start = walltime(), cputime()
+         super( MyTextTestResult, self ).startTest( test )
+
+      def stopTest( self, test ):
+         super( MyTextTestResult, self ).stopTest( test )
+         wall, cpu = walltime() - self._start[0], cputime() - self._start[1]
+         cls = test.__class__
+         self._current.update( {
+            'name'        : getattr( test, '_testMethodName', str(test) ),
+            'classname'   : '%s.%s' % ( cls.__module__, cls.__name__ ),
+            'description' : test.shortDescription() or str(test),
+            'wall'        : wall,
+            'cpu'         : cpu } )
+         self.timings.append( self._current )
+         self._current = None
+
+      def _record( self, outcome, message ):
+         # errors in class/module fixtures are reported outside of a test
+         if self._current is not None:
+            self._current[ 'outcome' ] = outcome
+            self._current[ 'message' ] = message
+
+      def addError( self, test, err ):
+         super( MyTextTestResult, self ).addError( test, err )
+         self._record( 'error', self.errors[-1][1] )
+
+      def addFailure( self, test, err ):
+         super( MyTextTestResult, self ).addFailure( test, err )
+         self._record( 'failed', self.failures[-1][1] )
+
+      def addSkip( self, test, reason ):
+         super( MyTextTestResult, self ).addSkip( test, reason )
+         self._record( 'skipped', reason )
 else:
    class MyTextTestResult( object ):
       pass
@@ -18,6 +138,20 @@ else:
 class MyTextTestRunner( unittest.TextTestRunner ):
    resultclass = MyTextTestResult
 
+   def __init__( self, *args, **kwds ):
+      slowest, report_dir = report_settings()
+      self.slowest = kwds.pop( 'slowest', slowest )
+      self.report_dir = kwds.pop( 'report_dir', report_dir )
+      unittest.TextTestRunner.__init__( self, *args, **kwds )
+
+   def printSlowest( self, result ):
+      """Print the slowest tests, by wall time."""
+
+      timings = sorted( result.timings, key = lambda r: r[ 'wall' ], reverse = True )
+      self.stream.writeln( "slowest %d tests (wall / cpu seconds):" % min( self.slowest, len( timings ) ) )
+      for r in timings[ : self.slowest ]:
+         self.stream.writeln( "%9.3f %9.3f  %s" % ( r[ 'wall' ], r[ 'cpu' ], r[ 'description' ] ) )
+
    def run( self, test ):
       """Run the given test case or test suite."""
 
@@ -28,6 +162,14 @@ class MyTextTestRunner( unittest.TextTestRunner ):
       run = result.testsRun
       self.stream.writeln()
 
+      timings = getattr( result, 'timings', None )
+      if timings is not None:
+         if self.slowest:
+            self.printSlowest( result )
+            self.stream.writeln()
+         if self.report_dir:
+            write_reports( timings, self.report_dir )
+
       if not result.wasSuccessful():
          self.stream.write( "FAILED (" )
          failed, errored = map( len, ( result.failures, result.errors ) )
@@ -39,5 +181,5 @@ class MyTextTestRunner( unittest.TextTestRunner ):
          self.stream.writeln( ")" )
       else:
          self.stream.writeln( "OK" )
-   
+
       return result
@@ -0,0 +1,145 @@
+# File: roottest/python/PyROOT_runnertests.py
+
+"""Unit tests of the parallel pytest runner of common.py."""
+
+import sys, os, json, shutil, tempfile, textwrap, unittest
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from common import *
+import common
+
+__all__ = [
+   'Runner1Partition',
+   'Runner2ParallelRun'
+]
+
+
+def nodeids( sizes ):
+   # node ids of test classes of the given sizes, in collection order
+   return [ 'test_x.py::Test%d::test_%d' % ( c, t ) for c, size in enumerate( sizes ) for t in range( size ) ]
+
+
+### _partition of the collected tests over the workers =======================
+class Runner1Partition( MyTestCase ):
+   def assertContiguousSlices( self, ids, chunks ):
+      """Every chunk holds, per class, one contiguous slice of its tests in order"""
+
+      self.assertEqual( sorted( sum( chunks, [] ) ), sorted( ids ) )
+      for chunk in chunks:
+         self.assertTrue( chunk )
+         self.assertEqual( chunk, sorted( chunk, key = ids.index ) )
+         for unit in set( nodeid.rsplit( '::', 1 )[0] for nodeid in chunk ):
+            indices = [ ids.index( nodeid ) for nodeid in chunk if nodeid.startswith( unit + '::' ) ]
+            self.assertEqual( indices, list( range( indices[0], indices[0] + len( indices ) ) ) )
+
+   def test1WholeClasses( self ):
+      """Classes are kept whole when there are enough of them"""
+
+      ids = nodeids( [ 3, 1, 4, 2, 5 ] )
+      chunks = common._partition( ids, 2 )
+      self.assertEqual( len( chunks ), 2 )
+      self.assertContiguousSlices( ids, chunks )
+      units = [ set( nodeid.rsplit( '::', 1 )[0] for nodeid in chunk ) for chunk in chunks ]
+      self.assertFalse( units[0] & units[1] )
+      # greedy balancing: 5+2+1 against 4+3
+      self.assertEqual( sorted( len( chunk ) for chunk in chunks ), [ 7, 8 ] )
+
+   def test2LargeClassSliced( self ):
+      """A large class is cut into contiguous slices, one per worker"""
+
+      ids = nodeids( [ 7, 1 ] )
+      chunks = common._partition( ids, 4 )
+      self.assertEqual( len( chunks ), 4 )
+      self.assertContiguousSlices( ids, chunks )
+      # each slice of Test0 goes to its own worker, which runs setup_class once
+      slices = [ [ n for n in chunk if '::Test0::' in n ] for chunk in chunks ]
+      self.assertEqual( sorted( len( s ) for s in slices ), [ 0, 2, 2, 3 ] )
+
+   def test3FewerTestsThanWorkers( self ):
+      """No empty chunks when there are fewer tests than workers"""
+
+      ids = nodeids( [ 2, 1 ] )
+      chunks = common._partition( ids, 8 )
+      self.assertEqual( len( chunks ), 3 )
+      self.assertContiguousSlices( ids, chunks )
+
+   def test4ModuleLevelTests( self ):
+      """Module-level test functions form a unit of their file"""
+
+      ids = [ 'test_x.py::test_%d' % i for i in range( 4 ) ]
+      chunks = common._partition( ids, 2 )
+      self.assertEqual( chunks, [ ids[:2], ids[2:] ] )
+
+
+### _run_pytest_parallel and its merged timing report ========================
+SUITE = '''
+import os
+
+def log( what ):
+   with open( os.path.join( os.path.dirname( __file__ ), 'setup.log' ), 'a' ) as f:
+      f.write( '%%s %%d\\n' %% ( what, os.getpid() ) )
+
+class TestBig:
+   @classmethod
+   def setup_class( cls ):
+      log( 'TestBig' )
+%s
+class TestSmall:
+   @classmethod
+   def setup_class( cls ):
+      log( 'TestSmall' )
+
+   def test_fails( self ):
+      assert False
+'''
+
+class Runner2ParallelRun( MyTestCase ):
+   def setUp( self ):
+      self.tmpdir = tempfile.mkdtemp( prefix = 'roottest_runnertests_' )
+      tests = ''.join( '\n   def test_%d( self ):\n      pass\n' % i for i in range( 6 ) )
+      self.testfile = os.path.join( self.tmpdir, 'test_suite.py' )
+      with open( self.testfile, 'w' ) as f:
+         f.write( textwrap.dedent( SUITE % tests ) )
+
+   def tearDown( self ):
+      shutil.rmtree( self.tmpdir, ignore_errors = True )
+
+   def test1MergedReport( self ):
+      """Workers run setup_class once per slice and their reports are merged"""
+
+      report_dir = os.path.join( self.tmpdir, 'reports' )
+      args = [ '--color=no', '-p', 'no:cacheprovider', '--rootdir', self.tmpdir, self.testfile ]
+      result = common._run_pytest_parallel( args, 3, report_dir, 'suite' )
+      self.assertNotEqual( result, 0 )
+
+      with open( os.path.join( self.tmpdir, 'setup.log' ) ) as f:
+         setups = [ line.split() for line in f if line.strip() ]
+      # TestBig is cut into two slices, each on its own worker
+      big = [ pid for name, pid in setups if name == 'TestBig' ]
+      self.assertEqual( len( big ), 2 )
+      self.assertEqual( len( set( big ) ), 2 )
+      self.assertEqual( [ name for name, _ in setups ].count( 'TestSmall' ), 1 )
+
+      with open( os.path.join( report_dir, 'suite.json' ) ) as f:
+         report = json.load( f )
+      self.assertEqual( report[ 'suite' ], 'suite' )
+      self.assertEqual( report[ 'tests' ], 7 )
+      outcomes = dict( ( r[ 'name' ], r[ 'outcome' ] ) for r in report[ 'results' ] )
+      self.assertEqual( outcomes.pop( 'test_fails' ), 'failed' )
+      self.assertEqual( sorted( outcomes ), [ 'test_%d' % i for i in range( 6 ) ] )
+      self.assertEqual( set( outcomes.values() ), set( [ 'passed' ] ) )
+      self.assertAlmostEqual( report[ 'wall' ], sum( r[ 'wall' ] for r in report[ 'results' ] ) )
+      self.assertTrue( os.path.exists( os.path.join( report_dir, 'suite.xml' ) ) )
+
+
+## actual test run
+if __name__ == '__main__':
+   from MyTextTestRunner import MyTextTestRunner
+
+   loader = unittest.TestLoader()
+   testSuite = loader.loadTestsFromModule( sys.modules[ __name__ ] )
+
+   runner = MyTextTestRunner( verbosity = 2 )
+   result = not runner.run( testSuite ).wasSuccessful()
+
+   sys.exit( result )
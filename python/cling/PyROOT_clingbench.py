@@ -0,0 +1,240 @@
+# File: roottest/python/cling/PyROOT_clingbench.py
+
+"""Interpreter (JIT) latency benchmark for PyROOT.
+
+Times, for a set of code snippets modelled on the cling/template,
+cling/function and cling/stl tests and on the declarations of the DistRDF
+DefinePerSample tests:
+
+ * declare:     gInterpreter.Declare of the snippet
+ * processline: gInterpreter.ProcessLine of a statement using it
+ * instantiate: ProcessLine of a statement that instantiates new templates
+ * firstcall:   first call from Python (lookup + wrapper generation)
+ * warmcall:    the same call once more
+
+Every repetition declares the snippet in a fresh namespace, so that each one
+pays for parsing and code generation. Medians are compared with the stored
+baseline (PyROOT_clingbench.baseline.json, refreshed with
+ROOTTEST_UPDATE_BASELINES=1) and appended to the performance history.
+"""
+
+import argparse
+import ctypes
+import os
+import string
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import ROOT
+
+from perfcommon import append_history, check_baseline, format_table, summarize
+
+BASELINE = os.path.splitext(os.path.abspath(__file__))[0] + '.baseline.json'
+
+# Headers needed by the snippets, declared once before any measurement
+PRELUDE = '''
+#include <iostream>
+#include <map>
+#include <string>
+#include <utility>
+#include <vector>
+#include "ROOT/RDF/RSampleInfo.hxx"
+'''
+
+SNIPPETS = [
+    {
+        # cling/template/usingtemplate.C
+        'name': 'template/using',
+        'declare': '''
+namespace $ns {
+namespace space { template <class T> class X { public: T fVal{}; T Get() const { return fVal; } }; }
+space::X<int> xi;
+using namespace space;
+X<double> xd;
+class MyClass { public: X<float> xd; };
+namespace other { template <class T> class Y { public: T Twice(T t) const { return 2 * t; } }; }
+namespace application {
+   using namespace other;
+   class MyClass { public: Y<float> xd; };
+}
+}''',
+        'processline': '$ns::application::MyClass().xd.Twice(1.f);',
+        'instantiate': '{ $ns::space::X<$ns::MyClass> a; $ns::other::Y<long> b; b.Twice(a.Get().xd.Get()); }',
+        'call': lambda ROOT, ns: ns.application.MyClass().xd.Twice(1.),
+    },
+    {
+        # cling/template/Singleton.h
+        'name': 'template/singleton',
+        'declare': '''
+namespace $ns {
+template <class T>
+class Singleton {
+   static Singleton<T> *instance;
+   Singleton() {}
+public:
+   int DoIt(bool output) { if (output) std::cout << "Singleton::DoIt" << std::endl; return sizeof(T); }
+   static Singleton &Instance() { if (!instance) instance = new Singleton<T>(); return *instance; }
+};
+template <class T> Singleton<T> *Singleton<T>::instance = 0;
+}''',
+        'processline': '$ns::Singleton<int>::Instance().DoIt(false);',
+        'instantiate': '$ns::Singleton<std::vector<std::pair<int, double>>>::Instance().DoIt(false);',
+        'call': lambda ROOT, ns: ns.Singleton['double'].Instance().DoIt(False),
+    },
+    {
+        # cling/function/Params.h
+        'name': 'function/defaultargs',
+        'declare': '''
+namespace $ns {
+int gCountingCalls = 0;
+class Base {
+public:
+   Base(const char *mode = "") : fMode(mode) {}
+   virtual ~Base() {}
+   virtual int FunctionX(int b = 0, int c = 5) { return b + c; }
+   static int GetCountingCalls() { return ++fgCountingCalls; }
+   virtual int FunctionY(int arg0 = ++gCountingCalls, float arg1 = Base::GetCountingCalls()) { return arg0 + (int)arg1; }
+   const char *fMode;
+   static int fgCountingCalls;
+};
+int Base::fgCountingCalls = 0;
+class Derived : public Base {
+public:
+   Derived(const char *mode = "") : Base(mode) {}
+   int FunctionX(int b = 1, int c = 6) override { return b * c; }
+   int FunctionY(int arg0 = ++gCountingCalls, float arg1 = Base::GetCountingCalls()) override { return arg0 - (int)arg1; }
+};
+}''',
+        'processline': '{ $ns::Derived d("pl"); d.FunctionX(); d.FunctionY(); }',
+        'instantiate': '{ std::vector<$ns::Derived> v(3); v[0].FunctionX(); }',
+        'call': lambda ROOT, ns: ns.Derived().FunctionX(),
+    },
+    {
+        # cling/stl/map/MyClass.h
+        'name': 'stl/map',
+        'declare': '''
+namespace $ns {
+class MyClass {
+public:
+   MyClass() {}
+   virtual ~MyClass() {}
+   std::map<std::string, double> &Param() { return fParam; }
+private:
+   std::map<std::string, double> fParam;
+};
+}''',
+        'processline': '{ $ns::MyClass m; m.Param()["x"] = 1.; }',
+        'instantiate': '{ std::map<std::string, std::vector<$ns::MyClass>> m; m["a"].emplace_back(); }',
+        'call': lambda ROOT, ns: ns.MyClass().Param().size(),
+    },
+    {
+        # cling/stl/vector/t01.C
+        'name': 'stl/vector',
+        'declare': '''
+namespace $ns {
+struct Masked { std::vector<float> *fMask; };
+std::vector<float> *mask(std::vector<float> &vec, float val) {
+   auto result = new std::vector<float>(vec.size());
+   for (std::vector<float>::size_type i = 0; i < vec.size(); ++i)
+      (*result)[i] = vec[i] < val ? 1 : 0;
+   return result;
+}
+}''',
+        'processline': '{ std::vector<float> v{1., 2., 3.}; delete $ns::mask(v, 2.); }',
+        'instantiate': '{ std::vector<float> v(10); std::vector<$ns::Masked> m{{$ns::mask(v, 1.f)}}; delete m[0].fMask; }',
+        'call': lambda ROOT, ns: ns.mask(ROOT.std.vector['float']([1., 2., 3.]), 2.).size(),
+    },
+    {
+        # python/distrdf/*/check_definepersample.py
+        'name': 'rdf/definepersample',
+        'declare': '''
+namespace $ns {
+float sample1_weight() { return 1.0f; }
+float sample2_weight() { return 2.0f; }
+float sample3_weight() { return 3.0f; }
+float samples_weights(unsigned int slot, const ROOT::RDF::RSampleInfo &id) {
+   if (id.Contains("sample1")) return sample1_weight();
+   else if (id.Contains("sample2")) return sample2_weight();
+   else if (id.Contains("sample3")) return sample3_weight();
+   return -999.0f;
+}
+std::string samples_names(unsigned int slot, const ROOT::RDF::RSampleInfo &id) { return id.AsString(); }
+}''',
+        'processline': '$ns::sample2_weight();',
+        'instantiate': None,
+        'call': lambda ROOT, ns: ns.sample3_weight(),
+    },
+]
+
+STEPS = ('declare', 'processline', 'instantiate', 'firstcall', 'warmcall')
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def run_snippet(snippet, rep):
+    """Run all steps of one snippet in the namespace of repetition rep."""
+    ns = f'roottest_clingbench_{rep}'
+    code = {key: string.Template(snippet[key]).substitute(ns=ns)
+            for key in ('declare', 'processline', 'instantiate') if snippet[key]}
+    times = {}
+
+    times['declare'], ok = timed(ROOT.gInterpreter.Declare, code['declare'])
+    if not ok:
+        raise RuntimeError(f"Declaration of snippet {snippet['name']} failed")
+    for step in ('processline', 'instantiate'):
+        if step in code:
+            error = ctypes.c_int(0)
+            times[step], _ = timed(ROOT.gInterpreter.ProcessLine, code[step], error)
+            if error.value != ROOT.TInterpreter.kNoError:
+                raise RuntimeError(f"{step} of snippet {snippet['name']} failed with error code {error.value}")
+
+    pyns = getattr(ROOT, ns)
+    times['firstcall'], _ = timed(snippet['call'], ROOT, pyns)
+    times['warmcall'], _ = timed(snippet['call'], ROOT, pyns)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=10, help='repetitions per snippet')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='relative tolerance with respect to the baseline')
+    args = parser.parse_args()
+
+    ROOT.gROOT.SetBatch(True)
+    ROOT.gInterpreter.Declare(PRELUDE)
+
+    rows, metrics = [], {}
+    for snippet in SNIPPETS:
+        samples = {step: [] for step in STEPS}
+        for rep in range(args.repeat):
+            for step, t in run_snippet(snippet, f"{snippet['name'].replace('/', '_')}_{rep}").items():
+                samples[step].append(t)
+        row = {'name': snippet['name']}
+        for step in STEPS:
+            if samples[step]:
+                row[step] = summarize(samples[step])['median'] * 1e3
+                metrics[f"{snippet['name']}.{step}"] = row[step]
+        rows.append(row)
+
+    for step in STEPS:
+        metrics[f'total.{step}'] = sum(row.get(step, 0.) for row in rows)
+    rows.append(dict(name='total', **{step: metrics[f'total.{step}'] for step in STEPS}))
+
+    print(format_table(rows, [('name', 'snippet')] + [(step, f'{step} [ms]', '{:.2f}') for step in STEPS],
+                       title=f'Median interpreter latency over {args.repeat} repetitions'))
+
+    append_history('pyroot_clingbench', metrics, root=ROOT.gROOT.GetVersion())
+    regressions = check_baseline(metrics, BASELINE, args.tolerance)
+    for regression in regressions:
+        print(f'JIT latency regression: {regression}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
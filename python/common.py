@@ -1,11 +1,11 @@
 # File: roottest/python/common.py
 # Author: Wim Lavrijsen (LBNL, WLavrijsen@lbl.gov)
 # Created: 09/24/10
-# Last: 04/04/14
+# Last: 10/19/26
 
-__all__ = [ 'pylong', 'maxvalue', 'MyTestCase', 'run_pytest', 'FIXCLING', 'check_cppyy_backend' ]
+__all__ = [ 'pylong', 'maxvalue', 'MyTestCase', 'run_pytest', 'pytest_workers', 'FIXCLING', 'check_cppyy_backend' ]
 
-import os, sys, unittest, warnings
+import os, sys, json, shutil, subprocess, tempfile, unittest, warnings
 import pytest
 
 
@@ -35,15 +35,178 @@ if 'FIXCLING' in os.environ:
    FIXCLING = os.environ['FIXCLING'] == 'yes'
 
 
+class _TimingPlugin(object):
+    # Collects per-test wall and cpu timings in the record format of
+    # MyTextTestRunner.write_reports, so that pytest and unittest based
+    # suites produce the same reports.
+    def __init__(self):
+        self.records = []
+        self._cpu = {}
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item):
+        from MyTextTestRunner import cputime
+        start = cputime()
+        yield
+        self._cpu[item.nodeid] = cputime() - start
+
+    def pytest_runtest_logreport(self, report):
+        if report.when != 'call' and not (report.when == 'setup' and not report.passed):
+            return
+        if report.passed:
+            outcome, message = 'passed', ''
+        elif report.skipped:
+            outcome = 'skipped'
+            message = report.longrepr[2] if isinstance(report.longrepr, tuple) else str(report.longrepr)
+        else:
+            outcome = report.when == 'call' and 'failed' or 'error'
+            message = str(report.longrepr)
+        classname, _, name = report.nodeid.rpartition('::')
+        self.records.append({
+            'name'        : name,
+            'classname'   : classname.replace('::', '.'),
+            'description' : report.nodeid,
+            'outcome'     : outcome,
+            'wall'        : report.duration,
+            'cpu'         : self._cpu.pop(report.nodeid, 0.),
+            'message'     : message })
+
+
+class _CollectPlugin(object):
+    # Records the node ids of the collected tests, in execution order.
+    def __init__(self):
+        self.nodeids = []
+
+    def pytest_collection_modifyitems(self, items):
+        # use absolute paths, the workers might see a different rootdir
+        self.nodeids = [str(item.fspath) + '::' + item.nodeid.split('::', 1)[1]
+                        for item in items]
+
+
+def pytest_workers():
+    # number of worker processes requested for run_pytest (1: run serially)
+    try:
+        return max(1, int(os.environ.get('ROOTTEST_PYTEST_WORKERS', 1)))
+    except ValueError:
+        return 1
+
+
+def _partition(nodeids, nworkers):
+    # Split the tests in at most nworkers chunks. Test classes are kept whole
+    # as long as there are enough of them to keep all workers busy; otherwise
+    # the biggest classes are cut in contiguous slices. Either way, each worker
+    # runs the tests of a class in their original order and executes the
+    # class-level setup (setup_class, setUpClass) exactly once.
+    classes = []
+    for nodeid in nodeids:
+        unit = nodeid.rsplit('::', 1)[0]
+        if not classes or classes[-1][0] != unit:
+            classes.append((unit, []))
+        classes[-1][1].append(nodeid)
+    units = [tests for _, tests in classes]
+    while len(units) < nworkers:
+        biggest = max(units, key=len)
+        if len(biggest) < 2:
+            break
+        i = units.index(biggest)
+        half = (len(biggest) + 1) // 2
+        units[i:i+1] = [biggest[:half], biggest[half:]]
+
+    # greedy balancing on number of tests, biggest units first
+    chunks = [[] for _ in range(min(nworkers, len(units)))]
+    for unit in sorted(units, key=len, reverse=True):
+        min(chunks, key=len).extend(unit)
+    # restore collection order within each chunk
+    order = dict((nodeid, i) for i, nodeid in enumerate(nodeids))
+    return [sorted(chunk, key=order.get) for chunk in chunks]
+
+
+def _run_pytest_main(args, report_dir=None, suite=None):
+    # single-process run, with optional timing reports
+    from MyTextTestRunner import report_settings, write_reports
+    slowest, _ = report_settings()
+    if slowest:
+        args = args + ['--durations=%d' % slowest]
+    plugins = []
+    if report_dir:
+        plugins.append(_TimingPlugin())
+    result = pytest.main(args, plugins=plugins)
+    if report_dir:
+        write_reports(plugins[0].records, report_dir, suite)
+    return result
+
+
+def _run_worker(argv):
+    # entry point of the worker processes started by _run_pytest_parallel
+    report_dir, suite = argv[0] or None, argv[1]
+    return _run_pytest_main(['--color=no', '-p', 'no:cacheprovider'] + argv[2:], report_dir, suite)
+
+
+def _run_pytest_parallel(args, nworkers, report_dir, suite):
+    # Collect the tests in this process, then distribute them over nworkers
+    # fresh python processes, each with its own ROOT interpreter.
+    collector = _CollectPlugin()
+    result = pytest.main(args + ['--collect-only', '-q'], plugins=[collector])
+    if result != 0 or not collector.nodeids:
+        return result
+    chunks = _partition(collector.nodeids, nworkers)
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [os.path.dirname(os.path.abspath(__file__))] + [p for p in [env.get('PYTHONPATH')] if p])
+    tmpdir = tempfile.mkdtemp(prefix='roottest_pytest_')
+    workers = []
+    try:
+        for i, chunk in enumerate(chunks):
+            output = open(os.path.join(tmpdir, 'worker%d.log' % i), 'w+')
+            cmd = [sys.executable, '-c', 'import sys, common; sys.exit(common._run_worker(sys.argv[1:]))',
+                   report_dir and tmpdir or '', 'worker%d' % i] + chunk
+            proc = subprocess.Popen(cmd, stdout=output, stderr=subprocess.STDOUT, env=env)
+            workers.append((proc, output, len(chunk)))
+
+        result = 0
+        records = []
+        for i, (proc, output, ntests) in enumerate(workers):
+            status = proc.wait()
+            output.seek(0)
+            sys.stdout.write('=== worker %d: %d tests, exit code %d ===\n' % (i, ntests, status))
+            sys.stdout.write(output.read())
+            output.close()
+            result = result or status
+            report = os.path.join(tmpdir, 'worker%d.json' % i)
+            if report_dir and os.path.exists(report):
+                with open(report) as f:
+                    records += json.load(f)['results']
+        sys.stdout.flush()
+    finally:
+        for proc, output, _ in workers:
+            if proc.poll() is None:
+                proc.kill()
+            output.close()
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    if report_dir:
+        from MyTextTestRunner import write_reports
+        write_reports(records, report_dir, suite)
+    return result
+
+
 def run_pytest(test_file=None):
     # file to run, if any (search used otherwise)
     if '-i' in sys.argv:
-        args = filter(lambda x: not x in (test_file, '-i'), sys.argv)
+        args = list(filter(lambda x: not x in (test_file, '-i'), sys.argv))
     else:
         args = ['--color=no']
     if test_file: args += [test_file]
-    # actual test run
-    return pytest.main(args)
+    # timing summary and reports, as for MyTextTestRunner
+    from MyTextTestRunner import report_settings
+    _, report_dir = report_settings()
+    suite = test_file and os.path.splitext(os.path.basename(test_file))[0] or None
+    # actual test run, serial or with ROOTTEST_PYTEST_WORKERS processes
+    nworkers = pytest_workers()
+    if nworkers > 1 and not '-i' in sys.argv:
+        return _run_pytest_parallel(args, nworkers, report_dir, suite)
+    return _run_pytest_main(args, report_dir, suite)
 
 def check_cppyy_backend():
     # Helper function to check if CPPYY_BACKEND_LIBRARY
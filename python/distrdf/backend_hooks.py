@@ -0,0 +1,78 @@
+"""
+Helpers shared by the modules that hook into the DistRDF backends.
+
+ * pickle_by_value(module): make cloudpickle, and the copy of it shipped with
+   pyspark, send the functions of module (and of this module, which they
+   may call on the workers) by value, as the workers do not necessarily have
+   the python/distrdf directory on their path.
+ * backend_classes(): the DistRDF backend classes that can be imported.
+ * process_and_merge(replacement): within the block, the ProcessAndMerge
+   method of these classes calls replacement(original, backend, ranges,
+   mapper, reducer), original being the method replaced.
+ * append_record(directory, prefix, record) and read_records(directory,
+   prefix): the records the worker processes append to a
+   <prefix>-<pid>.jsonl file of a directory shared with the client.
+"""
+import contextlib
+import importlib
+import json
+import os
+import sys
+
+
+def pickle_by_value(module):
+    """Register module, and this module, to be pickled by value."""
+    for name in ("cloudpickle", "pyspark.cloudpickle"):
+        with contextlib.suppress(ImportError, AttributeError):
+            pickler = importlib.import_module(name)
+            pickler.register_pickle_by_value(module)
+            pickler.register_pickle_by_value(sys.modules[__name__])
+
+
+def backend_classes():
+    classes = []
+    try:
+        from DistRDF.Backends.Dask.Backend import DaskBackend
+        classes.append(DaskBackend)
+    except ImportError:
+        pass
+    try:
+        from DistRDF.Backends.Spark.Backend import SparkBackend
+        classes.append(SparkBackend)
+    except ImportError:
+        pass
+    return classes
+
+
+@contextlib.contextmanager
+def process_and_merge(replacement):
+    """Replace the ProcessAndMerge method of the backends within the block, see the module documentation."""
+    originals = {}
+    for cls in backend_classes():
+        original = originals[cls] = cls.ProcessAndMerge
+
+        def ProcessAndMerge(self, ranges, mapper, reducer, original=original):
+            return replacement(original, self, ranges, mapper, reducer)
+
+        cls.ProcessAndMerge = ProcessAndMerge
+    try:
+        yield
+    finally:
+        for cls, original in originals.items():
+            cls.ProcessAndMerge = original
+
+
+def append_record(directory, prefix, record):
+    """(Worker) append record to the file of this process."""
+    with open(os.path.join(directory, f"{prefix}-{os.getpid()}.jsonl"), "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def read_records(directory, prefix):
+    """The records appended by all the processes, file by file."""
+    records = []
+    for name in sorted(os.listdir(directory)):
+        if name.startswith(f"{prefix}-") and name.endswith(".jsonl"):
+            with open(os.path.join(directory, name)) as f:
+                records += [json.loads(line) for line in f if line.strip()]
+    return records
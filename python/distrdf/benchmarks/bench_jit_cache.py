@@ -0,0 +1,135 @@
+"""
+Cost of jitting DistRDF string expressions in every task, and hit rate of
+the worker-side cache of python/distrdf/jit_cache.py.
+
+Runs --calls times a graph of --expressions Define expressions on Lorentz
+vectors, a Filter and a histogram per defined column, over --partitions
+partitions on a fresh local cluster for each mode:
+
+ * plain:  the expressions are given to Define and Filter as strings, and
+           jitted by every task;
+ * cached: the expressions go through a JitCache, and every worker process
+           declares them once.
+
+For each mode it reports the time per task of the first call (cold workers)
+and the median of the following ones, and for the cached mode the hit rate of
+the cache: the fraction of the functions needed by the tasks that a worker
+process had already declared.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import ROOT
+
+import distrdf_bench
+# distrdf_bench puts the python directory on sys.path
+from perfcommon import summarize
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import jit_cache  # noqa: E402
+from jit_cache import JitCache  # noqa: E402
+
+BASELINE = os.path.splitext(os.path.abspath(__file__))[0] + ".baseline.json"
+
+TYPES = {"pt": "double", "eta": "double", "phi": "double"}
+
+
+def expression(k):
+    return (f"ROOT::Math::PtEtaPhiMVector v(pt * {k + 1}, eta, phi, 0.105);"
+            f" ROOT::Math::PtEtaPhiMVector w(pt, -eta, phi + {k}, 0.105);"
+            f" return (v + w).M();")
+
+
+def book(backend, connection, args, cache):
+    """Book the graph of the benchmark, through cache if given. Returns the histograms."""
+    df = distrdf_bench.rdataframe(backend, connection, args.entries, npartitions=args.partitions)
+    df = df.Define("pt", "10. + 50. * gRandom->Rndm()") \
+           .Define("eta", "-2.5 + 5. * gRandom->Rndm()") \
+           .Define("phi", "-3.14 + 6.28 * gRandom->Rndm()")
+    if cache:
+        df = cache.filter(df, "pt > 15. && std::abs(eta) < 2.", ["pt", "eta"], TYPES)
+    else:
+        df = df.Filter("pt > 15. && std::abs(eta) < 2.")
+    histos = []
+    for k in range(args.expressions):
+        if cache:
+            df = cache.define(df, f"m{k}", expression(k), ["pt", "eta", "phi"], TYPES)
+        else:
+            df = df.Define(f"m{k}", expression(k))
+        histos.append(df.Histo1D((f"m{k}", "", 100, 0, 1000), f"m{k}"))
+    return histos
+
+
+def run_calls(backend, mode, args, workdir):
+    """Time the calls of one mode on a fresh cluster, return (times, hit rate)."""
+    times = []
+    cache = JitCache(os.path.join(workdir, f"{backend}-{mode}")) if mode == "cached" else None
+    with distrdf_bench.connect(backend, args.workers) as connection:
+        try:
+            for _ in range(args.calls):
+                start = time.perf_counter()
+                histos = book(backend, connection, args, cache)
+                if cache:
+                    cache.install()
+                histos[0].GetValue()
+                times.append(time.perf_counter() - start)
+        finally:
+            if cache:
+                JitCache.uninstall()
+    if not cache:
+        return times, None
+    compiled = len(jit_cache.events(cache.directory, "compiled.log"))
+    hits = len(jit_cache.events(cache.directory, "hits.log"))
+    return times, hits / (hits + compiled)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--expressions", type=int, default=20, help="number of Define expressions")
+    parser.add_argument("--partitions", type=int, default=100, help="npartitions of the graph")
+    parser.add_argument("--entries", type=int, default=100000, help="entries of the graph")
+    parser.add_argument("--calls", type=int, default=3, help="runs of the graph per mode")
+    parser.add_argument("--workers", type=int, default=2, help="workers of the local cluster")
+    parser.add_argument("--backends", nargs="+", default=distrdf_bench.available_backends(),
+                        choices=distrdf_bench.BACKENDS)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="relative tolerance with respect to the baseline")
+    args = parser.parse_args()
+
+    ROOT.gROOT.SetBatch(True)
+    ROOT.TH1.AddDirectory(False)
+    workdir = tempfile.mkdtemp(prefix="roottest-bench-jit-cache-")
+    rows, metrics = [], {}
+    try:
+        for backend in args.backends:
+            for mode in ("plain", "cached"):
+                times, hit_rate = run_calls(backend, mode, args, workdir)
+                per_task = [t / args.partitions * 1e3 for t in times]
+                row = dict(backend=backend, mode=mode, first=per_task[0],
+                           warm=summarize(per_task[1:])["median"] if len(per_task) > 1 else None,
+                           hit_rate=hit_rate)
+                rows.append(row)
+                metrics[f"{backend}.{mode}.first_ms_per_task"] = row["first"]
+                if row["warm"] is not None:
+                    metrics[f"{backend}.{mode}.warm_ms_per_task"] = row["warm"]
+                if hit_rate is not None:
+                    metrics[f"{backend}.{mode}.hit_rate"] = hit_rate
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    regressions = distrdf_bench.report(
+        "distrdf_jit_cache", rows,
+        [("backend", "backend"), ("mode", "mode"), ("first", "first call [ms/task]", "{:.2f}"),
+         ("warm", "next calls [ms/task]", "{:.2f}"), ("hit_rate", "cache hit rate", "{:.3f}")],
+        metrics, BASELINE, args.tolerance,
+        higher_is_better=[m for m in metrics if m.endswith(".hit_rate")],
+        title=f"{args.expressions} expressions, {args.partitions} partitions on {args.workers} workers",
+        expressions=args.expressions, partitions=args.partitions)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+Overhead of the live visualization of DistRDF results.
+
+With LiveVisualize, the Dask backend merges every partial result as soon as
+its task completes, redraws it and calls the callback of the user. On a fast
+analysis split into many small partitions, this can take longer than the
+analysis itself. This benchmark runs the same graph, a Histo1D of --bins bins
+over --entries entries in --partitions partitions, on a local Dask cluster:
+
+ * plain:   without LiveVisualize, the reference;
+ * live:    with LiveVisualize and a callback fitting the histogram at every
+            update;
+ * live/T:  the same callback, throttled to run at most once every T seconds
+            (--intervals).
+
+For each mode it reports the total runtime and its overhead with respect to
+plain, the number of updates and their rate, the number of callbacks run and
+their total time, and the peak increase of the resident memory of the client.
+The benchmark fails if a throttled callback runs more often than its interval
+allows, if the runtime of a live mode, minus the time spent in its callbacks,
+exceeds the one of plain by more than --max-overhead percent, or if a mode
+gives a different histogram.
+
+LiveVisualize is not supported by the Spark backend.
+"""
+import argparse
+import functools
+import os
+import sys
+import time
+
+import ROOT
+
+from DistRDF import LiveVisualize
+
+import distrdf_bench
+# distrdf_bench puts the python directory on sys.path
+from perfcommon import RSSSampler, summarize
+
+BASELINE = os.path.splitext(os.path.abspath(__file__))[0] + ".baseline.json"
+
+
+class Throttled:
+    """
+    State of a LiveVisualize callback running callback at most once every
+    interval seconds: the updates it receives and the callbacks it runs.
+    """
+
+    def __init__(self, callback, interval):
+        self.callback = callback
+        self.interval = interval
+        self.updates = 0
+        self.calls = 0
+        self.seconds = 0.
+        self.first = self.last = None
+        self._next = 0.
+
+    def update(self, obj):
+        now = time.perf_counter()
+        self.updates += 1
+        self.first = self.first or now
+        self.last = now
+        if now < self._next:
+            return
+        self._next = now + self.interval
+        self.calls += 1
+        self.callback(obj)
+        self.seconds += time.perf_counter() - now
+
+
+def throttled_update(throttled, obj):
+    # LiveVisualize takes functions or partials with one argument left
+    throttled.update(obj)
+
+
+def fit(histo):
+    histo.Fit("gaus", "Q0")
+
+
+def run_once(connection, args, callback=None):
+    """Run the graph once, with LiveVisualize if callback is given. Returns (seconds, RSS increase in MB, entries)."""
+    with RSSSampler() as rss:
+        start = time.perf_counter()
+        df = distrdf_bench.rdataframe("dask", connection, args.entries, npartitions=args.partitions)
+        h = df.Define("x", "gRandom->Gaus()").Histo1D(("h", "", args.bins, -4, 4), "x")
+        if callback is not None:
+            LiveVisualize({h: functools.partial(throttled_update, callback)})
+        entries = h.GetEntries()
+        elapsed = time.perf_counter() - start
+    return elapsed, rss.increase, entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--entries", type=int, default=1000000, help="entries of the dataframe")
+    parser.add_argument("--partitions", type=int, default=200, help="npartitions of the dataframe")
+    parser.add_argument("--bins", type=int, default=1024, help="bins of the histogram")
+    parser.add_argument("--workers", type=int, default=2, help="workers of the local cluster")
+    parser.add_argument("--intervals", type=float, nargs="+", default=[0.1, 0.5],
+                        help="minimum seconds between two callbacks of the throttled modes")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per mode")
+    parser.add_argument("--max-overhead", type=float, default=50.,
+                        help="maximum overhead in percent of LiveVisualize, without the callbacks, with respect to plain")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="relative tolerance with respect to the baseline")
+    args = parser.parse_args()
+
+    ROOT.gROOT.SetBatch(True)
+    ROOT.TH1.AddDirectory(False)
+    modes = [("plain", None), ("live", 0.)] + [(f"live/{interval:g}", interval) for interval in args.intervals]
+    runs = {mode: [] for mode, _ in modes}
+    errors = []
+
+    with distrdf_bench.connect("dask", args.workers) as connection:
+        # Warm-up, the first run pays for the start of the workers and the jitting
+        run_once(connection, args)
+        for _ in range(args.repeat):
+            # Alternate the modes, so that they see the same drifts of the machine
+            for mode, interval in modes:
+                callback = Throttled(fit, interval) if interval is not None else None
+                elapsed, rss, entries = run_once(connection, args, callback)
+                runs[mode].append((elapsed, rss, callback))
+                if entries != args.entries:
+                    errors.append(f"{mode}: {entries} entries instead of {args.entries}")
+                if callback and interval and callback.calls > (callback.last - callback.first) / interval + 1:
+                    errors.append(f"{mode}: {callback.calls} callbacks in {callback.last - callback.first:.2f} s")
+
+    plain = summarize([elapsed for elapsed, _, _ in runs["plain"]])["median"]
+    rows, metrics = [], {}
+    for mode, interval in modes:
+        elapsed = summarize([e for e, _, _ in runs[mode]])["median"]
+        rss = [r for _, r, _ in runs[mode] if r is not None]
+        callbacks = [(e, c) for e, _, c in runs[mode] if c is not None]
+        row = dict(mode=mode, runtime=elapsed, overhead=(elapsed - plain) / plain * 100.,
+                   rss=max(rss) if rss else None)
+        if callbacks:
+            # The rate of each run over its own runtime
+            row.update(updates=summarize([c.updates for _, c in callbacks])["median"],
+                       rate=summarize([c.updates / e for e, c in callbacks])["median"],
+                       calls=summarize([c.calls for _, c in callbacks])["median"],
+                       callback=summarize([c.seconds for _, c in callbacks])["median"])
+            overhead = (elapsed - row["callback"] - plain) / plain * 100.
+            if overhead > args.max_overhead:
+                errors.append(f"{mode}: {overhead:.1f}% slower than plain without the callbacks, "
+                              f"more than {args.max_overhead:g}%")
+        rows.append(row)
+        metrics[f"{mode}.runtime_s"] = elapsed
+        if row["rss"] is not None:
+            metrics[f"{mode}.peak_rss_increase_mb"] = row["rss"]
+
+    regressions = distrdf_bench.report(
+        "distrdf_live_visualize", rows,
+        [("mode", "mode"), ("runtime", "runtime [s]", "{:.3f}"), ("overhead", "overhead [%]", "{:.1f}"),
+         ("updates", "updates"), ("rate", "updates/s", "{:.1f}"), ("calls", "callbacks"),
+         ("callback", "in callbacks [s]", "{:.3f}"), ("rss", "peak RSS increase [MB]", "{:.1f}")],
+        metrics, BASELINE, args.tolerance,
+        title=f"Histo1D of {args.bins} bins, {args.entries} entries in {args.partitions} partitions "
+              f"on {args.workers} workers (medians of {args.repeat} runs)",
+        entries=args.entries, partitions=args.partitions, workers=args.workers)
+
+    for error in errors:
+        print(f"Error: {error}")
+    return 1 if regressions or errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
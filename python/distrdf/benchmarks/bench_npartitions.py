@@ -0,0 +1,137 @@
+"""
+Task balance of the default npartitions and of a cluster-aware policy.
+
+Without npartitions, the DistRDF backends make one partition per core, and
+the ranges are spread evenly over the files. On a skewed dataset, a few large
+files followed by many small ones, the tasks reading the large files run
+much longer than the others. This benchmark runs the analysis of
+check_inv_mass.py on such a dataset (see distrdf_bench.make_dimuon_dataset)
+on a local cluster, with
+
+ * cores:  the default npartitions, the number of cores of the cluster;
+ * policy: the npartitions of python/distrdf/npartitions_policy.py, aiming at
+           tasks of --target-seconds from the sizes of the files and the
+           throughput of a single-process ROOT.RDataFrame on a large file.
+
+For each it reports the number of tasks, the wall time, the median and
+longest task durations and the tail, the time the first idle worker waits for
+the last task (see distrdf_bench.Timeline.tail). The benchmark fails if the
+policy does not reduce the tail, or if the results differ.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import ROOT
+
+import distrdf_bench
+# distrdf_bench puts the python directory on sys.path
+from perfcommon import summarize
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import npartitions_policy  # noqa: E402
+
+BASELINE = os.path.splitext(os.path.abspath(__file__))[0] + ".baseline.json"
+
+
+def throughput(filename):
+    """Compressed bytes per second of the analysis on one file, with a single-process RDataFrame."""
+    nbytes = npartitions_policy.describe(distrdf_bench.DIMUON_TREE, [filename])[0].bytes
+    times = []
+    for _ in range(2):
+        start = time.perf_counter()
+        distrdf_bench.summary(distrdf_bench.book_inv_mass(ROOT.RDataFrame(distrdf_bench.DIMUON_TREE, filename)))
+        times.append(time.perf_counter() - start)
+    return nbytes / min(times)
+
+
+def run_once(backend, connection, filenames, npartitions, workdir):
+    """Run the analysis once, return its measurements and result summary."""
+    kwargs = {"npartitions": npartitions} if npartitions else {}
+    with distrdf_bench.timeline(tempfile.mkdtemp(dir=workdir)) as recorded:
+        start = time.perf_counter()
+        df = distrdf_bench.rdataframe(backend, connection, distrdf_bench.DIMUON_TREE, filenames, **kwargs)
+        summary = distrdf_bench.summary(distrdf_bench.book_inv_mass(df))
+        wall = time.perf_counter() - start
+    durations = [end - begin for _, begin, end in recorded.tasks()]
+    return {"wall": wall, "tasks": len(durations), "median": summarize(durations)["median"],
+            "longest": max(durations), "tail": recorded.tail()}, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--large-files", type=int, default=3, help="number of large files")
+    parser.add_argument("--large-entries", type=int, default=1000000, help="entries of every large file")
+    parser.add_argument("--small-files", type=int, default=200, help="number of small files")
+    parser.add_argument("--small-entries", type=int, default=5000, help="entries of every small file")
+    parser.add_argument("--target-seconds", type=float, default=0.5, help="target duration of the tasks")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1),
+                        help="workers of the local cluster")
+    parser.add_argument("--backends", nargs="+", default=distrdf_bench.available_backends(),
+                        choices=distrdf_bench.BACKENDS)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per configuration")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="relative tolerance with respect to the baseline")
+    args = parser.parse_args()
+
+    ROOT.gROOT.SetBatch(True)
+    filenames = distrdf_bench.make_dimuon_dataset(args.large_entries * args.large_files, args.large_files,
+                                                  prefix="skewed_large") + \
+        distrdf_bench.make_dimuon_dataset(args.small_entries * args.small_files, args.small_files,
+                                          prefix="skewed_small")
+    files = npartitions_policy.describe(distrdf_bench.DIMUON_TREE, filenames)
+    bytes_per_second = throughput(filenames[0])
+    reference = distrdf_bench.summary(
+        distrdf_bench.book_inv_mass(ROOT.RDataFrame(distrdf_bench.DIMUON_TREE, filenames)))
+
+    workdir = tempfile.mkdtemp(prefix="roottest-bench-npartitions-")
+    rows, metrics, errors = [], {}, []
+    try:
+        for backend in args.backends:
+            with distrdf_bench.connect(backend, args.workers) as connection:
+                cores = npartitions_policy.cluster_cores(connection)
+                choices = {"cores": None,
+                           "policy": npartitions_policy.npartitions(files, cores, bytes_per_second,
+                                                                    args.target_seconds)}
+                # Warm-up, the first run pays for the start of the workers and the jitting
+                run_once(backend, connection, filenames, None, workdir)
+                tails = {}
+                for name, npartitions in choices.items():
+                    runs = []
+                    for _ in range(args.repeat):
+                        measured, summary = run_once(backend, connection, filenames, npartitions, workdir)
+                        runs.append(measured)
+                        if not distrdf_bench.same_summary(summary, reference):
+                            errors.append(f"{backend}, {name}: {summary} instead of {reference}")
+                    row = {key: summarize([run[key] for run in runs])["median"] for key in runs[0]}
+                    row.update(backend=backend, npartitions=name)
+                    rows.append(row)
+                    tails[name] = row["tail"]
+                    for key in ("wall", "longest", "tail"):
+                        metrics[f"{backend}.{name}.{key}_s"] = row[key]
+                if tails["policy"] >= tails["cores"]:
+                    errors.append(f"{backend}: the policy does not reduce the tail, "
+                                  f"{tails['policy']:.3f} s instead of {tails['cores']:.3f} s")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    regressions = distrdf_bench.report(
+        "distrdf_npartitions", rows,
+        [("backend", "backend"), ("npartitions", "npartitions"), ("tasks", "tasks"), ("wall", "wall [s]", "{:.3f}"),
+         ("median", "median task [s]", "{:.3f}"), ("longest", "longest task [s]", "{:.3f}"),
+         ("tail", "tail [s]", "{:.3f}")],
+        metrics, BASELINE, args.tolerance,
+        title=f"{args.large_files} files of {args.large_entries} and {args.small_files} files of "
+              f"{args.small_entries} entries, {args.workers} workers, "
+              f"{bytes_per_second / 1e6:.1f} MB/s per core (medians of {args.repeat} runs)",
+        workers=args.workers, target_seconds=args.target_seconds)
+
+    for error in errors:
+        print(f"Error: {error}")
+    return 1 if regressions or errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+"""
+Side-by-side runtime of the DistRDF scenarios on ROOT.RDataFrame, Dask and
+Spark.
+
+The dask and spark test directories check the same scenarios for
+correctness on each backend. This benchmark runs scaled-up versions of them
+(--scenarios) with a single-process ROOT.RDataFrame and on local Dask and
+Spark clusters of --workers workers, and reports for every scenario and
+backend
+
+ * the runtime, median of --repeat runs after a warm-up run;
+ * the number of tasks run by the workers;
+ * the peak increase of the resident memory of the driver.
+
+The results of every backend are compared with those of ROOT.RDataFrame; the
+benchmark fails if they differ or if a runtime regresses with respect to
+bench_parity.baseline.json.
+"""
+import argparse
+import contextlib
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import ROOT
+
+import distrdf_bench
+# distrdf_bench puts the python directory on sys.path
+from perfcommon import RSSSampler, summarize
+
+BASELINE = os.path.splitext(os.path.abspath(__file__))[0] + ".baseline.json"
+
+TREENAME = "Events"
+SAMPLES = ["sample1", "sample2", "sample3"]
+
+
+class Backend:
+    """How a scenario creates dataframes and gets the variations of a result on one backend."""
+
+    def __init__(self, name, connection, npartitions):
+        self.name = name
+        self.connection = connection
+        self.npartitions = npartitions
+        # Objects the dataframes need alive, e.g. chains
+        self.kept = []
+
+    def rdataframe(self, *args):
+        return distrdf_bench.rdataframe(self.name, self.connection, *args, npartitions=self.npartitions)
+
+    def variations_for(self, result):
+        if self.name == "local":
+            return ROOT.RDF.Experimental.VariationsFor(result)
+        import DistRDF
+        return DistRDF.VariationsFor(result)
+
+
+def write_tree(filename, entries, first=0, expression="sin(rdfentry_ + {first}ULL)"):
+    ROOT.RDataFrame(entries).Define("x", expression.format(first=first)).Snapshot(TREENAME, filename, ["x"])
+    return filename
+
+
+def setup(directory, args):
+    """Write the datasets of the scenarios, return their file names by scenario."""
+    per_sample = args.entries // len(SAMPLES)
+    return {
+        "samples": [write_tree(os.path.join(directory, f"{sample}.root"), per_sample, i * per_sample)
+                    for i, sample in enumerate(SAMPLES)],
+        "main": write_tree(os.path.join(directory, "main.root"), args.entries),
+        "friend": write_tree(os.path.join(directory, "friend.root"), args.entries,
+                             expression="cos(rdfentry_ + {first}ULL)"),
+        "dimuon": distrdf_bench.make_dimuon_dataset(args.entries, max(args.workers, 4)),
+    }
+
+
+# Scenarios: book on a Backend and the datasets, return the results by name
+
+def scenario_backend(backend, data, args):
+    df = backend.rdataframe(args.entries).Define("x", "sin(rdfentry_)")
+    return {"count": df.Count(), "mean": df.Mean("x"), "histo": df.Histo1D(("h", "", 100, -1, 1), "x")}
+
+
+def scenario_definepersample(backend, data, args):
+    code = "".join(f'if (rdfsampleinfo_.Contains("{sample}")) return {i + 1}; '
+                   for i, sample in enumerate(SAMPLES)) + "return 0;"
+    df = backend.rdataframe(TREENAME, data["samples"]).DefinePerSample("sampleid", code)
+    return {f"sample{i}": df.Filter(f"sampleid == {i}").Sum("x") for i in (1, 2, 3)}
+
+
+def scenario_friend_trees(backend, data, args):
+    main = ROOT.TChain(TREENAME)
+    main.Add(data["main"])
+    friend = ROOT.TChain(TREENAME)
+    friend.Add(data["friend"])
+    main.AddFriend(friend, "friend")
+    backend.kept += [main, friend]
+    df = backend.rdataframe(main)
+    return {"main": df.Histo1D(("main", "", 100, -1, 1), "x"),
+            "friend": df.Histo1D(("friend", "", 100, -1, 1), "friend.x")}
+
+
+def scenario_histo_write(backend, data, args):
+    df = backend.rdataframe(TREENAME, data["main"])
+    return {"histo": df.Histo1D(("histo", "", 10000, -1, 1), "x")}
+
+
+def scenario_reducer_merge(backend, data, args):
+    df = backend.rdataframe(args.entries).Define("x", "sin(rdfentry_)").Define("y", "cos(rdfentry_)")
+    return {"sum": df.Sum("x"), "max": df.Max("x"), "min": df.Min("y"),
+            "histo2d": df.Histo2D(("h2", "", 256, -1, 1, 256, -1, 1), "x", "y"),
+            "profile": df.Profile1D(("p1", "", 256, -1, 1), "x", "y")}
+
+
+def scenario_variations(backend, data, args):
+    nvariations = 10
+    expression = "ROOT::RVecD{" + ", ".join(f"x * {1. + 0.01 * i}" for i in range(nvariations)) + "}"
+    df = backend.rdataframe(args.entries).Define("x", "sin(rdfentry_)")
+    h = df.Vary("x", expression, nVariations=nvariations).Histo1D(("h", "", 100, -2, 2), "x")
+    return {"variations": (h, backend.variations_for)}
+
+
+def scenario_inv_mass(backend, data, args):
+    return distrdf_bench.book_inv_mass(backend.rdataframe(distrdf_bench.DIMUON_TREE, data["dimuon"]))
+
+
+SCENARIOS = {
+    "backend": scenario_backend,
+    "definepersample": scenario_definepersample,
+    "friend_trees": scenario_friend_trees,
+    "histo_write": scenario_histo_write,
+    "reducer_merge": scenario_reducer_merge,
+    "variations": scenario_variations,
+    "inv_mass": scenario_inv_mass,
+}
+
+
+def summary_of(obj):
+    """Numbers describing a result, to compare backends."""
+    if isinstance(obj, ROOT.TH1):
+        return (obj.GetEntries(), obj.GetMean(), obj.GetStdDev())
+    if isinstance(obj, ROOT.TGraph):
+        return (obj.GetN(), obj.GetMean())
+    return (float(obj),)
+
+
+def evaluate(results, outdir):
+    """Get the values of the results, and write the histograms of histo_write. Returns their summaries."""
+    summaries = {}
+    for name, result in results.items():
+        if isinstance(result, tuple):
+            result, variations_for = result
+            variations = variations_for(result)
+            for key in variations.GetKeys():
+                summaries[f"{name}[{key}]"] = summary_of(variations[str(key)])
+            continue
+        value = result.GetValue()
+        if name == "histo" and outdir:
+            f = ROOT.TFile(os.path.join(outdir, "histo.root"), "recreate")
+            value.Write()
+            f.Close()
+        summaries[name] = summary_of(value)
+    return summaries
+
+
+def same(a, b, rel=1e-6):
+    if a.keys() != b.keys():
+        return False
+    return all(math.isclose(x, y, rel_tol=rel, abs_tol=1e-9) for name in a for x, y in zip(a[name], b[name]))
+
+
+def run_once(backend, scenario, data, args, workdir):
+    """Run one scenario once, return (runtime, tasks, RSS increase in MB, summaries)."""
+    with RSSSampler() as rss, distrdf_bench.timeline(tempfile.mkdtemp(dir=workdir)) as recorded:
+        start = time.perf_counter()
+        results = SCENARIOS[scenario](backend, data, args)
+        summaries = evaluate(results, workdir if scenario == "histo_write" else None)
+        elapsed = time.perf_counter() - start
+    tasks = len(recorded.tasks()) if backend.name != "local" else None
+    return elapsed, tasks, rss.increase, summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--entries", type=int, default=3000000, help="entries of every scenario")
+    parser.add_argument("--workers", type=int, default=2, help="workers of the local clusters")
+    parser.add_argument("--partitions", type=int, default=8, help="npartitions of the distributed dataframes")
+    parser.add_argument("--backends", nargs="+", default=distrdf_bench.available_backends(),
+                        choices=distrdf_bench.BACKENDS)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per scenario and backend")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="relative tolerance with respect to the baseline")
+    args = parser.parse_args()
+
+    ROOT.gROOT.SetBatch(True)
+    ROOT.TH1.AddDirectory(False)
+    workdir = tempfile.mkdtemp(prefix="roottest-bench-parity-")
+    rows = {scenario: dict(scenario=scenario) for scenario in args.scenarios}
+    metrics, reference, mismatches = {}, {}, []
+    try:
+        data = setup(workdir, args)
+        for name in ["local"] + args.backends:
+            connection = distrdf_bench.connect(name, args.workers) if name != "local" else contextlib.nullcontext()
+            with connection as conn:
+                backend = Backend(name, conn, args.partitions)
+                for scenario in args.scenarios:
+                    # Warm-up, pays for the start of the workers and the jitting
+                    run_once(backend, scenario, data, args, workdir)
+                    runs = [run_once(backend, scenario, data, args, workdir) for _ in range(args.repeat)]
+                    elapsed = summarize([run[0] for run in runs])["median"]
+                    rss = [run[2] for run in runs if run[2] is not None]
+                    rows[scenario].update({f"{name}_time": elapsed, f"{name}_tasks": runs[-1][1],
+                                           f"{name}_rss": max(rss) if rss else None})
+                    metrics[f"{scenario}.{name}.runtime_s"] = elapsed
+                    summaries = runs[-1][3]
+                    if name == "local":
+                        reference[scenario] = summaries
+                    elif not same(summaries, reference[scenario]):
+                        mismatches.append(f"{scenario} on {name}: {summaries} instead of {reference[scenario]}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    columns = [("scenario", "scenario"), ("local_time", "local [s]", "{:.3f}"), ("local_rss", "local RSS [MB]", "{:.1f}")]
+    for name in args.backends:
+        columns += [(f"{name}_time", f"{name} [s]", "{:.3f}"), (f"{name}_tasks", f"{name} tasks"),
+                    (f"{name}_rss", f"{name} RSS [MB]", "{:.1f}")]
+    regressions = distrdf_bench.report(
+        "distrdf_parity", list(rows.values()), columns, metrics, BASELINE, args.tolerance,
+        title=f"{args.entries} entries, {args.partitions} partitions on {args.workers} workers "
+              f"(medians of {args.repeat} runs, driver RSS increase)",
+        entries=args.entries, partitions=args.partitions, workers=args.workers)
+
+    for mismatch in mismatches:
+        print(f"Results differ from ROOT.RDataFrame: {mismatch}")
+    return 1 if regressions or mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
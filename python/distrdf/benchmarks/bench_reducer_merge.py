@@ -0,0 +1,177 @@
+"""
+Benchmark of the merge step of the DistRDF reducer.
+
+check_reducer_merge.py checks that the partial results of every action merge
+correctly; this benchmark measures what the merge costs when there are
+thousands of partial results of realistic size, e.g. a 64^3-bin TH3D or a
+4-D THnD per partition.
+
+For every action type, a small pool of partial results is filled with
+ROOT.RDataFrame and pickled, as the workers send them to the reducer. A
+stream of --partials results is then unpickled from that pool and reduced
+
+ * linearly: each partial result is merged into one accumulator, as when the
+   results are gathered and merged one by one;
+ * as a binary tree: partial results of the same depth are merged pairwise,
+   as in the tree reductions of Dask and Spark.
+
+Both reductions merge with the Merge(TCollection*) method of the result type,
+as RMergeableValue does, and only keep the objects the reduction needs alive.
+The table gives the serialized size of a partial and of the final result,
+the time to unpickle a partial and the merge latency per action type.
+"""
+import argparse
+import itertools
+import os
+import pickle
+import sys
+import time
+
+import ROOT
+
+import distrdf_bench
+# distrdf_bench puts the python directory on sys.path
+from perfcommon import summarize
+
+BASELINE = os.path.splitext(os.path.abspath(__file__))[0] + ".baseline.json"
+
+# Action type -> how to book it on a dataframe with columns x, y, z, w
+ACTIONS = {
+    "Histo1D": lambda df: df.Histo1D(("h1", "", 1024, -4, 4), "x"),
+    "Histo2D": lambda df: df.Histo2D(("h2", "", 256, -4, 4, 256, -4, 4), "x", "y"),
+    "Histo3D": lambda df: df.Histo3D(("h3", "", 64, -4, 4, 64, -4, 4, 64, -4, 4), "x", "y", "z"),
+    "HistoND": lambda df: df.HistoND(("hn", "", 4, (20, 20, 20, 20), (-4., -4., -4., -4.), (4., 4., 4., 4.)),
+                                     ("x", "y", "z", "w")),
+    "Profile1D": lambda df: df.Profile1D(("p1", "", 1024, -4, 4), "x", "y"),
+    "Profile2D": lambda df: df.Profile2D(("p2", "", 256, -4, 4, 256, -4, 4), "x", "y", "z"),
+    "Graph": lambda df: df.Graph("x", "y"),
+}
+
+
+def make_payloads(actions, pool, entries):
+    """Fill pool partial results of each action and return them pickled."""
+    payloads = {action: [] for action in actions}
+    for seed in range(pool):
+        ROOT.gRandom.SetSeed(seed + 1)
+        df = ROOT.RDataFrame(entries)
+        for column in ("x", "y", "z", "w"):
+            df = df.Define(column, "gRandom->Gaus()")
+        results = {action: ACTIONS[action](df) for action in actions}
+        for action, result in results.items():
+            payloads[action].append(pickle.dumps(result.GetValue()))
+    return payloads
+
+
+def merge(target, other):
+    objects = ROOT.TList()
+    objects.Add(other)
+    target.Merge(objects)
+    return target
+
+
+class Reduction:
+    """Timing of the unpickling and merging steps of one reduction."""
+
+    def __init__(self):
+        self.unpickle, self.merges = [], []
+
+    def load(self, payload):
+        start = time.perf_counter()
+        obj = pickle.loads(payload)
+        self.unpickle.append(time.perf_counter() - start)
+        return obj
+
+    def merge(self, target, other):
+        start = time.perf_counter()
+        merge(target, other)
+        self.merges.append(time.perf_counter() - start)
+        return target
+
+
+def reduce_linear(payloads, reduction):
+    result = None
+    for payload in payloads:
+        obj = reduction.load(payload)
+        result = obj if result is None else reduction.merge(result, obj)
+    return result
+
+
+def reduce_tree(payloads, reduction):
+    # Binary counter: a result of depth d is merged with the previous result
+    # of the same depth as soon as there is one
+    stack = []
+    for payload in payloads:
+        depth, obj = 0, reduction.load(payload)
+        while stack and stack[-1][0] == depth:
+            obj = reduction.merge(stack.pop()[1], obj)
+            depth += 1
+        stack.append((depth, obj))
+    result = stack.pop()[1]
+    while stack:
+        result = reduction.merge(stack.pop()[1], result)
+    return result
+
+
+STRATEGIES = {"linear": reduce_linear, "tree": reduce_tree}
+
+
+def entries(obj):
+    return obj.GetN() if isinstance(obj, ROOT.TGraph) else obj.GetEntries()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--partials", type=int, default=2000, help="number of partial results to reduce")
+    parser.add_argument("--pool", type=int, default=4, help="number of distinct partial results")
+    parser.add_argument("--entries", type=int, default=1000, help="entries filled in every partial result")
+    parser.add_argument("--actions", nargs="+", default=list(ACTIONS), choices=list(ACTIONS))
+    parser.add_argument("--tolerance", type=float, default=0.3, help="relative tolerance with respect to the baseline")
+    args = parser.parse_args()
+
+    ROOT.gROOT.SetBatch(True)
+    ROOT.TH1.AddDirectory(False)
+    payloads = make_payloads(args.actions, args.pool, args.entries)
+
+    rows, metrics, mismatches = [], {}, []
+    for action in args.actions:
+        pool = payloads[action]
+        merged_entries = {}
+        for strategy, reduce in STRATEGIES.items():
+            reduction = Reduction()
+            stream = itertools.islice(itertools.cycle(pool), args.partials)
+            start = time.perf_counter()
+            result = reduce(stream, reduction)
+            total = time.perf_counter() - start
+            merged_entries[strategy] = entries(result)
+            merges = summarize(reduction.merges)
+            row = dict(action=action, strategy=strategy,
+                       partial_kb=summarize([len(p) for p in pool])["median"] / 1024.,
+                       result_kb=len(pickle.dumps(result)) / 1024.,
+                       unpickle=summarize(reduction.unpickle)["median"] * 1e3,
+                       merge=merges["median"] * 1e3, merge_max=max(reduction.merges, default=0.) * 1e3,
+                       merge_total=sum(reduction.merges), total=total)
+            rows.append(row)
+            metrics[f"{action}.partial_bytes"] = summarize([len(p) for p in pool])["median"]
+            metrics[f"{action}.{strategy}.merge_ms"] = row["merge"]
+            metrics[f"{action}.{strategy}.total_s"] = total
+            del result
+        if len(set(merged_entries.values())) != 1:
+            mismatches.append(f"{action}: {merged_entries}")
+
+    regressions = distrdf_bench.report(
+        "distrdf_reducer_merge", rows,
+        [("action", "action"), ("strategy", "strategy"), ("partial_kb", "partial [kB]", "{:.1f}"),
+         ("result_kb", "result [kB]", "{:.1f}"), ("unpickle", "unpickle [ms]", "{:.3f}"),
+         ("merge", "merge [ms]", "{:.3f}"), ("merge_max", "max merge [ms]", "{:.3f}"),
+         ("merge_total", "merging [s]", "{:.3f}"), ("total", "total [s]", "{:.3f}")],
+        metrics, BASELINE, args.tolerance,
+        title=f"Reduction of {args.partials} partial results per action (medians per partial)",
+        partials=args.partials, entries=args.entries)
+
+    for mismatch in mismatches:
+        print(f"Linear and tree reductions differ: {mismatch}")
+    return 1 if regressions or mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+Concurrency gain of DistRDF.RunGraphs over triggering graphs one by one.
+
+check_rungraphs.py checks that RunGraphs gives the right results. This
+benchmark books N = --graphs independent graphs of varying size (graph i
+fills a histogram over --entries * (1 + i % 4) entries, in --partitions
+partitions) on a local cluster of --workers workers and runs them
+
+ * sequentially, triggering one graph after the other;
+ * concurrently, with DistRDF.RunGraphs.
+
+For each mode it reports the wall time and, from the timeline of the run
+(see distrdf_bench.timeline):
+
+ * the submission latency: from the call to the dispatch of the first graph,
+   and to the dispatch of the last graph;
+ * the overlap: the average number of graphs in flight on the client;
+ * the utilization of the workers: the fraction of their time spent in tasks.
+
+A RunGraphs speedup close to 1 with a low utilization means that the
+concurrent submission does not keep the workers busy.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import ROOT
+
+import DistRDF
+
+import distrdf_bench
+# distrdf_bench puts the python directory on sys.path
+from perfcommon import summarize
+
+BASELINE = os.path.splitext(os.path.abspath(__file__))[0] + ".baseline.json"
+
+
+def book(backend, connection, ngraphs, args):
+    """Book one histogram on each of ngraphs graphs of varying size."""
+    histos = []
+    for i in range(ngraphs):
+        entries = args.entries * (1 + i % 4)
+        df = distrdf_bench.rdataframe(backend, connection, entries, npartitions=args.partitions)
+        histos.append(df.Define("x", "gRandom->Gaus()").Histo1D((f"h{i}", "", 128, -4, 4), "x"))
+    return histos
+
+
+def sequential(histos):
+    for h in histos:
+        h.GetValue()
+
+
+def concurrent(histos):
+    DistRDF.RunGraphs(histos)
+
+
+MODES = {"sequential": sequential, "RunGraphs": concurrent}
+
+
+def run_once(backend, connection, ngraphs, mode, args, workdir):
+    """Run ngraphs graphs in the given mode, return the measurements of the run."""
+    histos = book(backend, connection, ngraphs, args)
+    with distrdf_bench.timeline(tempfile.mkdtemp(dir=workdir)) as recorded:
+        start = time.time()
+        MODES[mode](histos)
+        end = time.time()
+    dispatches = sorted(dispatched for dispatched, _ in recorded.graphs)
+    expected = sum(args.entries * (1 + i % 4) for i in range(ngraphs))
+    return {
+        "wall": end - start,
+        "first": dispatches[0] - start,
+        "last": dispatches[-1] - start,
+        "overlap": recorded.concurrency(start, end),
+        "utilization": recorded.utilization(start, end, args.workers),
+        "correct": sum(h.GetEntries() for h in histos) == expected,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--graphs", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32],
+                        help="numbers of graphs to run")
+    parser.add_argument("--entries", type=int, default=500000, help="entries of the smallest graph")
+    parser.add_argument("--partitions", type=int, default=2, help="npartitions of every graph")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1),
+                        help="workers of the local cluster")
+    parser.add_argument("--backends", nargs="+", default=distrdf_bench.available_backends(),
+                        choices=distrdf_bench.BACKENDS)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per configuration")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="relative tolerance with respect to the baseline")
+    args = parser.parse_args()
+
+    ROOT.gROOT.SetBatch(True)
+    ROOT.TH1.AddDirectory(False)
+    workdir = tempfile.mkdtemp(prefix="roottest-bench-rungraphs-")
+    rows, metrics, errors = [], {}, []
+    try:
+        for backend in args.backends:
+            with distrdf_bench.connect(backend, args.workers) as connection:
+                # Warm-up, the first run pays for the start of the workers and the jitting
+                run_once(backend, connection, 1, "sequential", args, workdir)
+                for ngraphs in args.graphs:
+                    walls = {}
+                    for mode in MODES:
+                        runs = [run_once(backend, connection, ngraphs, mode, args, workdir)
+                                for _ in range(args.repeat)]
+                        if not all(run["correct"] for run in runs):
+                            errors.append(f"{backend}, {ngraphs} graphs, {mode}: wrong number of entries")
+                        row = {key: summarize([run[key] for run in runs])["median"]
+                               for key in ("wall", "first", "last", "overlap", "utilization")}
+                        walls[mode] = row["wall"]
+                        row.update(backend=backend, graphs=ngraphs, mode=mode,
+                                   speedup=walls["sequential"] / row["wall"])
+                        rows.append(row)
+                        key = f"{backend}.n{ngraphs}.{mode}"
+                        metrics[f"{key}.wall_s"] = row["wall"]
+                        metrics[f"{key}.utilization"] = row["utilization"]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    regressions = distrdf_bench.report(
+        "distrdf_rungraphs", rows,
+        [("backend", "backend"), ("graphs", "graphs"), ("mode", "mode"), ("wall", "wall [s]", "{:.3f}"),
+         ("first", "first dispatch [s]", "{:.3f}"), ("last", "last dispatch [s]", "{:.3f}"),
+         ("overlap", "graphs in flight", "{:.2f}"), ("utilization", "worker utilization", "{:.2f}"),
+         ("speedup", "speedup", "{:.2f}")],
+        metrics, BASELINE, args.tolerance,
+        higher_is_better=[m for m in metrics if m.endswith(".utilization")],
+        title=f"{args.partitions} partitions per graph, {args.workers} workers (medians of {args.repeat} runs)",
+        entries=args.entries, partitions=args.partitions, workers=args.workers)
+
+    for error in errors:
+        print(f"Error: {error}")
+    return 1 if regressions or errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
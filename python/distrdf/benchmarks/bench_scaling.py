@@ -0,0 +1,106 @@
+"""
+Scaling benchmark of the DistRDF backends.
+
+Runs the dimuon invariant mass analysis of check_inv_mass.py on a locally
+generated dataset (see distrdf_bench.make_dimuon_dataset), first with a
+single-process ROOT.RDataFrame, then on local Dask and Spark clusters with
+1...N workers, and for every number of workers with npartitions equal to a
+few multiples of it. For each configuration it reports
+
+ * the throughput in events/s, best of --repeat runs after a warm-up run;
+ * the speedup with respect to ROOT.RDataFrame;
+ * the scaling efficiency, speedup divided by the number of workers.
+
+The histograms of every run are checked against the ROOT.RDataFrame ones.
+Throughputs are compared with bench_scaling.baseline.json and appended to the
+performance history (see python/perfcommon.py).
+"""
+import argparse
+import os
+import sys
+import time
+
+import ROOT
+
+import distrdf_bench
+
+BASELINE = os.path.splitext(os.path.abspath(__file__))[0] + ".baseline.json"
+
+
+def run_once(backend, connection, filenames, npartitions):
+    """Book and run the analysis once, return (wall time, result summary)."""
+    start = time.perf_counter()
+    df = distrdf_bench.rdataframe(backend, connection, distrdf_bench.DIMUON_TREE, filenames,
+                                  npartitions=npartitions)
+    results = distrdf_bench.book_inv_mass(df)
+    summary = distrdf_bench.summary(results)
+    return time.perf_counter() - start, summary
+
+
+def best_of(repeat, backend, connection, filenames, npartitions=None):
+    # The first run pays for the start of the worker processes and the
+    # jitting of the graph, it is not counted
+    run_once(backend, connection, filenames, npartitions)
+    times = []
+    for _ in range(repeat):
+        elapsed, summary = run_once(backend, connection, filenames, npartitions)
+        times.append(elapsed)
+    return min(times), summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--entries", type=int, default=2000000, help="number of events in the dataset")
+    parser.add_argument("--files", type=int, default=16, help="number of files the dataset is split into")
+    parser.add_argument("--max-workers", type=int, default=min(4, os.cpu_count() or 1),
+                        help="largest number of workers")
+    parser.add_argument("--partitions-per-worker", type=int, nargs="+", default=[1, 4],
+                        help="npartitions are these multiples of the number of workers")
+    parser.add_argument("--backends", nargs="+", default=distrdf_bench.available_backends(),
+                        choices=distrdf_bench.BACKENDS)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per configuration")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="relative tolerance with respect to the baseline")
+    args = parser.parse_args()
+
+    ROOT.gROOT.SetBatch(True)
+    filenames = distrdf_bench.make_dimuon_dataset(args.entries, args.files)
+
+    local_time, reference = best_of(args.repeat, "local", None, filenames)
+    rows = [dict(backend="local", workers=1, events=args.entries / local_time, speedup=1., efficiency=1.)]
+    metrics = {"local.events_per_s": args.entries / local_time}
+    mismatches = []
+
+    for backend in args.backends:
+        for n_workers in range(1, args.max_workers + 1):
+            with distrdf_bench.connect(backend, n_workers) as connection:
+                for factor in args.partitions_per_worker:
+                    npartitions = n_workers * factor
+                    elapsed, summary = best_of(args.repeat, backend, connection, filenames, npartitions)
+                    if not distrdf_bench.same_summary(summary, reference):
+                        mismatches.append(f"{backend}, {n_workers} workers, {npartitions} partitions: "
+                                          f"{summary} instead of {reference}")
+                    speedup = local_time / elapsed
+                    key = f"{backend}.w{n_workers}.p{npartitions}"
+                    metrics[f"{key}.events_per_s"] = args.entries / elapsed
+                    metrics[f"{key}.efficiency"] = speedup / n_workers
+                    rows.append(dict(backend=backend, workers=n_workers, npartitions=npartitions,
+                                     events=args.entries / elapsed, speedup=speedup,
+                                     efficiency=speedup / n_workers))
+
+    regressions = distrdf_bench.report(
+        "distrdf_scaling", rows,
+        [("backend", "backend"), ("workers", "workers"), ("npartitions", "npartitions"),
+         ("events", "events/s", "{:.4g}"), ("speedup", "speedup", "{:.2f}"),
+         ("efficiency", "efficiency", "{:.2f}")],
+        metrics, BASELINE, args.tolerance,
+        higher_is_better=list(metrics),
+        title=f"Invariant mass analysis, {args.entries} events in {args.files} files",
+        entries=args.entries, files=args.files)
+
+    for mismatch in mismatches:
+        print(f"Results differ from ROOT.RDataFrame: {mismatch}")
+    return 1 if regressions or mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
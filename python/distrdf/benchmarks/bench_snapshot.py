@@ -0,0 +1,190 @@
+"""
+Throughput of a distributed skim written with Snapshot, one file per partition.
+
+Skims the dimuon dataset of distrdf_bench (--entries entries in --files
+files) with a Filter and a Define, and writes the selected entries with a
+distributed Snapshot on a local cluster of --workers workers: every one of
+the --partitions tasks writes its own output file. For each backend and
+compression setting of --compression (algorithm-level, see COMPRESSION) it
+reports, as medians of --repeat runs,
+
+ * the wall time and the aggregate write throughput, in uncompressed and
+   in on-disk MB per second;
+ * the compression cost, the wall time beyond that of the uncompressed
+   Snapshot, and the compression ratio;
+ * the number of output files.
+
+The output files are read back as a chain and compared with a single-process
+ROOT.RDataFrame Snapshot of the same skim: entries and the sum of every
+column must agree. The benchmark fails if they do not, if there is not one
+file per partition, or if a measurement regresses with respect to
+bench_snapshot.baseline.json.
+"""
+import argparse
+import glob
+import math
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+import ROOT
+
+import distrdf_bench
+# distrdf_bench puts the python directory on sys.path
+from perfcommon import summarize
+
+BASELINE = os.path.splitext(os.path.abspath(__file__))[0] + ".baseline.json"
+
+OUTPUT_TREE = "skim"
+COLUMNS = distrdf_bench.DIMUON_BRANCHES + ["invMass"]
+# Algorithm and level of the output files, by name
+COMPRESSION = {
+    "none": ("kUseGlobal", 0),
+    "zlib-1": ("kZLIB", 1),
+    "lz4-4": ("kLZ4", 4),
+    "zstd-5": ("kZSTD", 5),
+}
+
+
+def options(compression):
+    algorithm, level = COMPRESSION[compression]
+    opts = ROOT.RDF.RSnapshotOptions()
+    opts.fCompressionAlgorithm = getattr(ROOT.RCompressionSetting.EAlgorithm, algorithm)
+    opts.fCompressionLevel = level
+    return opts
+
+
+def skim(df):
+    return df.Filter("pt1 > 5 && pt2 > 5", "hard muons") \
+             .Define("invMass", "sqrt(pow(E1 + E2, 2) - (pow(px1 + px2, 2) + pow(py1 + py2, 2) + pow(pz1 + pz2, 2)))")
+
+
+def output_files(stem):
+    """The files written by a distributed Snapshot to stem.root, in the order of the partitions."""
+    pattern = re.compile(re.escape(os.path.basename(stem)) + r"_(\d+)\.root$")
+    files = [f for f in glob.glob(stem + "_*.root") if pattern.search(f)]
+    return sorted(files, key=lambda f: int(pattern.search(f).group(1)))
+
+
+def tree_bytes(filenames):
+    """Uncompressed and compressed bytes of the output tree in the files."""
+    total = zipped = 0
+    for filename in filenames:
+        f = ROOT.TFile.Open(filename)
+        tree = f.Get(OUTPUT_TREE)
+        total += tree.GetTotBytes()
+        zipped += tree.GetZipBytes()
+        f.Close()
+    return total, zipped
+
+
+def checksums(df):
+    """Entries and sum of every column."""
+    sums = {column: df.Sum(column) for column in COLUMNS}
+    entries = df.Count()
+    return {"entries": entries.GetValue(), **{column: sum_.GetValue() for column, sum_ in sums.items()}}
+
+
+def same(a, b, rel=1e-9):
+    return a.keys() == b.keys() and all(math.isclose(a[k], b[k], rel_tol=rel, abs_tol=1e-9) for k in a)
+
+
+def run_once(backend, connection, inputs, compression, args, directory):
+    """Write the skim once, return its measurements, output files and the distributed RDataFrame on them."""
+    stem = os.path.join(directory, f"{backend}_{compression}")
+    start = time.perf_counter()
+    df = distrdf_bench.rdataframe(backend, connection, distrdf_bench.DIMUON_TREE, inputs, npartitions=args.partitions)
+    snapdf = skim(df).Snapshot(OUTPUT_TREE, stem + ".root", COLUMNS, options(compression))
+    wall = time.perf_counter() - start
+    files = output_files(stem)
+    total, zipped = tree_bytes(files)
+    disk = sum(os.path.getsize(f) for f in files)
+    return {"wall": wall, "files": len(files), "total_mb": total / 1024 ** 2, "disk_mb": disk / 1024 ** 2,
+            "ratio": total / zipped if zipped else None}, files, snapdf
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--entries", type=int, default=10000000, help="entries of the input dataset")
+    parser.add_argument("--files", type=int, default=4, help="files of the input dataset")
+    parser.add_argument("--partitions", type=int, default=16, help="npartitions, and output files, of the skim")
+    parser.add_argument("--workers", type=int, default=4, help="workers of the local cluster")
+    parser.add_argument("--compression", nargs="+", default=list(COMPRESSION), choices=list(COMPRESSION))
+    parser.add_argument("--backends", nargs="+", default=distrdf_bench.available_backends(),
+                        choices=distrdf_bench.BACKENDS)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per compression setting")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="relative tolerance with respect to the baseline")
+    args = parser.parse_args()
+
+    ROOT.gROOT.SetBatch(True)
+    inputs = distrdf_bench.make_dimuon_dataset(args.entries, args.files)
+    workdir = tempfile.mkdtemp(prefix="roottest-bench-snapshot-")
+    rows, metrics, errors = [], {}, []
+    try:
+        # Reference: the same skim with a single-process RDataFrame
+        reference_file = os.path.join(workdir, "reference.root")
+        skim(ROOT.RDataFrame(distrdf_bench.DIMUON_TREE, inputs)).Snapshot(OUTPUT_TREE, reference_file, COLUMNS)
+        reference = checksums(ROOT.RDataFrame(OUTPUT_TREE, reference_file))
+
+        for backend in args.backends:
+            with distrdf_bench.connect(backend, args.workers) as connection:
+                # Warm-up, pays for the start of the workers and the jitting
+                run_once(backend, connection, inputs, "none", args, tempfile.mkdtemp(dir=workdir))
+                compressions = [c for c in COMPRESSION if c in args.compression]
+                runs = {compression: [] for compression in compressions}
+                for _ in range(args.repeat):
+                    # Alternate the settings, so that they see the same drifts of the machine
+                    for compression in compressions:
+                        directory = tempfile.mkdtemp(dir=workdir)
+                        run, files, snapdf = run_once(backend, connection, inputs, compression, args, directory)
+                        runs[compression].append(run)
+                        prefix = f"{backend}.{compression}"
+                        if run["files"] != args.partitions:
+                            errors.append(f"{prefix}: {run['files']} files for {args.partitions} partitions")
+                        if not same(checksums(ROOT.RDataFrame(OUTPUT_TREE, files)), reference):
+                            errors.append(f"{prefix}: the output files differ from the local Snapshot")
+                        if snapdf.Count().GetValue() != reference["entries"]:
+                            errors.append(f"{prefix}: the distributed RDataFrame of the Snapshot has the wrong entries")
+                        shutil.rmtree(directory, ignore_errors=True)
+
+                uncompressed_wall = None
+                # The uncompressed Snapshot first, for the compression cost of the others
+                for compression in compressions:
+                    wall = summarize([run["wall"] for run in runs[compression]])["median"]
+                    if compression == "none":
+                        uncompressed_wall = wall
+                    # The outputs, hence the sizes, are the same in every run
+                    row = dict(runs[compression][-1], backend=backend, compression=compression, wall=wall,
+                               throughput=summarize([run["total_mb"] / run["wall"]
+                                                     for run in runs[compression]])["median"],
+                               disk_throughput=summarize([run["disk_mb"] / run["wall"]
+                                                          for run in runs[compression]])["median"],
+                               cost=wall - uncompressed_wall if uncompressed_wall is not None else None)
+                    rows.append(row)
+                    prefix = f"{backend}.{compression}"
+                    metrics[f"{prefix}.runtime_s"] = row["wall"]
+                    metrics[f"{prefix}.throughput_mb_s"] = row["throughput"]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    regressions = distrdf_bench.report(
+        "distrdf_snapshot", rows,
+        [("backend", "backend"), ("compression", "compression"), ("files", "files"), ("wall", "time [s]", "{:.2f}"),
+         ("throughput", "MB/s", "{:.1f}"), ("disk_throughput", "on-disk MB/s", "{:.1f}"),
+         ("cost", "compression [s]", "{:.2f}"), ("ratio", "ratio", "{:.2f}")],
+        metrics, BASELINE, args.tolerance,
+        higher_is_better=[m for m in metrics if m.endswith(".throughput_mb_s")],
+        title=f"Skim of {args.entries} entries, {args.partitions} partitions on {args.workers} workers "
+              f"(medians of {args.repeat} runs)",
+        entries=args.entries, partitions=args.partitions, workers=args.workers)
+
+    for error in errors:
+        print(f"Error: {error}")
+    return 1 if regressions or errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Client memory and result sizes of many systematic variations of a 2D histogram.
+
+Books a 2D histogram with --variations variations of its x column on a local
+cluster, in two modes:
+
+ * variationsfor: Vary and DistRDF.VariationsFor, every task returns one
+                  histogram per variation;
+ * compact:       the CompactVariations of python/distrdf/compact_variations.py,
+                  every task returns a single 3D histogram, merged in place.
+
+For each mode and number of variations it reports the runtime, the peak
+increase of the resident memory of the client while the results are
+retrieved and every variation is read once, and the pickled size of the
+partial results of the tasks. The benchmark fails if the results of the two
+modes differ or if a measurement regresses with respect to
+bench_variations_memory.baseline.json.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import ROOT
+
+import distrdf_bench
+# distrdf_bench puts the python directory on sys.path
+from perfcommon import RSSSampler
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import serialization_stats  # noqa: E402
+from compact_variations import CompactVariations  # noqa: E402
+
+BASELINE = os.path.splitext(os.path.abspath(__file__))[0] + ".baseline.json"
+
+MODES = ("variationsfor", "compact")
+
+
+def variations(nvariations):
+    return "ROOT::RVecD{" + ", ".join(f"x * {1. + 0.001 * (i + 1)}" for i in range(nvariations)) + "}"
+
+
+def run_once(backend, connection, mode, nvariations, args, workdir):
+    """Run one mode once, return (runtime, RSS increase in MB, result bytes per task, integrals by key)."""
+    model = ("h", "", args.bins, -2, 2, args.bins, -2, 2)
+    with RSSSampler() as rss, serialization_stats.recording(tempfile.mkdtemp(dir=workdir)) as stats:
+        start = time.perf_counter()
+        df = distrdf_bench.rdataframe(backend, connection, args.entries, npartitions=args.partitions) \
+                          .Define("x", "sin(rdfentry_)").Define("y", "cos(rdfentry_)")
+        if mode == "compact":
+            histos = CompactVariations(df, "x", variations(nvariations), nvariations).Histo2D(model, "x", "y")
+        else:
+            import DistRDF
+            h = df.Vary("x", variations(nvariations), nVariations=nvariations).Histo2D(model, "x", "y")
+            histos = DistRDF.VariationsFor(h)
+        integrals = {str(key): histos[str(key)].Integral() for key in histos.GetKeys()}
+        elapsed = time.perf_counter() - start
+    summary = stats.summary()
+    per_task = summary["result_bytes_total"] / max(summary["results"], 1)
+    return elapsed, rss.increase, per_task, integrals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--variations", type=int, nargs="+", default=[10, 50, 100, 200],
+                        help="numbers of variations")
+    parser.add_argument("--bins", type=int, default=100, help="bins of each axis of the 2D histogram")
+    parser.add_argument("--entries", type=int, default=1000000, help="entries of the graph")
+    parser.add_argument("--partitions", type=int, default=16, help="npartitions of the graph")
+    parser.add_argument("--workers", type=int, default=2, help="workers of the local cluster")
+    parser.add_argument("--backends", nargs="+", default=distrdf_bench.available_backends(),
+                        choices=distrdf_bench.BACKENDS)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="relative tolerance with respect to the baseline")
+    args = parser.parse_args()
+
+    ROOT.gROOT.SetBatch(True)
+    ROOT.TH1.AddDirectory(False)
+    workdir = tempfile.mkdtemp(prefix="roottest-bench-variations-memory-")
+    rows, metrics, mismatches = [], {}, []
+    try:
+        for backend in args.backends:
+            with distrdf_bench.connect(backend, args.workers) as connection:
+                for nvariations in args.variations:
+                    reference = None
+                    for mode in MODES:
+                        # Warm-up, pays for the jitting
+                        run_once(backend, connection, mode, nvariations, args, workdir)
+                        elapsed, rss, per_task, integrals = run_once(
+                            backend, connection, mode, nvariations, args, workdir)
+                        rows.append(dict(backend=backend, variations=nvariations, mode=mode, time=elapsed,
+                                         rss=rss, result_kb=per_task / 1024))
+                        prefix = f"{backend}.{mode}.{nvariations}"
+                        metrics[f"{prefix}.runtime_s"] = elapsed
+                        metrics[f"{prefix}.result_bytes_per_task"] = per_task
+                        if rss is not None:
+                            metrics[f"{prefix}.client_rss_mb"] = rss
+                        if reference is None:
+                            reference = integrals
+                        elif integrals != reference:
+                            mismatches.append(f"{backend}, {nvariations} variations: {mode} differs")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    regressions = distrdf_bench.report(
+        "distrdf_variations_memory", rows,
+        [("backend", "backend"), ("variations", "variations"), ("mode", "mode"), ("time", "time [s]", "{:.3f}"),
+         ("rss", "client RSS [MB]", "{:.1f}"), ("result_kb", "result [kB/task]", "{:.1f}")],
+        metrics, BASELINE, args.tolerance,
+        title=f"{args.bins}x{args.bins} bins, {args.entries} entries, {args.partitions} partitions "
+              f"on {args.workers} workers (client RSS increase)",
+        bins=args.bins, entries=args.entries, partitions=args.partitions, workers=args.workers)
+
+    for mismatch in mismatches:
+        print(f"Results differ: {mismatch}")
+    return 1 if regressions or mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""
+Per-task overhead of sending headers to the DistRDF workers.
+
+Generates --headers header files and runs --calls times RunGraphs on --graphs
+small graphs that use them, on a fresh local cluster for each mode:
+
+ * none:       no headers, the reference;
+ * distribute: the headers are given to distribute_headers of every graph,
+               which sends them and declares them again with every task;
+ * cached:     the headers go through the content-addressed worker cache
+               (python/distrdf/worker_cache.py), sent and declared once.
+
+The overhead per task of a call is its time minus the time of the same call
+in mode none, divided by the number of tasks. The first call (cold workers)
+and the median of the following ones are reported.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import ROOT
+
+import distrdf_bench
+# distrdf_bench puts the python directory on sys.path
+from perfcommon import summarize
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from worker_cache import WorkerCache  # noqa: E402
+
+BASELINE = os.path.splitext(os.path.abspath(__file__))[0] + ".baseline.json"
+
+HEADER = """#ifndef ROOTTEST_BENCH_WORKER_CACHE_{k}
+#define ROOTTEST_BENCH_WORKER_CACHE_{k}
+#include <vector>
+template <typename T> struct BenchHeader{k} {{
+   std::vector<T> fValues;
+   T Sum() const {{ T s{{}}; for (auto v : fValues) s += v; return s; }}
+}};
+inline bool bench_header_{k}(unsigned long long entry) {{
+   BenchHeader{k}<double> h{{{{double(entry), 1.}}}};
+   return h.Sum() > {k};
+}}
+#endif
+"""
+
+
+def write_headers(directory, n):
+    paths = []
+    for k in range(n):
+        path = os.path.join(directory, f"bench_header_{k}.hxx")
+        with open(path, "w") as f:
+            f.write(HEADER.format(k=k))
+        paths.append(path)
+    return paths
+
+
+def run_calls(backend, mode, headers, args, cache_dir):
+    """Time the RunGraphs calls of one mode on a fresh cluster."""
+    times = []
+    with distrdf_bench.connect(backend, args.workers) as connection:
+        cache = None
+        if mode == "cached":
+            cache = WorkerCache(cache_dir)
+            cache.add_headers(*headers)
+        try:
+            for _ in range(args.calls):
+                start = time.perf_counter()
+                if cache:
+                    cache.ship(connection)
+                    cache.install()
+                counts = []
+                for _ in range(args.graphs):
+                    df = distrdf_bench.rdataframe(backend, connection, args.entries, npartitions=args.partitions)
+                    if mode == "distribute":
+                        df._headnode.backend.distribute_headers(headers)
+                    condition = "bench_header_0(rdfentry_)" if mode != "none" else "rdfentry_ > 0"
+                    counts.append(df.Filter(condition).Count())
+                ROOT.RDF.Experimental.Distributed.RunGraphs(counts)
+                times.append(time.perf_counter() - start)
+        finally:
+            if cache:
+                WorkerCache.uninstall()
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--headers", type=int, default=50, help="number of header files")
+    parser.add_argument("--graphs", type=int, default=4, help="graphs per RunGraphs call")
+    parser.add_argument("--calls", type=int, default=5, help="RunGraphs calls per mode")
+    parser.add_argument("--partitions", type=int, default=8, help="npartitions of every graph")
+    parser.add_argument("--entries", type=int, default=1000, help="entries of every graph")
+    parser.add_argument("--workers", type=int, default=2, help="workers of the local cluster")
+    parser.add_argument("--backends", nargs="+", default=distrdf_bench.available_backends(),
+                        choices=distrdf_bench.BACKENDS)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="relative tolerance with respect to the baseline")
+    args = parser.parse_args()
+
+    ROOT.gROOT.SetBatch(True)
+    workdir = tempfile.mkdtemp(prefix="roottest-bench-worker-cache-")
+    ntasks = args.graphs * args.partitions
+    rows, metrics = [], {}
+    try:
+        headers = write_headers(workdir, args.headers)
+        for backend in args.backends:
+            times = {mode: run_calls(backend, mode, headers, args, os.path.join(workdir, f"cache-{backend}"))
+                     for mode in ("none", "distribute", "cached")}
+            for mode in ("distribute", "cached"):
+                overhead = [(t - ref) / ntasks * 1e3 for t, ref in zip(times[mode], times["none"])]
+                row = dict(backend=backend, mode=mode, first=overhead[0],
+                           warm=summarize(overhead[1:])["median"] if len(overhead) > 1 else None,
+                           call=summarize(times[mode])["median"])
+                rows.append(row)
+                metrics[f"{backend}.{mode}.first_ms_per_task"] = row["first"]
+                if row["warm"] is not None:
+                    metrics[f"{backend}.{mode}.warm_ms_per_task"] = row["warm"]
+            rows.append(dict(backend=backend, mode="none", call=summarize(times["none"])["median"]))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    regressions = distrdf_bench.report(
+        "distrdf_worker_cache", rows,
+        [("backend", "backend"), ("mode", "mode"), ("first", "first call [ms/task]", "{:.2f}"),
+         ("warm", "next calls [ms/task]", "{:.2f}"), ("call", "RunGraphs [s]", "{:.3f}")],
+        metrics, BASELINE, args.tolerance,
+        title=f"{args.headers} headers, {args.graphs} graphs x {args.partitions} partitions per call",
+        headers=args.headers, tasks=ntasks)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
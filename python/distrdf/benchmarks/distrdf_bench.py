@@ -0,0 +1,326 @@
+"""
+Helpers shared by the DistRDF benchmarks.
+
+ * connect(backend, n_workers): a private local cluster of the given size for
+   the "dask" or "spark" backend. The benchmarks change the number of workers
+   between runs, so they do not use the shared cluster of cluster_service.py.
+ * rdataframe(backend, connection, ...): a distributed RDataFrame on that
+   cluster, or a single-process ROOT.RDataFrame for backend "local".
+ * make_dimuon_dataset(...): a local stand-in for the CMS open dataset read by
+   check_inv_mass.py, with the same tree name and branches, written with
+   Snapshot. The values depend only on the entry number, so the dataset is
+   the same whatever the number of files it is split into.
+ * book_inv_mass(df): the Filter/Define/Histo1D/Histo2D graph of
+   check_inv_mass.py.
+ * timeline(): when the graphs are dispatched and completed on the client,
+   and when their tasks run on the workers.
+"""
+import contextlib
+import functools
+import importlib.util
+import os
+import sys
+import tempfile
+import time
+
+import ROOT
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import perfcommon  # noqa: E402
+from backend_hooks import append_record, pickle_by_value, process_and_merge, read_records  # noqa: E402
+
+BACKENDS = ("dask", "spark")
+
+DIMUON_TREE = "data"
+DIMUON_BRANCHES = ["C1", "C2", "E1", "E2", "px1", "px2", "py1", "py2", "pz1", "pz2",
+                   "pt1", "pt2", "eta1", "eta2", "phi1", "phi2"]
+
+# One muon pair per entry, drawn from a counter-based generator so that an
+# entry gets the same values whichever process or file writes it. 30% of the
+# pairs come from a Z decay, the rest are combinatorial background.
+DIMUON_GENERATOR = r"""
+// Guarded, as make_dimuon_dataset declares it at every call
+#ifndef ROOTTEST_DISTRDF_BENCH_DIMUON
+#define ROOTTEST_DISTRDF_BENCH_DIMUON
+
+#include <cmath>
+#include "TMath.h"
+
+namespace roottest_distrdf_bench {
+
+struct Dimuon {
+   int C1, C2;
+   double E1, E2, px1, px2, py1, py2, pz1, pz2, pt1, pt2, eta1, eta2, phi1, phi2;
+};
+
+// splitmix64 of (entry, stream), mapped to [0, 1)
+inline double Uniform(ULong64_t entry, unsigned int stream)
+{
+   ULong64_t x = entry * 0x9E3779B97F4A7C15ULL + (stream + 1) * 0xBF58476D1CE4E5B9ULL;
+   x = (x ^ (x >> 30)) * 0xBF58476D1CE4E5B9ULL;
+   x = (x ^ (x >> 27)) * 0x94D049BB133111EBULL;
+   x = x ^ (x >> 31);
+   return (x >> 11) * (1.0 / 9007199254740992.0);
+}
+
+inline void SetMuon(double pt, double eta, double phi, double &E, double &px, double &py, double &pz)
+{
+   const double mass = 0.1056583745;
+   px = pt * std::cos(phi);
+   py = pt * std::sin(phi);
+   pz = pt * std::sinh(eta);
+   E = std::sqrt(px * px + py * py + pz * pz + mass * mass);
+}
+
+inline Dimuon MakeDimuon(ULong64_t entry)
+{
+   Dimuon d;
+   d.C1 = Uniform(entry, 0) < 0.5 ? 1 : -1;
+   if (Uniform(entry, 1) < 0.3) {
+      // Z -> mu mu, back to back in the transverse plane, with a longitudinal boost
+      const double mZ = 91.1876, wZ = 2.4952;
+      const double m = mZ + 0.5 * wZ * std::tan(TMath::Pi() * (Uniform(entry, 2) - 0.5));
+      const double cosTheta = 0.999999 * (2. * Uniform(entry, 3) - 1.);
+      const double pt = 0.5 * std::fabs(m) * std::sqrt(1. - cosTheta * cosTheta);
+      const double y = 4. * Uniform(entry, 4) - 2.;
+      d.C2 = -d.C1;
+      d.pt1 = d.pt2 = pt;
+      d.eta1 = std::atanh(cosTheta) + y;
+      d.eta2 = -std::atanh(cosTheta) + y;
+      d.phi1 = TMath::Pi() * (2. * Uniform(entry, 5) - 1.);
+      d.phi2 = d.phi1 > 0 ? d.phi1 - TMath::Pi() : d.phi1 + TMath::Pi();
+   } else {
+      d.C2 = Uniform(entry, 6) < 0.5 ? 1 : -1;
+      d.pt1 = 1. - 15. * std::log(1. - Uniform(entry, 7));
+      d.pt2 = 1. - 15. * std::log(1. - Uniform(entry, 8));
+      d.eta1 = 6. * Uniform(entry, 9) - 3.;
+      d.eta2 = 6. * Uniform(entry, 10) - 3.;
+      d.phi1 = TMath::Pi() * (2. * Uniform(entry, 11) - 1.);
+      d.phi2 = TMath::Pi() * (2. * Uniform(entry, 12) - 1.);
+   }
+   SetMuon(d.pt1, d.eta1, d.phi1, d.E1, d.px1, d.py1, d.pz1);
+   SetMuon(d.pt2, d.eta2, d.phi2, d.E2, d.px2, d.py2, d.pz2);
+   return d;
+}
+
+} // namespace roottest_distrdf_bench
+
+#endif
+"""
+
+
+def available_backends():
+    """The backends whose python packages are installed."""
+    modules = {"dask": "distributed", "spark": "pyspark"}
+    return [backend for backend in BACKENDS if importlib.util.find_spec(modules[backend]) is not None]
+
+
+@contextlib.contextmanager
+def connect(backend, n_workers):
+    """
+    Yield the connection object to a local cluster with n_workers
+    single-threaded workers, for the "dask" or "spark" backend. The cluster
+    is shut down on exit.
+    """
+    if backend == "dask":
+        from dask.distributed import Client, LocalCluster
+
+        cluster = LocalCluster(n_workers=n_workers, threads_per_worker=1, processes=True, memory_limit="2GiB")
+        client = Client(cluster)
+        try:
+            yield client
+        finally:
+            client.close()
+            cluster.close()
+    elif backend == "spark":
+        import pyspark
+
+        conf = {"spark.master": f"local[{n_workers}]", "spark.driver.memory": "4g",
+                "spark.app.name": "roottest-distrdf-benchmarks"}
+        sparkcontext = pyspark.SparkContext(conf=pyspark.SparkConf().setAll(conf.items()))
+        try:
+            yield sparkcontext
+        finally:
+            sparkcontext.stop()
+    else:
+        raise ValueError(f"Unknown DistRDF backend '{backend}'")
+
+
+def rdataframe(backend, connection, *args, **kwargs):
+    """
+    Create an RDataFrame from args on the given backend. Keyword arguments
+    (npartitions, ...) are passed to the distributed RDataFrame only.
+    """
+    if backend == "local":
+        return ROOT.RDataFrame(*args)
+    if backend == "dask":
+        from DistRDF.Backends import Dask
+        return Dask.RDataFrame(*args, daskclient=connection, **kwargs)
+    if backend == "spark":
+        from DistRDF.Backends import Spark
+        return Spark.RDataFrame(*args, sparkcontext=connection, **kwargs)
+    raise ValueError(f"Unknown DistRDF backend '{backend}'")
+
+
+def data_dir():
+    """Where the generated datasets are kept, by default the working directory."""
+    return os.environ.get("ROOTTEST_DISTRDF_BENCH_DATA", os.getcwd())
+
+
+def _has_entries(filename, treename, nentries):
+    if not os.path.exists(filename):
+        return False
+    f = ROOT.TFile.Open(filename)
+    try:
+        tree = f.Get(treename) if f and not f.IsZombie() else None
+        return bool(tree) and tree.GetEntries() == nentries
+    finally:
+        if f:
+            f.Close()
+
+
+def make_dimuon_dataset(nentries, nfiles=1, directory=None, prefix="dimuon"):
+    """
+    Write nentries dimuon events, split evenly into nfiles files, and return
+    the list of file names. Files that already hold the expected entries are
+    reused.
+    """
+    directory = directory or data_dir()
+    os.makedirs(directory, exist_ok=True)
+    ROOT.gInterpreter.Declare(DIMUON_GENERATOR)
+
+    filenames = []
+    first = 0
+    for i in range(nfiles):
+        count = nentries // nfiles + (1 if i < nentries % nfiles else 0)
+        filename = os.path.join(directory, f"{prefix}_{nentries}_{i}of{nfiles}.root")
+        if not _has_entries(filename, DIMUON_TREE, count):
+            df = ROOT.RDataFrame(count).Define(
+                "dimuon", f"roottest_distrdf_bench::MakeDimuon(rdfentry_ + {first}ULL)")
+            for branch in DIMUON_BRANCHES:
+                df = df.Define(branch, f"dimuon.{branch}")
+            df.Snapshot(DIMUON_TREE, filename, DIMUON_BRANCHES)
+        filenames.append(filename)
+        first += count
+    return filenames
+
+
+def book_inv_mass(df):
+    """
+    Book the graph of check_inv_mass.py on df. Returns the result pointers,
+    keyed by name.
+    """
+    df = df.Filter("C1 != C2", "opposite charge") \
+           .Filter("fabs(eta1) < 2.3 && fabs(eta2) < 2.3", "central") \
+           .Filter("pt1 > 2 && pt2 > 2", "minimum pt") \
+           .Define("invMass", "sqrt(pow(E1 + E2, 2) - (pow(px1 + px2, 2) + pow(py1 + py2, 2) + pow(pz1 + pz2, 2)))")
+    pi = ROOT.TMath.Pi()
+    return {
+        "pt1": df.Histo1D(("pt1", "pt1", 128, 1, 1200), "pt1"),
+        "pt2": df.Histo1D(("pt2", "pt2", 128, 1, 1200), "pt2"),
+        "invMass": df.Histo1D(("invMass", "CMS Opendata: #mu#mu mass;#mu#mu mass [GeV];Events", 512, 5, 110),
+                              "invMass"),
+        "phis": df.Histo2D(("phis", "phi1 vs phi2", 64, -pi, pi, 64, -pi, pi), "phi1", "phi2"),
+    }
+
+
+def summary(results):
+    """Entries and mean of each histogram, to compare runs on different backends."""
+    out = {}
+    for name, result in results.items():
+        h = result.GetValue()
+        out[name] = (int(h.GetEntries()), h.GetMean())
+    return out
+
+
+def same_summary(a, b, rel=1e-9):
+    """Whether two summaries agree, up to rounding in the merge order."""
+    if a.keys() != b.keys():
+        return False
+    for name in a:
+        (na, ma), (nb, mb) = a[name], b[name]
+        if na != nb or abs(ma - mb) > rel * max(1., abs(ma), abs(mb)):
+            return False
+    return True
+
+
+def report(name, rows, columns, metrics, baseline, tolerance, higher_is_better=(), title=None, **context):
+    """
+    Print the rows as a table, record the metrics in the performance history
+    and compare them with the baseline file. Returns the regressions.
+    """
+    print(perfcommon.format_table(rows, columns, title=title))
+    perfcommon.append_history(name, metrics, root=ROOT.gROOT.GetVersion(), **context)
+    regressions = perfcommon.check_baseline(metrics, baseline, tolerance, higher_is_better)
+    for regression in regressions:
+        print(f"Performance regression: {regression}")
+    return regressions
+
+
+def _timed_mapper(mapper, directory, current_range):
+    """(Worker) run the mapper and append its start and end times to a file of the directory."""
+    start = time.time()
+    result = mapper(current_range)
+    record = {"pid": os.getpid(), "start": start, "end": time.time()}
+    append_record(directory, "tasks", record)
+    return result
+
+
+class Timeline:
+    """
+    Wall-clock times (time.time()) of the graphs dispatched and of the tasks
+    run within a timeline() block.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        # (dispatch, completion) of every graph, in the order of completion
+        self.graphs = []
+
+    def tasks(self):
+        """The (pid, start, end) of every task, read from the files of the workers."""
+        return [(r["pid"], r["start"], r["end"]) for r in read_records(self.directory, "tasks")]
+
+    def concurrency(self, start, end):
+        """Average number of graphs in flight on the client between start and end."""
+        return sum(done - dispatched for dispatched, done in self.graphs) / (end - start)
+
+    def utilization(self, start, end, n_workers):
+        """Fraction of the time of n_workers workers spent in tasks between start and end."""
+        return sum(e - s for _, s, e in self.tasks()) / ((end - start) * n_workers)
+
+    def tail(self):
+        """
+        Time from the end of the last task of the first worker to become idle
+        to the end of the last task: how long the workers wait for stragglers.
+        """
+        last = {}
+        for pid, _, end in self.tasks():
+            last[pid] = max(end, last.get(pid, end))
+        return max(last.values()) - min(last.values()) if last else 0.
+
+
+@contextlib.contextmanager
+def timeline(directory=None):
+    """
+    Instrument the ProcessAndMerge method of the DistRDF backends and yield
+    the Timeline of what runs in the block. The workers write the times of
+    their tasks to files in directory, by default a new temporary one, which
+    they must share with the client as on local clusters.
+    """
+    directory = directory or tempfile.mkdtemp(prefix="roottest-distrdf-timeline-")
+    os.makedirs(directory, exist_ok=True)
+    recorded = Timeline(directory)
+
+    def ProcessAndMerge(original, backend, ranges, mapper, reducer):
+        dispatched = time.time()
+        try:
+            return original(backend, ranges, functools.partial(_timed_mapper, mapper, directory), reducer)
+        finally:
+            recorded.graphs.append((dispatched, time.time()))
+
+    pickle_by_value(sys.modules[__name__])
+    with process_and_merge(ProcessAndMerge):
+        yield recorded
@@ -0,0 +1,272 @@
+"""
+A local Dask cluster shared by the DistRDF test directories.
+
+Starting a `LocalCluster` and its worker processes costs a few seconds, and
+every test directory runs in its own pytest session. Instead of creating one
+cluster per session, the first session starts a cluster in a separate
+service process; the address of its scheduler is written to a state file
+that the following sessions read to connect to the same cluster, and so to
+the same worker processes.
+
+Every connected session holds a reference on the service (its pid, stored in
+the state file). When the last reference is dropped, the service lingers for
+ROOTTEST_DISTRDF_CLUSTER_LINGER seconds (default 120) waiting for the next
+test directory, then shuts the cluster down. A service started with `start`
+is pinned and only stops on `stop`; CMake uses this as a ctest fixture around
+the DistRDF tests.
+
+The worker processes are not restarted between sessions, so what a session
+leaves in them is kept apart from the other sessions instead:
+ * the working directory: the tests refer to their input files with paths
+   relative to their directory, so until disconnect the DistRDF tasks of a
+   client run in the working directory of its session, moving to it and
+   back around every task;
+ * the cling declarations, which a process cannot forget: the functions
+   declared by jit_cache.py are named after the session, the headers and
+   libraries of worker_cache.py after their content, and the code the tests
+   declare on the workers is guarded or defines the same thing in every
+   session. New tests running on the shared cluster must keep it that way.
+The initialization functions and the headers and libraries given to DistRDF
+travel with every graph, and are not left behind.
+
+The state lives in ROOTTEST_DISTRDF_CLUSTER_DIR, by default a per-user
+directory in the system temporary directory.
+
+Spark is not covered: every SparkContext brings its own executors, so a Spark
+application cannot reuse the workers of another one.
+
+Usage:
+    cluster_service.py start     start the cluster (if needed) and pin it
+    cluster_service.py stop      stop the cluster
+    cluster_service.py status    print the state of the service
+"""
+import argparse
+import contextlib
+import fcntl
+import functools
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from backend_hooks import pickle_by_value, process_and_merge
+
+# Same configuration as the clusters previously created in each conftest.py
+N_WORKERS = 2
+CLUSTER_OPTIONS = dict(n_workers=N_WORKERS, threads_per_worker=1, processes=True, memory_limit="2GiB")
+
+# The hooks running the tasks of the clients returned by connect in their directory
+_sessions = {}
+
+
+def state_dir():
+    """Directory holding the state, lock and log files of the service."""
+    default = os.path.join(tempfile.gettempdir(), f"roottest-distrdf-{os.getuid()}")
+    return os.environ.get("ROOTTEST_DISTRDF_CLUSTER_DIR", default)
+
+
+def linger_time():
+    """Seconds an unreferenced, unpinned service waits before shutting down."""
+    return float(os.environ.get("ROOTTEST_DISTRDF_CLUSTER_LINGER", 120))
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@contextlib.contextmanager
+def _locked_state():
+    """
+    Yield the state dictionary of the service while holding the lock on it.
+    Changes are written back on exit; an empty state removes the state file.
+    """
+    directory = state_dir()
+    os.makedirs(directory, exist_ok=True)
+    statefile = os.path.join(directory, "dask.json")
+    with open(os.path.join(directory, "dask.lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            state = {}
+            if os.path.exists(statefile):
+                with open(statefile) as f:
+                    state = json.load(f)
+            yield state
+            if state:
+                with open(statefile + ".tmp", "w") as f:
+                    json.dump(state, f)
+                os.replace(statefile + ".tmp", statefile)
+            elif os.path.exists(statefile):
+                os.remove(statefile)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _spawn(pinned):
+    """Start the service process, detached from the calling session."""
+    cmd = [sys.executable, os.path.abspath(__file__), "serve"] + (["--pin"] if pinned else [])
+    with open(os.path.join(state_dir(), "dask.log"), "a") as log:
+        proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                                start_new_session=True)
+    return proc.pid
+
+
+def _ensure_running(state, pinned):
+    # Called with the lock held: spawn a service unless a live one exists
+    if not state.get("pid") or not _is_alive(state["pid"]):
+        state.clear()
+        state.update(pid=_spawn(pinned), refs=[], pinned=pinned)
+    elif pinned:
+        state["pinned"] = True
+
+
+def _wait_for_address(timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with _locked_state() as state:
+            if state.get("address"):
+                return state["address"]
+            if not state.get("pid") or not _is_alive(state["pid"]):
+                break
+        time.sleep(0.2)
+    raise RuntimeError(f"The shared Dask cluster did not start, see {os.path.join(state_dir(), 'dask.log')}")
+
+
+def acquire(timeout=120):
+    """
+    Take a reference on the shared cluster for the calling process, starting
+    the cluster if there is none. Returns the scheduler address.
+    """
+    with _locked_state() as state:
+        _ensure_running(state, pinned=False)
+        state["refs"] = [pid for pid in state["refs"] if _is_alive(pid) and pid != os.getpid()] + [os.getpid()]
+    return _wait_for_address(timeout)
+
+
+def release():
+    """Drop the reference of the calling process on the shared cluster."""
+    with _locked_state() as state:
+        if state:
+            state["refs"] = [pid for pid in state.get("refs", []) if pid != os.getpid()]
+
+
+def _in_directory(directory, function, *args):
+    """(Worker) call function in directory, then go back to the previous working directory."""
+    previous = os.getcwd()
+    os.chdir(directory)
+    try:
+        return function(*args)
+    finally:
+        os.chdir(previous)
+
+
+def connect():
+    """
+    Return a dask Client connected to the shared cluster. Until disconnect,
+    the DistRDF tasks submitted through it run in the working directory of
+    the caller, since the tests refer to their input files with relative
+    paths.
+    """
+    from dask.distributed import Client
+
+    client = Client(acquire())
+    client.wait_for_workers(N_WORKERS)
+
+    directory = os.getcwd()
+
+    def ProcessAndMerge(original, backend, ranges, mapper, reducer):
+        if getattr(backend, "client", None) is client:
+            mapper = functools.partial(_in_directory, directory, mapper)
+            reducer = functools.partial(_in_directory, directory, reducer)
+        return original(backend, ranges, mapper, reducer)
+
+    pickle_by_value(sys.modules[__name__])
+    session = contextlib.ExitStack()
+    session.enter_context(process_and_merge(ProcessAndMerge))
+    _sessions[id(client)] = session
+    return client
+
+
+def disconnect(client):
+    """Close a client returned by connect and drop its reference on the shared cluster."""
+    _sessions.pop(id(client)).close()
+    client.close()
+    release()
+
+
+def serve(pinned):
+    """Run the cluster until it is stopped or, if not pinned, left unused."""
+    from dask.distributed import LocalCluster
+
+    stop = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.append(signum))
+
+    cluster = LocalCluster(**CLUSTER_OPTIONS)
+    with _locked_state() as state:
+        state.update(pid=os.getpid(), address=cluster.scheduler_address)
+        state.setdefault("refs", [])
+        state["pinned"] = state.get("pinned", False) or pinned
+    print(f"Dask cluster running at {cluster.scheduler_address}", flush=True)
+
+    try:
+        while not stop:
+            time.sleep(1)
+            with _locked_state() as state:
+                if state.get("pid") != os.getpid() or state.get("stop"):
+                    break
+                state["refs"] = [pid for pid in state.get("refs", []) if _is_alive(pid)]
+                if state["refs"] or state.get("pinned"):
+                    state.pop("idle_since", None)
+                elif time.time() - state.setdefault("idle_since", time.time()) > linger_time():
+                    break
+    finally:
+        with _locked_state() as state:
+            if state.get("pid") == os.getpid():
+                state.clear()
+        cluster.close()
+        print("Dask cluster stopped", flush=True)
+
+
+def start(timeout=120):
+    with _locked_state() as state:
+        _ensure_running(state, pinned=True)
+    print(_wait_for_address(timeout))
+
+
+def stop(timeout=60):
+    with _locked_state() as state:
+        pid = state.get("pid")
+        if pid:
+            state["stop"] = True
+    deadline = time.time() + timeout
+    while pid and _is_alive(pid) and time.time() < deadline:
+        time.sleep(0.2)
+    if pid and _is_alive(pid):
+        os.killpg(pid, signal.SIGKILL)
+        with _locked_state() as state:
+            state.clear()
+
+
+def status():
+    with _locked_state() as state:
+        print(json.dumps(state, indent=1) if state else "not running")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared local Dask cluster for the DistRDF tests")
+    parser.add_argument("command", choices=["start", "stop", "status", "serve"])
+    parser.add_argument("--pin", action="store_true", help="(serve) keep running until stopped")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.pin)
+    else:
+        {"start": start, "stop": stop, "status": status}[args.command]()
@@ -1,23 +1,28 @@
 """
 pytest automatically loads fixtures written in a conftest.py module in the same
-folder as other tests. This module creates both a Dask cluster as well as a
-Spark cluster, on the local machine.
+folder as other tests. This module connects to the Dask cluster shared by the
+DistRDF test directories (see cluster_service.py) and creates a Spark cluster,
+on the local machine.
 """
+import os
+import sys
 from functools import partial
 
 import pytest
 
 import pyspark
-from dask.distributed import Client, LocalCluster
 
 import ROOT
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import cluster_service
+
 
 @pytest.fixture(scope="session")
 def connection():
     """
-    Creates a mock Dask cluster as well as a mock Spark cluster. Returns a tuple
-    with both connection objects.
+    Connects to the shared Dask cluster and creates a mock Spark cluster.
+    Returns a tuple with both connection objects.
 
     Note that the name of this fixture will be used to inject the result into an
     equally named variable that should be used as input argument to all tests
@@ -31,7 +36,7 @@ def connection():
         df2 = RDataFrame(10, sparkcontext=sparkcontext)
     ```
     """
-    daskconn = Client(LocalCluster(n_workers=2, threads_per_worker=1, processes=True, memory_limit="2GiB"))
+    daskconn = cluster_service.connect()
 
     conf = {"spark.master": "local[2]", "spark.driver.memory": "4g", "spark.app.name": "roottest-distrdf-common"}
     sparkconf = pyspark.SparkConf().setAll(conf.items())
@@ -39,8 +44,7 @@ def connection():
 
     yield daskconn, sparkconn
 
-    daskconn.shutdown()
-    daskconn.close()
+    cluster_service.disconnect(daskconn)
     sparkconn.stop()
 
 
@@ -0,0 +1,104 @@
+"""
+Compact results for the systematic variations of a 2D histogram.
+
+With Vary and VariationsFor, a task returns one histogram per variation, and
+each of them is pickled, sent and merged separately: a 2D histogram with
+100+ variations means 100+ objects per task. CompactVariations books the same
+content as a single 3D histogram, whose third axis is the variation: bin 1
+holds the nominal histogram, bin k + 2 the variation k. A task then returns
+one object, which the reducer merges in place with a single Add, and the
+client extracts the histogram of a variation only when it is asked for.
+
+Usage, equivalent to VariationsFor(df.Vary("x", expr, nVariations=n).Histo2D(model, "x", "y")):
+    compact = CompactVariations(df, "x", expr, n)
+    histos = compact.Histo2D(model, "x", "y")
+    histos["nominal"], histos["x:0"], ...
+"""
+import itertools
+
+_counter = itertools.count()
+
+
+class CompactResult:
+    """The histograms of the variations of a CompactVariations.Histo2D, with the keys of VariationsFor."""
+
+    def __init__(self, result, keys):
+        self.result = result
+        self._keys = keys
+
+    def GetValue(self):
+        """The 3D histogram holding all the variations."""
+        return self.result.GetValue()
+
+    def GetKeys(self):
+        return list(self._keys)
+
+    def __getitem__(self, key):
+        """The 2D histogram of one variation, projected from the 3D histogram."""
+        import ROOT
+
+        h3 = self.GetValue()
+        zbin = self._keys.index(key) + 1
+        h3.GetZaxis().SetRange(zbin, zbin)
+        try:
+            h2 = h3.Project3D("yx")
+        finally:
+            h3.GetZaxis().SetRange()
+        h2.SetDirectory(ROOT.nullptr)
+        h2.SetName(f"{h3.GetName()}_{key}")
+        return h2
+
+
+class CompactVariations:
+    """
+    The variations of column, computed from expression as for
+    df.Vary(column, expression, nVariations=nvariations, variationTags=tags),
+    booked in compact histograms.
+    """
+
+    def __init__(self, df, column, expression, nvariations, tags=None):
+        self.column = column
+        self.nvariations = nvariations
+        self.tags = [str(tag) for tag in tags] if tags else [str(i) for i in range(nvariations)]
+        if len(self.tags) != nvariations:
+            raise ValueError(f"{len(self.tags)} tags for {nvariations} variations")
+        self.prefix = f"roottest_compact_{next(_counter)}"
+        size = nvariations + 1
+        # The nominal value followed by the variations
+        self.df = df.Define(f"{self.prefix}_{column}", f"""
+            const auto variations = {expression};
+            if (variations.size() != {nvariations})
+               throw std::runtime_error("{column}: expected {nvariations} variations");
+            ROOT::RVecD values({size});
+            values[0] = {column};
+            for (std::size_t i = 0; i < {nvariations}; ++i)
+               values[i + 1] = variations[i];
+            return values;""").Define(f"{self.prefix}_index", f"""
+            ROOT::RVecD index({size});
+            for (std::size_t i = 0; i < {size}; ++i)
+               index[i] = i;
+            return index;""")
+
+    def keys(self):
+        return ["nominal"] + [f"{self.column}:{tag}" for tag in self.tags]
+
+    def _values(self, column):
+        """The column of the values of column for every variation, repeated if it does not vary."""
+        if column == self.column:
+            return f"{self.prefix}_{column}"
+        name = f"{self.prefix}_{column}_repeated"
+        if name not in self.df.GetColumnNames():
+            self.df = self.df.Define(name, f"ROOT::RVecD({self.nvariations + 1}, {column})")
+        return name
+
+    def Histo2D(self, model, xcolumn, ycolumn):
+        """
+        The nominal and varied histograms of ycolumn against xcolumn, for
+        model = (name, title, nx, xlow, xup, ny, ylow, yup).
+        """
+        name, title, nx, xlow, xup, ny, ylow, yup = model
+        size = self.nvariations + 1
+        xs, ys = self._values(xcolumn), self._values(ycolumn)
+        h3 = self.df.Histo3D((name, title, nx, xlow, xup, ny, ylow, yup, size, -0.5, size - 0.5),
+                             xs, ys, f"{self.prefix}_index")
+        return CompactResult(h3, self.keys())
@@ -0,0 +1,84 @@
+import os
+import shutil
+import sys
+import time
+
+import pytest
+
+import ROOT
+from DistRDF.Backends import Dask
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import partition_planning
+
+TREENAME = "distrdf_check_empty_files_dask_tree"
+NFILES = 1000
+# One file in NONEMPTY_EVERY has entries
+NONEMPTY_EVERY = 100
+ENTRIES = 100
+# Seconds for reading the headers of the NFILES files and planning the ranges
+PLANNING_BUDGET = 10.
+
+
+@pytest.fixture(scope="class")
+def mostly_empty_dataset(tmp_path_factory):
+    """NFILES files, of which one in NONEMPTY_EVERY has ENTRIES entries and the others an empty tree."""
+    directory = tmp_path_factory.mktemp("empty_files")
+    templates = {}
+    for entries in (0, ENTRIES):
+        templates[entries] = str(directory / f"template_{entries}.root")
+        ROOT.RDataFrame(entries).Define("x", "rdfentry_").Snapshot(TREENAME, templates[entries], ["x"])
+    filenames = []
+    for i in range(NFILES):
+        filename = str(directory / f"file_{i}.root")
+        shutil.copyfile(templates[ENTRIES if i % NONEMPTY_EVERY == 0 else 0], filename)
+        filenames.append(filename)
+    yield filenames
+    shutil.rmtree(str(directory), ignore_errors=True)
+
+
+class TestDaskEmptyFiles:
+    """Dropping the files without entries before planning the ranges of a distributed RDataFrame"""
+
+    def test_nonempty(self, mostly_empty_dataset):
+        """Only the files with entries are kept, in order, with their tree name."""
+        treenames, filenames = partition_planning.nonempty(TREENAME, mostly_empty_dataset)
+        assert filenames == mostly_empty_dataset[::NONEMPTY_EVERY]
+        assert treenames == [TREENAME] * len(filenames)
+
+        # Files without the tree count as empty
+        mixed = ["missing_tree"] * 3 + [TREENAME] * 3
+        treenames, filenames = partition_planning.nonempty(mixed, mostly_empty_dataset[:6])
+        assert (treenames, filenames) == ([TREENAME], mostly_empty_dataset[:1])
+
+    def test_scheduled_tasks_and_planning_time(self, connection, mostly_empty_dataset):
+        """
+        With one partition per file, the whole dataset schedules a task for
+        every file; after dropping the empty files, only the files with
+        entries get a task. Reading the headers of the files and planning the
+        ranges stays within PLANNING_BUDGET.
+        """
+        with partition_planning.planning() as plan:
+            df = Dask.RDataFrame(TREENAME, mostly_empty_dataset, daskclient=connection, npartitions=NFILES)
+            plan.trigger(df.Count())
+        unpruned_tasks = len(plan.ranges)
+
+        start = time.perf_counter()
+        with partition_planning.planning() as plan:
+            _, filenames = partition_planning.nonempty(TREENAME, mostly_empty_dataset)
+            df = Dask.RDataFrame(TREENAME, filenames, daskclient=connection, npartitions=len(filenames))
+            plan.trigger(df.Count())
+        pruned_seconds = time.perf_counter() - start
+
+        nonempty_files = NFILES // NONEMPTY_EVERY
+        assert len(plan.ranges) == nonempty_files
+        assert unpruned_tasks > nonempty_files
+        assert pruned_seconds < PLANNING_BUDGET, f"{pruned_seconds:.2f} s to plan {NFILES} files"
+
+        # The remaining files give all the entries
+        df = Dask.RDataFrame(TREENAME, filenames, daskclient=connection, npartitions=len(filenames))
+        assert df.Count().GetValue() == nonempty_files * ENTRIES
+
+
+if __name__ == "__main__":
+    pytest.main(args=[__file__])
@@ -0,0 +1,110 @@
+import collections
+import os
+import sys
+
+import pytest
+
+import ROOT
+from DistRDF.Backends import Dask
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import jit_cache
+from jit_cache import JitCache
+
+NPARTITIONS = 8
+SAMPLES = ["sample1", "sample2", "sample3"]
+TREENAME = "Events"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """A JitCache logging to a temporary directory, uninstalled after the test."""
+    yield JitCache(str(tmp_path))
+    JitCache.uninstall()
+
+
+def assert_declared(connection, cache):
+    """
+    Check with cling that the worker processes declared the functions of the
+    cache, all of them or none, and return {pid: functions}. cling refuses a
+    second definition of a function, so a process compiling one twice fails.
+    """
+    names = sorted(cache.functions)
+    declared = jit_cache.cling_declarations(connection, names)
+    assert all(functions in ([], names) for functions in declared.values()), declared
+    assert names in declared.values(), declared
+    return declared
+
+
+@pytest.fixture(scope="class")
+def samples(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("jit_cache")
+    filenames = []
+    for sample in SAMPLES:
+        filename = str(directory / f"{sample}.root")
+        ROOT.RDataFrame(10).Define("x", "rdfentry_").Snapshot(TREENAME, filename)
+        filenames.append(filename)
+    return filenames
+
+
+class TestDaskJitCache:
+    """Checks of the worker-side cache of jitted expressions of jit_cache.py"""
+
+    def test_compiled_once_per_process(self, connection, cache):
+        """Every worker process compiles each expression once, the other tasks find it in cling."""
+        df = Dask.RDataFrame(100, daskclient=connection, npartitions=NPARTITIONS).Define("x", "rdfentry_")
+        types = {"x": "ULong64_t"}
+        df = cache.define(df, "y", "x * x", ["x"], types)
+        df = cache.filter(df, "x % 2 == 0", ["x"], types)
+        total = df.Sum("y")
+        cache.install()
+
+        assert total.GetValue() == sum(x * x for x in range(0, 100, 2))
+
+        compiled = collections.Counter(jit_cache.events(cache.directory, "compiled.log"))
+        hits = jit_cache.events(cache.directory, "hits.log")
+        # Every process compiled each function exactly once...
+        assert set(compiled.values()) == {1}, compiled
+        assert {name for _, name in compiled} == set(cache.functions)
+        # ...and ran more than one task, one event per function and task
+        events = collections.Counter(pid for pid, _ in list(compiled) + hits)
+        assert sum(events.values()) == NPARTITIONS * len(cache.functions)
+        assert all(n > len(cache.functions) for n in events.values()), events
+        # The processes where cling has the functions logged their compilation
+        declared = assert_declared(connection, cache)
+        assert {pid for pid, functions in declared.items() if functions} <= {int(pid) for pid, _ in compiled}
+
+    def test_shared_across_graphs(self, connection, cache):
+        """A second graph with the same expressions compiles nothing new."""
+        types = {"x": "ULong64_t"}
+        totals = []
+        for _ in range(2):
+            df = Dask.RDataFrame(100, daskclient=connection, npartitions=NPARTITIONS).Define("x", "rdfentry_")
+            totals.append(cache.define(df, "y", "2 * x + 1", ["x"], types).Sum("y"))
+        cache.install()
+
+        assert totals[0].GetValue() == sum(2 * x + 1 for x in range(100))
+        declared = assert_declared(connection, cache)
+        # Compiling the function again in a process would be a redefinition
+        assert totals[1].GetValue() == sum(2 * x + 1 for x in range(100))
+        assert assert_declared(connection, cache) == declared
+
+    def test_define_per_sample(self, connection, cache, samples):
+        """DefinePerSample expressions go through the cache."""
+        code = """
+        if (rdfsampleinfo_.Contains("{}")) return 1;
+        else if (rdfsampleinfo_.Contains("{}")) return 2;
+        else if (rdfsampleinfo_.Contains("{}")) return 3;
+        else return 0;
+        """.format(*SAMPLES)
+        df = Dask.RDataFrame(TREENAME, samples, daskclient=connection)
+        df = cache.define_per_sample(df, "sampleid", code)
+        counts = [df.Filter(f"sampleid == {i}").Count() for i in (1, 2, 3)]
+        cache.install()
+
+        assert [count.GetValue() for count in counts] == [10, 10, 10]
+        assert_declared(connection, cache)
+
+
+if __name__ == "__main__":
+    pytest.main(args=[__file__])
@@ -0,0 +1,99 @@
+import os
+import sys
+
+import pytest
+
+import ROOT
+from DistRDF.Backends import Dask
+from DistRDF.Backends.Dask import Backend
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import npartitions_policy
+from npartitions_policy import FileInfo
+
+TREENAME = "distrdf_check_npartitions_policy_dask_tree"
+
+
+def skewed(nlarge=4, nsmall=100):
+    """A few large files and many small ones, with 100 kB clusters."""
+    return [FileInfo(f"large_{i}.root", 1000000, 1000, 100000000) for i in range(nlarge)] + \
+           [FileInfo(f"small_{i}.root", 10000, 10, 1000000) for i in range(nsmall)]
+
+
+@pytest.fixture(scope="class")
+def skewed_files(tmp_path_factory):
+    """Two files of 10000 entries and eight of 100 entries, with 100 entries per cluster."""
+    directory = tmp_path_factory.mktemp("npartitions_policy")
+    opts = ROOT.RDF.RSnapshotOptions()
+    opts.fAutoFlush = 100
+    filenames = []
+    for i, entries in enumerate([10000] * 2 + [100] * 8):
+        filename = str(directory / f"file_{i}.root")
+        ROOT.RDataFrame(entries).Define("x", "rdfentry_").Snapshot(TREENAME, filename, ["x"], opts)
+        filenames.append(filename)
+    return filenames
+
+
+class TestDaskNpartitionsPolicy:
+    """Checks of the cluster-aware npartitions policy of npartitions_policy.py"""
+
+    def test_cores_as_optimize_npartitions(self, connection):
+        """The policy counts the cores of the cluster as the backend does."""
+        backend = Backend.DaskBackend(daskclient=connection)
+        assert npartitions_policy.cluster_cores(connection) == backend.optimize_npartitions()
+
+    def test_small_dataset_uses_cores(self):
+        """A dataset processed in less than the target duration gets one task per core."""
+        files = [FileInfo(f"f{i}.root", 1000, 10, 10000) for i in range(10)]
+        assert npartitions_policy.npartitions(files, 2, bytes_per_second=1e6, target_seconds=1.) == 2
+
+    def test_large_dataset_targets_duration(self):
+        """Evenly sized files are split into tasks of about the target duration."""
+        files = [FileInfo(f"f{i}.root", 100000, 100, 10000000) for i in range(10)]
+        n = npartitions_policy.npartitions(files, 4, bytes_per_second=10e6, target_seconds=1.)
+        assert n == 12  # 10 tasks of 1 s, rounded up to a multiple of 4 cores
+
+    def test_skewed_dataset_splits_largest_file(self):
+        """The largest file is split into pieces of the target duration."""
+        files = skewed()
+        n = npartitions_policy.npartitions(files, 2, bytes_per_second=50e6, target_seconds=1.,
+                                           max_tasks_per_core=1000)
+        assert n % 2 == 0
+        # Every file gets n / len(files) partitions
+        assert files[0].bytes / (n / len(files)) <= 50e6
+
+    def test_limits(self):
+        """No more tasks than clusters, nor than max_tasks_per_core per core."""
+        files = skewed()
+        clusters = sum(f.clusters for f in files)
+        assert npartitions_policy.npartitions(files, 2, bytes_per_second=1., target_seconds=1.,
+                                              max_tasks_per_core=10**6) == clusters
+        assert npartitions_policy.npartitions(files, 2, bytes_per_second=1., target_seconds=1.,
+                                              max_tasks_per_core=8) == 16
+        assert npartitions_policy.npartitions([], 2, bytes_per_second=1.) == 2
+
+    def test_describe(self, skewed_files):
+        """The files are described with their entries, clusters and bytes."""
+        files = npartitions_policy.describe(TREENAME, skewed_files)
+        assert [f.entries for f in files] == [10000] * 2 + [100] * 8
+        assert [f.clusters for f in files] == [100] * 2 + [1] * 8
+        assert all(f.bytes > 0 for f in files)
+        assert files[0].bytes > files[-1].bytes
+
+    def test_results_with_policy(self, connection, skewed_files):
+        """A skewed dataset gives the same result with the policy as with the default npartitions."""
+        files = npartitions_policy.describe(TREENAME, skewed_files)
+        cores = npartitions_policy.cluster_cores(connection)
+        # A throughput low enough for the large files to be split
+        n = npartitions_policy.npartitions(files, cores, bytes_per_second=files[0].bytes / 4, target_seconds=1.)
+        assert n > cores
+
+        expected = sum(sum(range(f.entries)) for f in files)
+        for npartitions in (None, n):
+            kwargs = {"npartitions": npartitions} if npartitions else {}
+            df = Dask.RDataFrame(TREENAME, skewed_files, daskclient=connection, **kwargs)
+            assert df.Sum("x").GetValue() == expected
+
+
+if __name__ == "__main__":
+    pytest.main(args=[__file__])
@@ -0,0 +1,101 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+import ROOT
+from DistRDF.Backends import Dask
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import partition_planning
+
+# Number of files of the main chain, and of its friend chain
+NFILES = [50, 100, 200, 400]
+ENTRIES_PER_FILE = 200
+# Entries per cluster
+AUTOFLUSH = 10
+MAIN_TREE = "distrdf_check_partition_planning_dask_main"
+FRIEND_TREE = "distrdf_check_partition_planning_dask_friend"
+# The least-squares slope of log(time) against log(files) must stay well below 2
+MAX_SLOPE = 1.5
+
+
+@pytest.fixture(scope="class")
+def planning_dataset(tmp_path_factory):
+    """
+    Write max(NFILES) files for the main and for the friend chains, with
+    ENTRIES_PER_FILE / AUTOFLUSH clusters each. The files of a chain are copies
+    of one file, which keeps the set-up short.
+    """
+    directory = tmp_path_factory.mktemp("partition_planning")
+    opts = ROOT.RDF.RSnapshotOptions()
+    opts.fAutoFlush = AUTOFLUSH
+    df = ROOT.RDataFrame(ENTRIES_PER_FILE).Define("x", "rdfentry_")
+    files = {}
+    for treename in (MAIN_TREE, FRIEND_TREE):
+        template = str(directory / f"{treename}.root")
+        df.Snapshot(treename, template, ["x"], opts)
+        files[treename] = []
+        for i in range(max(NFILES)):
+            filename = str(directory / f"{treename}_{i}.root")
+            shutil.copyfile(template, filename)
+            files[treename].append(filename)
+    yield files
+    shutil.rmtree(str(directory), ignore_errors=True)
+
+
+def create_chain(files, nfiles):
+    main = ROOT.TChain(MAIN_TREE)
+    for filename in files[MAIN_TREE][:nfiles]:
+        main.Add(filename)
+    friend = ROOT.TChain(FRIEND_TREE)
+    for filename in files[FRIEND_TREE][:nfiles]:
+        friend.Add(filename)
+    main.AddFriend(friend, "friend")
+    # Keep the friend alive as long as the main chain
+    main._friend = friend
+    return main
+
+
+def planning_time(connection, files, nfiles, repetitions=3):
+    """Best client-side planning time of a graph on a chain of nfiles files with one partition per file."""
+    best = None
+    for _ in range(repetitions):
+        chain = create_chain(files, nfiles)
+        with partition_planning.planning() as plan:
+            df = Dask.RDataFrame(chain, daskclient=connection, npartitions=nfiles)
+            plan.trigger(df.Sum("friend.x"))
+        assert plan.ranges, "No ranges were planned"
+        if best is None or plan.seconds < best.seconds:
+            best = plan
+    return best
+
+
+class TestDaskPartitionPlanning:
+    """Client-side planning of the partitions of chains with friends scales with the number of files"""
+
+    def test_planning_scales_linearly(self, connection, planning_dataset):
+        """
+        Plan the ranges of main and friend chains of NFILES files, with many
+        clusters per file and one partition per file, without running any
+        task. The planning time must grow roughly linearly with the number of
+        files: a slope of 2 in log-log scale means that the ranges or the
+        files are handled in quadratic time.
+        """
+        # Warm-up, the first graph pays for the interpreter
+        planning_time(connection, planning_dataset, NFILES[0], repetitions=1)
+
+        plans = [planning_time(connection, planning_dataset, n) for n in NFILES]
+        for nfiles, plan in zip(NFILES, plans):
+            print(f"{nfiles} files: {plan.seconds * 1e3:.1f} ms, {len(plan.ranges)} ranges, "
+                  f"{plan.bytes_read} bytes read on the client")
+
+        slope = partition_planning.loglog_slope(NFILES, [plan.seconds for plan in plans])
+        assert slope < MAX_SLOPE, \
+            f"Planning time grows as files^{slope:.2f}: " + \
+            ", ".join(f"{n} files: {plan.seconds:.3f} s" for n, plan in zip(NFILES, plans))
+
+
+if __name__ == "__main__":
+    pytest.main(args=[__file__])
@@ -0,0 +1,62 @@
+import os
+import sys
+
+import pytest
+
+import ROOT
+
+import DistRDF
+from DistRDF.Backends import Dask
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import serialization_stats
+
+
+class TestSerializationDask:
+    """
+    Upper bounds on the serialized size of the tasks and partial results of
+    the Dask backend (see serialization_stats.py), to catch payload blow-ups.
+    """
+
+    def test_task_payloads(self, connection, tmp_path):
+        """Every task carries the computation graph, which stays small for a simple graph."""
+        with serialization_stats.recording(str(tmp_path)) as stats:
+            df = Dask.RDataFrame(100, daskclient=connection, npartitions=4).Define("x", "double(rdfentry_)")
+            histos = [df.Histo1D((f"h{i}", "", 64, 0, 100), "x") for i in range(10)]
+            assert histos[0].GetEntries() == 100
+
+        summary = stats.summary()
+        assert summary["tasks"] == 4
+        assert summary["results"] == 4
+        assert 0 < summary["graph_bytes_max"] <= summary["task_bytes_max"] < 256 * 1024
+        assert 0 < summary["result_bytes_max"] < 256 * 1024
+
+    def test_variations_results(self, connection, tmp_path):
+        """The partial results of a histogram with 20 variations stay below 1 MB per task."""
+        nvariations = 20
+        expression = "ROOT::RVecD{" + ", ".join(f"x * {i + 1}" for i in range(nvariations)) + "}"
+        with serialization_stats.recording(str(tmp_path)) as stats:
+            df = Dask.RDataFrame(100, daskclient=connection, npartitions=2).Define("x", "double(rdfentry_ % 10)")
+            h = df.Vary("x", expression, nVariations=nvariations).Histo1D(("h", "", 100, 0, 200), "x")
+            histos = DistRDF.VariationsFor(h)
+            assert histos["nominal"].GetEntries() == 100
+
+        summary = stats.summary()
+        assert summary["results"] == 2
+        assert 0 < summary["result_bytes_max"] < 1024 * 1024
+
+    def test_large_result_is_measured(self, connection, tmp_path):
+        """A 512x512-bin TH2D returned by every task shows up in the result sizes."""
+        with serialization_stats.recording(str(tmp_path)) as stats:
+            df = Dask.RDataFrame(100, daskclient=connection, npartitions=2).Define("x", "rdfentry_ / 100.")
+            h = df.Histo2D(("h2", "", 512, 0, 1, 512, 0, 1), "x", "x")
+            assert h.GetEntries() == 100
+
+        summary = stats.summary()
+        assert summary["results"] == 2
+        assert summary["result_bytes_max"] > 512 * 512 * 8
+        assert summary["task_bytes_max"] < 256 * 1024
+
+
+if __name__ == "__main__":
+    pytest.main(args=[__file__])
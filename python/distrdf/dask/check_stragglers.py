@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+
+import pytest
+
+import ROOT
+from DistRDF.Backends import Dask
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import stragglers
+
+NENTRIES = 100000
+# Many partitions per worker, so that the healthy workers can take over the
+# tasks the slow one has not started
+NPARTITIONS = 16
+# Delay of every task of the slow worker
+DELAY = 2.
+# The slow worker may hold a task waiting behind the one it runs
+MAX_SLOW_TASKS = 2
+SLACK = 2.
+
+
+def run_graph(connection, npartitions):
+    """Run Count and Sum on one graph, return the wall time and the values."""
+    start = time.perf_counter()
+    df = Dask.RDataFrame(NENTRIES, daskclient=connection, npartitions=npartitions).Define("x", "rdfentry_")
+    count = df.Count()
+    total = df.Sum("x")
+    values = count.GetValue(), total.GetValue()
+    return time.perf_counter() - start, values
+
+
+@pytest.fixture(scope="class")
+def healthy_runtime(connection):
+    """Wall time of the graph without straggler, after a warm-up run."""
+    run_graph(connection, NPARTITIONS)
+    return min(run_graph(connection, NPARTITIONS)[0] for _ in range(2))
+
+
+@pytest.fixture
+def slow_worker(tmp_path):
+    """One worker of the cluster delays each of its tasks by DELAY seconds during the test."""
+    with stragglers.injected(DELAY, str(tmp_path)) as straggler:
+        yield straggler
+
+
+class TestDaskStragglers:
+    """Behaviour of the Dask backend with one slow worker"""
+
+    def check_each_range_once(self, straggler, npartitions):
+        tasks = straggler.tasks()
+        ranges = [task["range"] for task in tasks]
+        assert len(tasks) == npartitions
+        assert len(set(ranges)) == npartitions, f"Ranges processed more than once: {sorted(ranges)}"
+
+    def test_straggler_is_injected(self, connection, slow_worker):
+        """Exactly one worker process is slow, and its tasks set the wall time of the graph."""
+        elapsed, values = run_graph(connection, 2)
+
+        assert values == (NENTRIES, NENTRIES * (NENTRIES - 1) / 2)
+        self.check_each_range_once(slow_worker, 2)
+        slow = slow_worker.slow_tasks()
+        assert slow and all(task["pid"] == slow_worker.slow_pid() for task in slow)
+        assert elapsed >= DELAY
+
+    def test_rebalanced_within_bound(self, connection, healthy_runtime, slow_worker):
+        """
+        With many partitions per worker, the healthy workers run the tasks
+        the slow one has not taken: the graph ends within a few delays of the
+        healthy runtime instead of NPARTITIONS / workers delays, and merges
+        the result of every range exactly once.
+        """
+        elapsed, values = run_graph(connection, NPARTITIONS)
+
+        assert values == (NENTRIES, NENTRIES * (NENTRIES - 1) / 2)
+        self.check_each_range_once(slow_worker, NPARTITIONS)
+        bound = healthy_runtime + MAX_SLOW_TASKS * DELAY + SLACK
+        assert elapsed < bound, \
+            f"{elapsed:.2f} s with a straggler, {healthy_runtime:.2f} s without, " \
+            f"{len(slow_worker.slow_tasks())} of {NPARTITIONS} tasks on the slow worker"
+
+
+if __name__ == "__main__":
+    pytest.main(args=[__file__])
@@ -0,0 +1,90 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+import ROOT
+
+from DistRDF.Backends import Dask
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import worker_cache
+from worker_cache import WorkerCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """A worker cache in a fresh directory, uninstalled after the test."""
+    yield WorkerCache(str(tmp_path / "cache"))
+    WorkerCache.uninstall()
+
+
+class TestWorkerCacheDask:
+    """
+    Check the content-addressed cache of headers and shared libraries on the
+    Dask workers (see worker_cache.py).
+    """
+
+    def test_headers_sent_and_declared_once(self, connection, cache):
+        """
+        Headers already on the workers are not sent again, and every worker
+        process declares them only once however many graphs it runs.
+        """
+        cache.add_headers("../test_headers/header1.hxx", "../test_headers/headers_folder")
+        assert cache.ship(connection) > 0
+        cache.install()
+
+        for _ in range(3):
+            rdf = Dask.RDataFrame(100, daskclient=connection, npartitions=4)
+            count = rdf.Filter("check_number_less_than_5(rdfentry_)").Count()
+            histo = rdf.Filter("check_number_less_than_10(rdfentry_)").Histo1D(("name", "title", 10, 0, 100), "rdfentry_")
+            assert count.GetValue() == 5
+            assert histo.GetEntries() == 10
+            assert cache.ship(connection) == 0
+
+        digests = sorted(bundle.digest for bundle in cache.bundles)
+        received = worker_cache.events(cache.directory, "received.log")
+        declared = worker_cache.events(cache.directory, "declared.log")
+        assert sorted(digest for _, digest in received) == digests
+        assert len(declared) == len(set(declared))
+
+    def test_changed_header_is_sent_again(self, connection, cache, tmp_path):
+        """A header whose content changed gets a new digest and is sent again."""
+        header = tmp_path / "versioned.hxx"
+        header.write_text("int worker_cache_dask_v1() { return 1; }\n")
+        cache.add_headers(str(header))
+        cache.ship(connection)
+
+        header.write_text("int worker_cache_dask_v2() { return 2; }\n")
+        changed = WorkerCache(cache.directory)
+        changed.add_headers(str(header))
+        assert changed.digest_of(str(header)) != cache.digest_of(str(header))
+        assert changed.ship(connection) > 0
+        changed.install()
+
+        rdf = Dask.RDataFrame(10, daskclient=connection, npartitions=2)
+        assert rdf.Filter("worker_cache_dask_v2() == 2").Count().GetValue() == 10
+
+    def test_shared_library(self, connection, cache, tmp_path):
+        """A shared library is loaded once on the workers, with its header."""
+        libdir = tmp_path / "mylib"
+        libdir.mkdir()
+        for name in ("a.cpp", "a.h"):
+            shutil.copy(os.path.join("..", "test_shared_libraries", name), libdir)
+        assert ROOT.gSystem.CompileMacro(str(libdir / "a.cpp"), "kO", "", str(libdir))
+
+        cache.add_shared_libraries(str(libdir))
+        cache.ship(connection)
+        cache.install()
+
+        for _ in range(2):
+            rdf = Dask.RDataFrame(10, daskclient=connection, npartitions=2)
+            assert rdf.Define("y", "f(rdfentry_)").Sum("y").GetValue() == sum(i * i for i in range(10))
+
+        declared = worker_cache.events(cache.directory, "declared.log")
+        assert len(declared) == len(set(declared))
+
+
+if __name__ == "__main__":
+    pytest.main(args=[__file__])
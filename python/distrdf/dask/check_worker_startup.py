@@ -0,0 +1,80 @@
+import os
+import sys
+
+import pytest
+
+from DistRDF.Backends import Dask
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import cluster_service
+import worker_startup
+
+NENTRIES = 100000
+NPARTITIONS = 16
+# The first-task overhead of pre-warmed workers is below this fraction of that of cold ones
+MAX_WARM_FRACTION = 0.5
+
+
+@pytest.fixture
+def fresh_client():
+    """A Dask client to a private cluster, whose worker processes have not run any task yet."""
+    from dask.distributed import Client, LocalCluster
+
+    cluster = LocalCluster(**cluster_service.CLUSTER_OPTIONS)
+    client = Client(cluster)
+    yield client
+    client.close()
+    cluster.close()
+
+
+def run_graph(client, directory):
+    """Run a small graph, return the Startup of its tasks."""
+    with worker_startup.recording(str(directory)) as startup:
+        df = Dask.RDataFrame(NENTRIES, daskclient=client, npartitions=NPARTITIONS).Define("x", "rdfentry_")
+        assert df.Sum("x").GetValue() == NENTRIES * (NENTRIES - 1) / 2
+    return startup
+
+
+class TestDaskWorkerStartup:
+    """Latency of the first task of cold and pre-warmed Dask workers"""
+
+    def test_cold_workers(self, fresh_client, tmp_path):
+        """Every worker process reports one first task, slower than the steady-state tasks."""
+        startup = run_graph(fresh_client, tmp_path)
+
+        tasks = startup.tasks()
+        assert len(tasks) == NPARTITIONS
+        first = startup.first_latency()
+        assert len(first) == cluster_service.N_WORKERS
+        assert not any(task["warm"] for task in tasks)
+        steady = startup.steady_latency()
+        assert all(latency > steady for latency in first.values()), startup.summary()
+        assert startup.overhead() > 0
+
+    def test_prewarm(self, fresh_client, tmp_path_factory):
+        """
+        Pre-warming the workers of a fresh cluster, with a user function,
+        reduces the first-task overhead below MAX_WARM_FRACTION of that of
+        the cold workers of another fresh cluster.
+        """
+        from dask.distributed import Client, LocalCluster
+
+        with LocalCluster(**cluster_service.CLUSTER_OPTIONS) as cluster, Client(cluster) as cold_client:
+            cold = run_graph(cold_client, tmp_path_factory.mktemp("cold"))
+
+        def init(value):
+            import ROOT
+            ROOT.gInterpreter.ProcessLine(f"int roottest_prewarm_value = {value};")
+
+        pids = worker_startup.prewarm(fresh_client, init, 42)
+        assert len(set(pids)) == cluster_service.N_WORKERS
+        warm = run_graph(fresh_client, tmp_path_factory.mktemp("warm"))
+
+        assert all(task["warm"] for task in warm.tasks())
+        assert set(warm.first_latency()) == set(pids)
+        assert warm.overhead() < MAX_WARM_FRACTION * cold.overhead(), \
+            f"cold: {cold.summary()}, pre-warmed: {warm.summary()}"
+
+
+if __name__ == "__main__":
+    pytest.main(args=[__file__])
@@ -1,20 +1,26 @@
 """
 pytest automatically loads fixtures written in a conftest.py module in the same
-folder as other tests. This module creates a Dask cluster on the local machine.
+folder as other tests. This module connects to a Dask cluster on the local
+machine, shared with the other DistRDF test directories (see
+cluster_service.py).
 """
+import os
+import sys
 from functools import partial
 
 import pytest
 
-from dask.distributed import Client, LocalCluster
-
 import ROOT
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import cluster_service
+
 
 @pytest.fixture(scope="session")
 def connection():
     """
-    Creates a mock Dask cluster. Returns the corresponding connection object.
+    Connects to the shared local Dask cluster, starting it if needed. Returns
+    the corresponding connection object.
 
     Note that the name of this fixture will be used to inject the result into an
     equally named variable that should be used as input argument to all tests
@@ -25,10 +31,9 @@ def connection():
         df = RDataFrame(10, daskclient=connection)
     ```
     """
-    connection = Client(LocalCluster(n_workers=2, threads_per_worker=1, processes=True, memory_limit="2GiB"))
+    connection = cluster_service.connect()
     yield connection
-    connection.shutdown()
-    connection.close()
+    cluster_service.disconnect(connection)
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -13,6 +13,15 @@ from check_reducer_merge import *
 from check_rungraphs import *
 from check_variations import *
 from check_live_visualize import *
+from check_worker_cache import *
+from check_serialization import *
+from check_partition_planning import *
+from check_npartitions_policy import *
+from check_stragglers import *
+from check_jit_cache import *
+from check_empty_files import *
+from check_compact_variations import *
+from check_worker_startup import *
 
 if __name__ == "__main__":
     # The call to sys.exit is needed otherwise CTest would just ignore the
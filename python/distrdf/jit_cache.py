@@ -0,0 +1,191 @@
+"""
+Per-worker-process cache of the C++ code jitted for DistRDF string expressions.
+
+Every DistRDF task builds its RDataFrame again, so cling compiles the string
+expressions of Define, Filter and DefinePerSample, and the code declared by
+the functions given to DistRDF.initialize, once per task. With a JitCache, an
+expression is turned into an inline function, named after the session and
+the digest of the expression and of the types of its columns:
+
+    auto roottest_jit_<session>_<digest>(const ULong64_t &x) { return x * x; }
+
+The graph calls the function instead of containing the expression, and a
+worker process declares the function to cling the first time a task needs
+it. The following tasks of the process find it in the cache, whatever the
+graph they belong to; RDataFrame still jits the call of the function, which
+is short. The session part of the name keeps a session from finding the
+functions that a previous one declared in the worker processes of the shared
+cluster (see cluster_service.py), and so from compiling nothing.
+
+The declarations are made by a function registered with DistRDF.initialize,
+so installing a cache replaces any other initialization function. Each worker
+process logs the functions it declared and found in compiled.log and hits.log
+of the cache directory, one "<pid> <function>" line per event, which events()
+reads. What cling itself knows is asked to every worker process by
+cling_declarations(): as cling refuses a second definition of a function, a
+process that compiled an expression twice would fail its task.
+
+Usage:
+    cache = JitCache()
+    df = cache.define(df, "y", "x * x", ["x"])
+    df = cache.define_per_sample(df, "weight", "rdfsampleinfo_.Contains(\"mc\") ? 0.5 : 1.")
+    cache.install()
+"""
+import functools
+import hashlib
+import os
+import re
+import sys
+import types
+import uuid
+
+from backend_hooks import pickle_by_value
+
+# Part of the function names, unique to this client process
+SESSION = uuid.uuid4().hex[:8]
+
+
+def _declared():
+    """
+    The functions declared in this process. Kept in sys.modules, as the
+    workers may unpickle the functions of this module by value with every
+    task.
+    """
+    state = sys.modules.setdefault("_roottest_jit_cache", types.ModuleType("_roottest_jit_cache"))
+    if not hasattr(state, "declared"):
+        state.declared = set()
+    return state.declared
+
+
+def _log(directory, logname, name):
+    with open(os.path.join(directory, logname), "a") as f:
+        f.write(f"{os.getpid()} {name}\n")
+
+
+def declare(manifest):
+    """
+    (Worker) declare the functions of the manifest that this process has not
+    declared yet. Registered with DistRDF.initialize.
+    """
+    import ROOT
+
+    directory = manifest["directory"]
+    for name, code in manifest["functions"].items():
+        if name in _declared():
+            if directory:
+                _log(directory, "hits.log", name)
+            continue
+        if not ROOT.gInterpreter.Declare(code):
+            raise RuntimeError(f"Could not declare {name}:\n{code}")
+        _declared().add(name)
+        if directory:
+            _log(directory, "compiled.log", name)
+
+
+def _nothing():
+    pass
+
+
+def declared_in_cling(names):
+    """(Worker) the pid of this process and the functions of names that cling knows in it."""
+    import ROOT
+
+    functions = ROOT.gROOT.GetListOfGlobalFunctions()
+    return os.getpid(), sorted(name for name in names if functions.FindObject(name))
+
+
+def cling_declarations(connection, names):
+    """
+    {pid: functions of names declared to cling} of the worker processes of
+    connection, a dask Client or a SparkContext. The Spark python workers are
+    reached by a job of several tasks per core, each process answering once.
+    """
+    pickle_by_value(sys.modules[__name__])
+    probe = functools.partial(declared_in_cling, list(names))
+    if hasattr(connection, "defaultParallelism"):
+        ntasks = 4 * connection.defaultParallelism
+        answers = connection.parallelize(range(ntasks), ntasks).mapPartitions(lambda _: [probe()]).collect()
+    else:
+        answers = connection.run(probe).values()
+    return dict(answers)
+
+
+def events(directory, logname):
+    """The (pid, function) pairs logged in compiled.log or hits.log."""
+    path = os.path.join(directory, logname)
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [tuple(line.split()) for line in f if line.strip()]
+
+
+class JitCache:
+    """String expressions turned into cached functions, see the module documentation."""
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # function name -> declaration
+        self.functions = {}
+
+    def function(self, expression, parameters):
+        """
+        The name of the function returning expression, for parameters given
+        as (C++ type, name) pairs, which is added to the cache.
+        """
+        key = expression + "\0" + "\0".join(f"{ctype} {name}" for ctype, name in parameters)
+        name = f"roottest_jit_{SESSION}_" + hashlib.sha256(key.encode()).hexdigest()[:16]
+        if name not in self.functions:
+            signature = ", ".join(f"const {ctype} &{pname}" for ctype, pname in parameters)
+            body = expression if re.search(r"\breturn\b", expression) else f"return {expression};"
+            self.functions[name] = f"inline auto {name}({signature}) {{\n{body}\n}}\n"
+        return name
+
+    def _call(self, df, expression, columns, types):
+        types = types or {}
+        parameters = [(types.get(column) or df.GetColumnType(column), column) for column in columns]
+        return f"{self.function(expression, parameters)}({', '.join(columns)})"
+
+    def define(self, df, name, expression, columns, types=None):
+        """
+        df.Define(name, expression) through the cache. The expression uses
+        columns, whose types are taken from df unless given in types.
+        """
+        return df.Define(name, self._call(df, expression, columns, types))
+
+    def filter(self, df, expression, columns, types=None, filtername=""):
+        """df.Filter(expression, filtername) through the cache, see define."""
+        return df.Filter(self._call(df, expression, columns, types), filtername)
+
+    def define_per_sample(self, df, name, expression):
+        """df.DefinePerSample(name, expression) through the cache."""
+        parameters = [("unsigned int", "rdfslot_"), ("ROOT::RDF::RSampleInfo", "rdfsampleinfo_")]
+        return df.DefinePerSample(name, f"{self.function(expression, parameters)}(rdfslot_, rdfsampleinfo_)")
+
+    def declare(self, name, code):
+        """Add code declaring name, e.g. functions called by the expressions."""
+        self.functions[name] = code
+
+    def manifest(self):
+        return {"directory": self.directory, "functions": dict(self.functions)}
+
+    def install(self):
+        """
+        Declare the functions on the client and register their declaration on
+        the workers with DistRDF.initialize. Call after booking the graphs.
+        """
+        import DistRDF
+
+        manifest = self.manifest()
+        declare(dict(manifest, directory=None))
+        pickle_by_value(sys.modules[__name__])
+        DistRDF.initialize(declare, manifest)
+
+    @staticmethod
+    def uninstall():
+        """Remove the initialization function registered by install."""
+        import DistRDF
+
+        pickle_by_value(sys.modules[__name__])
+        DistRDF.initialize(_nothing)
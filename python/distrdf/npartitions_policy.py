@@ -0,0 +1,85 @@
+"""
+A cluster-aware choice of npartitions for distributed RDataFrames.
+
+When npartitions is not given, the DistRDF backends use the number of cores of
+the cluster (optimize_npartitions). On datasets made of files of very
+different sizes this gives unbalanced tasks: the ranges are spread evenly over
+the files of the dataset, not over its bytes, so the tasks reading the large
+files run much longer than the others and the cluster idles until they end.
+
+npartitions() aims instead at tasks of a target duration, from a description
+of the files of the dataset (entries, clusters and bytes, see describe()) and
+an estimate of the processing throughput:
+
+ * enough tasks for the whole dataset to be processed in tasks of the target
+   duration;
+ * enough tasks for the largest file to be split into pieces of the target
+   duration, as every file gets the same number of partitions;
+ * at least one task per core, and a multiple of the number of cores, so
+   that the last wave of tasks keeps every core busy;
+ * at most one task per cluster, as the ranges do not split clusters, and at
+   most max_tasks_per_core tasks per core, to bound the scheduling overhead.
+
+DistRDF is part of ROOT; this module lets the tests and benchmarks of
+roottest evaluate the policy before it moves there.
+
+Usage:
+    files = npartitions_policy.describe("tree", filenames)
+    n = npartitions_policy.npartitions(files, npartitions_policy.cluster_cores(client),
+                                       bytes_per_second=50e6, target_seconds=1.)
+"""
+import collections
+import math
+
+FileInfo = collections.namedtuple("FileInfo", ["name", "entries", "clusters", "bytes"])
+
+
+def describe(treename, filenames):
+    """Entries, clusters and compressed bytes of the tree in every file."""
+    import ROOT
+
+    infos = []
+    for filename in filenames:
+        f = ROOT.TFile.Open(filename)
+        if not f or f.IsZombie():
+            raise OSError(f"Could not open {filename}")
+        try:
+            tree = f.Get(treename)
+            if not tree:
+                raise KeyError(f"No tree {treename} in {filename}")
+            entries = tree.GetEntries()
+            clusters = 0
+            iterator = tree.GetClusterIterator(0)
+            while iterator.Next() < entries:
+                clusters += 1
+            infos.append(FileInfo(filename, entries, clusters, tree.GetZipBytes()))
+        finally:
+            f.Close()
+    return infos
+
+
+def cluster_cores(connection):
+    """The number of cores of a dask Client or SparkContext, as optimize_npartitions counts them."""
+    if hasattr(connection, "defaultParallelism"):
+        return connection.defaultParallelism
+    return sum(connection.ncores().values())
+
+
+def npartitions(files, cores, bytes_per_second, target_seconds=1., max_tasks_per_core=64):
+    """
+    The number of partitions for processing files (FileInfo) with tasks of
+    about target_seconds on cores cores, at bytes_per_second per core.
+    """
+    if not files:
+        return max(cores, 1)
+    cores = max(cores, 1)
+    target_bytes = max(bytes_per_second * target_seconds, 1.)
+    total_bytes = sum(f.bytes for f in files)
+    largest = max(f.bytes for f in files)
+
+    n = max(cores, math.ceil(total_bytes / target_bytes))
+    if largest > target_bytes:
+        n = max(n, len(files) * math.ceil(largest / target_bytes))
+    n = cores * math.ceil(n / cores)
+    limit = min(sum(max(f.clusters, 1) for f in files), max_tasks_per_core * cores)
+    return max(1, min(n, limit))
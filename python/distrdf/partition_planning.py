@@ -0,0 +1,108 @@
+"""
+Client-side cost of planning the partitions of a distributed RDataFrame.
+
+Before the first task runs, the client builds the dataset description of the
+head node, splits it into ranges and, depending on the ROOT version, opens
+the files of the chain and of its friends to read their entries and
+clusters. planning() measures that part only: the ProcessAndMerge method
+of the Dask and Spark backends, which receives the ranges and dispatches the
+tasks, is replaced for the duration of the measurement by one that records
+the ranges and stops the execution.
+
+Datasets often contain many files without entries, and every one of them
+still becomes part of a task. nonempty() drops them up front, reading only
+the header of the tree of every file.
+
+Usage:
+    with partition_planning.planning() as plan:
+        df = Dask.RDataFrame(chain, daskclient=client, npartitions=100)
+        plan.trigger(df.Count())
+    plan.seconds, plan.ranges
+
+    treenames, filenames = partition_planning.nonempty(treenames, filenames)
+"""
+import contextlib
+import math
+import time
+
+from backend_hooks import process_and_merge
+
+
+class Dispatched(Exception):
+    """Raised instead of sending the tasks, once the ranges are known."""
+
+
+class Plan:
+    """The time spent on the client until the tasks are dispatched."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.seconds = None
+        self.ranges = None
+        self.bytes_read = None
+
+    def trigger(self, result):
+        """Start the execution of the graph of result, up to the dispatch of its tasks."""
+        try:
+            result.GetValue()
+        except Dispatched:
+            return self
+        raise RuntimeError("The graph ran without going through ProcessAndMerge")
+
+
+@contextlib.contextmanager
+def planning():
+    """
+    Yield a Plan whose clock starts now, and stops when a backend is asked to
+    process the ranges of a graph. Create the RDataFrame inside the block, so
+    that the construction of the head node is part of the measurement.
+    """
+    import ROOT
+
+    bytes_before = ROOT.TFile.GetFileBytesRead()
+    plan = Plan()
+
+    def ProcessAndMerge(original, backend, ranges, mapper, reducer):
+        plan.seconds = time.perf_counter() - plan.start
+        plan.bytes_read = ROOT.TFile.GetFileBytesRead() - bytes_before
+        plan.ranges = list(ranges)
+        raise Dispatched()
+
+    with process_and_merge(ProcessAndMerge):
+        yield plan
+
+
+def nonempty(treenames, filenames):
+    """
+    The tree names and file names, as two lists, of the files whose tree has
+    entries. treenames is a name for all files or a list with one name per
+    file; files without the tree count as empty.
+    """
+    import ROOT
+
+    if isinstance(treenames, str):
+        treenames = [treenames] * len(filenames)
+    kept_treenames, kept_filenames = [], []
+    for treename, filename in zip(treenames, filenames):
+        # Not registered in gROOT's list of files, which is slow to update with many files
+        f = ROOT.TFile.Open(filename, "READ_WITHOUT_GLOBALREGISTRATION")
+        if not f or f.IsZombie():
+            raise OSError(f"Could not open {filename}")
+        try:
+            tree = f.Get(treename)
+            if tree and tree.GetEntries() > 0:
+                kept_treenames.append(treename)
+                kept_filenames.append(filename)
+        finally:
+            f.Close()
+    return kept_treenames, kept_filenames
+
+
+def loglog_slope(sizes, times):
+    """Least-squares slope of log(times) against log(sizes): ~1 for linear, ~2 for quadratic growth."""
+    xs = [math.log(s) for s in sizes]
+    ys = [math.log(max(t, 1e-9)) for t in times]
+    xmean, ymean = sum(xs) / len(xs), sum(ys) / len(ys)
+    num = sum((x - xmean) * (y - ymean) for x, y in zip(xs, ys))
+    den = sum((x - xmean) ** 2 for x in xs)
+    return num / den
@@ -0,0 +1,118 @@
+"""
+Serialized sizes and (de)serialization times of DistRDF tasks and results.
+
+Within a `recording()` block, the ProcessAndMerge method of the Dask and
+Spark backends is instrumented:
+
+ * on the client, for every task: the size of the pickled mapper, which
+   carries the computation graph, and of the pickled (mapper, range) task
+   payload, with the time to pickle and unpickle the payload;
+ * on the workers, for every partial result returned by a mapper: its
+   pickled size and the time to pickle and unpickle it. The workers append
+   these records to files in the directory of the recording, so the
+   recording has to be read from a file system the workers share with the
+   client, as for local clusters.
+
+Payloads are pickled with cloudpickle, as the backends do. Measuring the
+results pickles them once more on the workers, so instrumented runs are
+slower.
+
+Usage:
+    with serialization_stats.recording(directory) as stats:
+        histo.GetValue()
+    stats.tasks, stats.results()
+"""
+import contextlib
+import functools
+import os
+import sys
+import tempfile
+import time
+
+from backend_hooks import append_record, pickle_by_value, process_and_merge, read_records
+
+
+def _cloudpickle():
+    try:
+        import cloudpickle
+    except ImportError:
+        from pyspark import cloudpickle
+    return cloudpickle
+
+
+def _timed_roundtrip(obj):
+    """Pickled size, pickling and unpickling times of obj."""
+    pickler = _cloudpickle()
+    start = time.perf_counter()
+    data = pickler.dumps(obj)
+    dumps = time.perf_counter() - start
+    start = time.perf_counter()
+    pickler.loads(data)
+    loads = time.perf_counter() - start
+    return len(data), dumps, loads
+
+
+def _instrumented_mapper(mapper, directory, current_range):
+    """(Worker) run the mapper and record the serialization of its result."""
+    start = time.perf_counter()
+    result = mapper(current_range)
+    elapsed = time.perf_counter() - start
+    nbytes, dumps, loads = _timed_roundtrip(result)
+    record = {"range": getattr(current_range, "id", None), "bytes": nbytes, "dumps": dumps, "loads": loads,
+              "mapper": elapsed, "pid": os.getpid()}
+    append_record(directory, "results", record)
+    return result
+
+
+class Recording:
+    """The serialization records of a recording() block."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.tasks = []
+
+    def results(self):
+        """The records of the partial results, read from the worker files."""
+        return read_records(self.directory, "results")
+
+    def summary(self):
+        """Largest and total sizes in bytes, and total times in seconds."""
+        results = self.results()
+        return {
+            "tasks": len(self.tasks),
+            "graph_bytes_max": max((t["graph_bytes"] for t in self.tasks), default=0),
+            "task_bytes_max": max((t["bytes"] for t in self.tasks), default=0),
+            "task_bytes_total": sum(t["bytes"] for t in self.tasks),
+            "task_dumps_total": sum(t["dumps"] for t in self.tasks),
+            "task_loads_total": sum(t["loads"] for t in self.tasks),
+            "results": len(results),
+            "result_bytes_max": max((r["bytes"] for r in results), default=0),
+            "result_bytes_total": sum(r["bytes"] for r in results),
+            "result_dumps_total": sum(r["dumps"] for r in results),
+            "result_loads_total": sum(r["loads"] for r in results),
+        }
+
+
+@contextlib.contextmanager
+def recording(directory=None):
+    """
+    Instrument the DistRDF backends and yield the Recording of what runs in
+    the block. The records of the workers go to directory, by default a new
+    temporary directory.
+    """
+    directory = directory or tempfile.mkdtemp(prefix="roottest-distrdf-serialization-")
+    os.makedirs(directory, exist_ok=True)
+    stats = Recording(directory)
+
+    def ProcessAndMerge(original, backend, ranges, mapper, reducer):
+        ranges = list(ranges)
+        graph_bytes, _, _ = _timed_roundtrip(mapper)
+        for current_range in ranges:
+            nbytes, dumps, loads = _timed_roundtrip((mapper, current_range))
+            stats.tasks.append({"range": getattr(current_range, "id", None), "graph_bytes": graph_bytes,
+                                "bytes": nbytes, "dumps": dumps, "loads": loads})
+        return original(backend, ranges, functools.partial(_instrumented_mapper, mapper, directory), reducer)
+
+    pickle_by_value(sys.modules[__name__])
+    with process_and_merge(ProcessAndMerge):
+        yield stats
@@ -0,0 +1,103 @@
+import os
+import sys
+
+import pytest
+
+import ROOT
+
+import DistRDF
+from DistRDF.Backends import Spark
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from compact_variations import CompactVariations
+from perfcommon import RSSSampler
+
+NENTRIES = 10000
+NPARTITIONS = 4
+MODEL = ("h", "", 50, -2, 2, 50, -2, 2)
+# Histogram and numbers of variations of the memory test, whose compact
+# result grows by about 33 MB from the first to the last
+MEMORY_MODEL = ("h", "", 150, -2, 2, 150, -2, 2)
+NVARIATIONS = [10, 50, 100, 200]
+# Allowed growth of the client peak memory: copies of the compact result, plus
+# a slack well below the growth of one copy, so that an extra copy fails
+RESULT_COPIES = 3
+SLACK_MB = 10.
+
+
+def variations(nvariations):
+    return "ROOT::RVecD{" + ", ".join(f"x * {1. + 0.01 * (i + 1)}" for i in range(nvariations)) + "}"
+
+
+def compact_mb(nvariations):
+    """Size of the bins of the compact result of MEMORY_MODEL."""
+    nx, ny = MEMORY_MODEL[2], MEMORY_MODEL[5]
+    return (nx + 2) * (ny + 2) * (nvariations + 3) * 8 / 1024 ** 2
+
+
+def dataframe(connection):
+    return Spark.RDataFrame(NENTRIES, sparkcontext=connection, npartitions=NPARTITIONS) \
+               .Define("x", "sin(rdfentry_)").Define("y", "cos(rdfentry_)")
+
+
+def bins(histo):
+    """Contents of the bins within the axis ranges."""
+    return [histo.GetBinContent(i, j) for i in range(1, histo.GetNbinsX() + 1) for j in range(1, histo.GetNbinsY() + 1)]
+
+
+class TestSparkCompactVariations:
+    """Systematic variations of a 2D histogram booked in one compact result per task"""
+
+    def test_same_as_variationsfor(self, connection):
+        """Every variation has the same bins and keys as with Vary and VariationsFor."""
+        nvariations = 5
+        df = dataframe(connection)
+        compact = CompactVariations(df, "x", variations(nvariations), nvariations).Histo2D(MODEL, "x", "y")
+        h = df.Vary("x", variations(nvariations), nVariations=nvariations).Histo2D(MODEL, "x", "y")
+        expected = DistRDF.VariationsFor(h)
+
+        assert sorted(compact.GetKeys()) == sorted(str(key) for key in expected.GetKeys())
+        for key in compact.GetKeys():
+            histo = compact[key]
+            assert isinstance(histo, ROOT.TH2D)
+            assert bins(histo) == bins(expected[key])
+        assert compact["nominal"].Integral() == NENTRIES
+
+    def test_tags_and_varied_y(self, connection):
+        """The variations can have tags and vary the y column."""
+        df = dataframe(connection)
+        compact = CompactVariations(df, "y", "ROOT::RVecD{y - 1, y + 1}", 2, tags=["down", "up"])
+        histos = compact.Histo2D(MODEL, "x", "y")
+
+        assert histos.GetKeys() == ["nominal", "y:down", "y:up"]
+        assert histos["y:down"].GetMean(2) == pytest.approx(histos["nominal"].GetMean(2) - 1, abs=0.05)
+        assert histos["y:up"].GetMean(1) == pytest.approx(histos["nominal"].GetMean(1))
+
+    def test_client_peak_memory(self, connection):
+        """
+        The client peak memory grows with the number of variations by at most
+        RESULT_COPIES times the size of the compact result, while the
+        histograms of all the variations are retrieved one at a time.
+        """
+        def peak_increase(nvariations):
+            with RSSSampler() as rss:
+                df = dataframe(connection)
+                compact = CompactVariations(df, "x", variations(nvariations), nvariations)
+                histos = compact.Histo2D(MEMORY_MODEL, "x", "y")
+                assert histos.GetValue().GetEntries() == NENTRIES * (nvariations + 1)
+                for key in histos.GetKeys():
+                    assert histos[key].Integral() > 0
+            return rss.increase
+
+        # Warm-up, pays for the jitting
+        peak_increase(NVARIATIONS[0])
+        increases = [peak_increase(n) for n in NVARIATIONS]
+        allowed = RESULT_COPIES * (compact_mb(NVARIATIONS[-1]) - compact_mb(NVARIATIONS[0])) + SLACK_MB
+        growth = increases[-1] - increases[0]
+        assert growth <= allowed, \
+            f"Client peak memory grew by {growth:.1f} MB for {NVARIATIONS} variations: {increases}"
+
+
+if __name__ == "__main__":
+    pytest.main(args=[__file__])
@@ -0,0 +1,96 @@
+"""
+Artificial stragglers for the DistRDF tests.
+
+Within an injected() block, the ProcessAndMerge method of the Dask and Spark
+backends wraps the mapper of every task, so that on the workers:
+
+ * the first worker process to run a task becomes the slow worker, by
+   creating the file slow.pid in the directory of the block;
+ * every task run by the slow worker sleeps for the given delay first;
+ * every task appends its range id, process id and whether it was delayed to
+   a tasks-<pid>.jsonl file of the directory.
+
+A Dask worker runs its tasks in one process; the Python workers of a Spark
+executor are reused from task to task, so the slow worker stays slow for the
+whole block. The directory has to be shared by the workers and the client, as
+for local clusters.
+
+Usage:
+    with stragglers.injected(delay=2.) as straggler:
+        df.Count().GetValue()
+    straggler.tasks(), straggler.slow_tasks()
+"""
+import contextlib
+import functools
+import os
+import sys
+import tempfile
+import time
+
+from backend_hooks import append_record, pickle_by_value, process_and_merge, read_records
+
+
+def _is_slow(directory):
+    """(Worker) whether this process is the slow worker, claiming the role if nobody has it."""
+    token = os.path.join(directory, "slow.pid")
+    try:
+        fd = os.open(token, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        with open(token) as f:
+            return f.read().strip() == str(os.getpid())
+    with os.fdopen(fd, "w") as f:
+        f.write(str(os.getpid()))
+    return True
+
+
+def _delayed_mapper(mapper, directory, delay, current_range):
+    """(Worker) run the mapper, after the delay on the slow worker, and record the task."""
+    slow = _is_slow(directory)
+    if slow:
+        time.sleep(delay)
+    result = mapper(current_range)
+    record = {"range": getattr(current_range, "id", None), "pid": os.getpid(), "slow": slow}
+    append_record(directory, "tasks", record)
+    return result
+
+
+class Straggler:
+    """The tasks run within an injected() block."""
+
+    def __init__(self, directory, delay):
+        self.directory = directory
+        self.delay = delay
+
+    def tasks(self):
+        """The records of the tasks, read from the worker files."""
+        return read_records(self.directory, "tasks")
+
+    def slow_tasks(self):
+        return [task for task in self.tasks() if task["slow"]]
+
+    def slow_pid(self):
+        """The process id of the slow worker, None if no task ran."""
+        token = os.path.join(self.directory, "slow.pid")
+        if not os.path.exists(token):
+            return None
+        with open(token) as f:
+            return int(f.read())
+
+
+@contextlib.contextmanager
+def injected(delay, directory=None):
+    """
+    Make one worker process delay each of its tasks by delay seconds within
+    the block, and yield the Straggler recording the tasks. The directory is
+    by default a new temporary one.
+    """
+    directory = directory or tempfile.mkdtemp(prefix="roottest-distrdf-stragglers-")
+    os.makedirs(directory, exist_ok=True)
+    straggler = Straggler(directory, delay)
+
+    def ProcessAndMerge(original, backend, ranges, mapper, reducer):
+        return original(backend, ranges, functools.partial(_delayed_mapper, mapper, directory, delay), reducer)
+
+    pickle_by_value(sys.modules[__name__])
+    with process_and_merge(ProcessAndMerge):
+        yield straggler
@@ -0,0 +1,291 @@
+"""
+Content-addressed cache of the headers and shared libraries sent to DistRDF
+workers.
+
+The backends send the files given to distribute_headers and
+distribute_shared_libraries with every computation graph again, and every
+task declares them to cling again. With a WorkerCache, a file (or a directory
+of headers) is identified by the SHA-256 digest of its content:
+
+ * a worker receives it only if its cache directory holds no copy with the
+   same digest. Dask workers missing it get it pushed with Client.run; for
+   Spark it is added once with SparkContext.addFile under a name containing
+   the digest, which Spark fetches once per executor;
+ * a worker process declares a header to cling, or loads a library, once per
+   digest, whatever the number of tasks and graphs it runs.
+
+The declarations are made by a function registered with DistRDF.initialize,
+so installing a cache replaces any other initialization function.
+
+Each worker logs what it stored and declared in received.log and
+declared.log of the cache directory, one "<pid> <digest>" line per event; the
+tests on local clusters read them through events().
+
+Usage:
+    cache = WorkerCache()
+    cache.add_headers("header.hxx", "headers_folder")
+    cache.add_shared_libraries("libfoo.so", "foo.h")
+    cache.ship(connection)   # dask Client or SparkContext
+    cache.install()
+"""
+import hashlib
+import io
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import types
+
+from backend_hooks import pickle_by_value
+
+HEADER_EXTENSIONS = (".h", ".hh", ".hpp", ".hxx")
+LIBRARY_EXTENSIONS = (".so", ".dylib", ".dll")
+
+
+def _declared():
+    """
+    The digests declared (or loaded) in this process. Kept in sys.modules, as
+    the workers may unpickle the functions of this module by value with
+    every task.
+    """
+    state = sys.modules.setdefault("_roottest_worker_cache", types.ModuleType("_roottest_worker_cache"))
+    if not hasattr(state, "declared"):
+        state.declared = set()
+    return state.declared
+
+
+def cache_dir():
+    """Default cache directory, ROOTTEST_DISTRDF_WORKER_CACHE or a per-user temporary one."""
+    default = os.path.join(tempfile.gettempdir(), f"roottest-distrdf-cache-{os.getuid()}")
+    return os.environ.get("ROOTTEST_DISTRDF_WORKER_CACHE", default)
+
+
+def _files(path):
+    """Relative paths of the files making up path, a file or a directory."""
+    if os.path.isfile(path):
+        return [os.path.basename(path)]
+    base = os.path.dirname(os.path.abspath(path))
+    found = []
+    for dirpath, _, filenames in os.walk(path):
+        found += [os.path.relpath(os.path.join(dirpath, f), base) for f in filenames]
+    return sorted(found)
+
+
+class Bundle:
+    """A file or a directory to send to the workers, with its digest."""
+
+    def __init__(self, path, kind):
+        self.path = os.path.abspath(path)
+        self.kind = kind
+        self.name = os.path.basename(self.path)
+        self.files = _files(self.path)
+        base = os.path.dirname(self.path)
+        sha = hashlib.sha256(kind.encode())
+        for relpath in self.files:
+            with open(os.path.join(base, relpath), "rb") as f:
+                sha.update(b"\0" + relpath.encode() + b"\0" + hashlib.sha256(f.read()).digest())
+        self.digest = sha.hexdigest()
+
+    def archive(self):
+        """The files of the bundle as an uncompressed tar archive."""
+        out = io.BytesIO()
+        base = os.path.dirname(self.path)
+        with tarfile.open(fileobj=out, mode="w") as tar:
+            for relpath in self.files:
+                info = tar.gettarinfo(os.path.join(base, relpath), arcname=relpath)
+                info.mtime = 0
+                with open(os.path.join(base, relpath), "rb") as f:
+                    tar.addfile(info, f)
+        return out.getvalue()
+
+    def entry(self):
+        return {"digest": self.digest, "name": self.name, "kind": self.kind, "files": self.files}
+
+
+def _log(directory, logname, digest):
+    with open(os.path.join(directory, logname), "a") as f:
+        f.write(f"{os.getpid()} {digest}\n")
+
+
+def _missing(directory, digests):
+    """(Worker) the digests without a copy in the cache directory."""
+    return [d for d in digests if not os.path.isdir(os.path.join(directory, d))]
+
+
+def _store(directory, digest, data):
+    """(Worker) unpack a bundle into the cache directory, unless already there."""
+    target = os.path.join(directory, digest)
+    if os.path.isdir(target):
+        return False
+    os.makedirs(directory, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=directory, prefix=f".{digest}.")
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        tar.extractall(staging)
+    try:
+        os.rename(staging, target)
+    except OSError:
+        # Another process of the same node stored it meanwhile
+        shutil.rmtree(staging, ignore_errors=True)
+        return False
+    _log(directory, "received.log", digest)
+    return True
+
+
+def _store_all(directory, bundles):
+    return [digest for digest, data in bundles.items() if _store(directory, digest, data)]
+
+
+def _declare(base, entry):
+    """Declare the headers and load the libraries of a bundle found under base."""
+    import ROOT
+
+    top = os.path.join(base, entry["name"])
+    ROOT.gInterpreter.AddIncludePath(top if os.path.isdir(top) else base)
+    paths = [os.path.join(base, relpath) for relpath in entry["files"]]
+    if entry["kind"] == "libraries":
+        for path in paths:
+            if path.endswith(LIBRARY_EXTENSIONS) and ROOT.gSystem.Load(path) < 0:
+                raise RuntimeError(f"Could not load {path}")
+    for path in paths:
+        if path.endswith(HEADER_EXTENSIONS) and not ROOT.gInterpreter.Declare(f'#include "{path}"'):
+            raise RuntimeError(f"Could not declare {path}")
+
+
+def prepare(manifest):
+    """
+    (Worker) make sure the bundles of the manifest are in the cache directory
+    and declared in this process. Registered with DistRDF.initialize.
+    """
+    directory = manifest["directory"]
+    for entry in manifest["bundles"]:
+        digest = entry["digest"]
+        target = os.path.join(directory, digest)
+        if not os.path.isdir(target):
+            if manifest["transport"] != "spark":
+                raise RuntimeError(f"{entry['name']} ({digest}) was not sent to this worker")
+            from pyspark import SparkFiles
+            with open(SparkFiles.get(f"{digest}.tar"), "rb") as f:
+                _store(directory, digest, f.read())
+        if digest not in _declared():
+            _declare(target, entry)
+            _declared().add(digest)
+            _log(directory, "declared.log", digest)
+
+
+def _nothing():
+    pass
+
+
+def events(directory, logname):
+    """The (pid, digest) pairs logged in received.log or declared.log."""
+    path = os.path.join(directory, logname)
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [tuple(line.split()) for line in f if line.strip()]
+
+
+class WorkerCache:
+    """Headers and shared libraries to send to the workers, see the module documentation."""
+
+    def __init__(self, directory=None):
+        self.directory = directory or cache_dir()
+        self.bundles = []
+        self.transport = None
+        # SparkContext -> digests already added with addFile
+        self._added = {}
+
+    def _add(self, paths, kind):
+        for path in paths:
+            if not os.path.exists(path):
+                raise FileNotFoundError(path)
+            bundle = Bundle(path, kind)
+            if bundle.digest not in [b.digest for b in self.bundles]:
+                self.bundles.append(bundle)
+
+    def add_headers(self, *paths):
+        """Add header files, or directories of headers."""
+        self._add(paths, "headers")
+
+    def add_shared_libraries(self, *paths):
+        """Add shared libraries, with the headers declaring their content."""
+        self._add(paths, "libraries")
+
+    def digest_of(self, path):
+        """The digest of a file or directory added to the cache."""
+        path = os.path.abspath(path)
+        return next(bundle.digest for bundle in self.bundles if bundle.path == path)
+
+    def manifest(self, transport):
+        return {"directory": self.directory, "transport": transport,
+                "bundles": [bundle.entry() for bundle in self.bundles]}
+
+    def ship(self, connection):
+        """
+        Send the bundles to the workers of a dask Client or SparkContext that
+        miss them. Returns the number of bytes sent.
+        """
+        if hasattr(connection, "addFile"):
+            return self._ship_spark(connection)
+        return self._ship_dask(connection)
+
+    def _ship_dask(self, client):
+        digests = [bundle.digest for bundle in self.bundles]
+        archives = {}
+        sent = 0
+        for worker, missing in client.run(_missing, self.directory, digests).items():
+            if not missing:
+                continue
+            payload = {}
+            for digest in missing:
+                if digest not in archives:
+                    archives[digest] = next(b for b in self.bundles if b.digest == digest).archive()
+                payload[digest] = archives[digest]
+            client.run(_store_all, self.directory, payload, workers=[worker])
+            sent += sum(len(data) for data in payload.values())
+        self.transport = "dask"
+        return sent
+
+    def _ship_spark(self, sparkcontext):
+        added = self._added.setdefault(id(sparkcontext), set())
+        staging = os.path.join(self.directory, "spark-staging")
+        os.makedirs(staging, exist_ok=True)
+        sent = 0
+        for bundle in self.bundles:
+            if bundle.digest in added:
+                continue
+            path = os.path.join(staging, f"{bundle.digest}.tar")
+            if not os.path.exists(path):
+                with open(path + ".tmp", "wb") as f:
+                    f.write(bundle.archive())
+                os.replace(path + ".tmp", path)
+            sparkcontext.addFile(path)
+            added.add(bundle.digest)
+            sent += os.path.getsize(path)
+        self.transport = "spark"
+        return sent
+
+    def install(self):
+        """
+        Declare the bundles on the client, from its own copy in the cache
+        directory, and register their declaration on the workers with
+        DistRDF.initialize. Call after ship.
+        """
+        import DistRDF
+
+        manifest = self.manifest(self.transport)
+        for bundle in self.bundles:
+            if _missing(self.directory, [bundle.digest]):
+                _store(self.directory, bundle.digest, bundle.archive())
+        prepare(manifest)
+        pickle_by_value(sys.modules[__name__])
+        DistRDF.initialize(prepare, manifest)
+
+    @staticmethod
+    def uninstall():
+        """Remove the initialization function registered by install."""
+        import DistRDF
+
+        pickle_by_value(sys.modules[__name__])
+        DistRDF.initialize(_nothing)
@@ -0,0 +1,169 @@
+"""
+Latency of the first DistRDF task of every worker process, and pre-warming.
+
+The first task a worker process runs pays for importing ROOT and DistRDF,
+for initializing cling and for the first use of RDataFrame; the following
+tasks do not. Within a `recording()` block, the mapper given to the
+ProcessAndMerge method of the Dask and Spark backends is wrapped so that
+every task appends a record to a file of the recording directory: the pid of
+the worker process, whether it is the first task of the process, whether the
+process was pre-warmed, and the times at which the task was unpickled,
+started and ended. The latency of a task runs from its unpickling, which
+imports DistRDF and ROOT in a cold process, to its end; from its start if
+the worker reused a mapper unpickled for a previous task.
+
+prewarm() runs the same initialization on the workers before the first graph
+is submitted: on every worker of a Dask client, and on as many tasks as
+there are cores for a SparkContext, whose executors are not addressable
+one by one.
+
+Usage:
+    worker_startup.prewarm(client)
+    with worker_startup.recording(directory) as startup:
+        df.Count().GetValue()
+    startup.first_latency(), startup.steady_latency(), startup.overhead()
+"""
+import contextlib
+import functools
+import os
+import statistics
+import sys
+import tempfile
+import time
+import types
+
+from backend_hooks import append_record, pickle_by_value, process_and_merge, read_records
+
+
+def _state():
+    """
+    The tasks run and the pre-warming of this process. Kept in sys.modules,
+    as the workers may unpickle the functions of this module by value with
+    every task.
+    """
+    state = sys.modules.setdefault("_roottest_worker_startup", types.ModuleType("_roottest_worker_startup"))
+    if not hasattr(state, "tasks"):
+        state.tasks = 0
+        state.warm = False
+        state.stamp = None
+    return state
+
+
+def _now():
+    return time.time()
+
+
+class _Stamp:
+    """Unpickled as the time of its unpickling."""
+
+    def __reduce__(self):
+        return (_now, ())
+
+
+def _timed_mapper(unpickled, mapper, directory, current_range):
+    """
+    (Worker) run the mapper and log the task. unpickled is a _Stamp placed
+    before the mapper in the arguments, so that it is unpickled first.
+    """
+    state = _state()
+    first = state.tasks == 0
+    state.tasks += 1
+    start = time.time()
+    if unpickled == state.stamp:
+        # The worker reused the mapper it had unpickled for a previous task
+        unpickled = start
+    else:
+        state.stamp = unpickled
+    result = mapper(current_range)
+    record = {"pid": os.getpid(), "first": first, "warm": state.warm,
+              "unpickled": unpickled, "start": start, "end": time.time()}
+    append_record(directory, "tasks", record)
+    return result
+
+
+def _warm(init=None, *args, **kwargs):
+    """(Worker) import ROOT and DistRDF, run a small RDataFrame and the init function."""
+    import ROOT
+    import DistRDF  # noqa: F401
+
+    ROOT.RDataFrame(1).Define("x", "rdfentry_").Sum("x").GetValue()
+    if init is not None:
+        init(*args, **kwargs)
+    _state().warm = True
+    return os.getpid()
+
+
+def _warm_partition(warm, _):
+    return iter([warm()])
+
+
+def prewarm(connection, init=None, *args, **kwargs):
+    """
+    Initialize the worker processes of connection, a Dask client or a
+    SparkContext, before the first graph; init(*args, **kwargs) runs on each
+    of them after ROOT. Returns the pids of the initialized processes.
+    """
+    pickle_by_value(sys.modules[__name__])
+    warm = functools.partial(_warm, init, *args, **kwargs)
+    if hasattr(connection, "defaultParallelism"):
+        cores = connection.defaultParallelism
+        pids = connection.parallelize(range(cores), cores).mapPartitions(functools.partial(_warm_partition, warm))
+        return sorted(set(pids.collect()))
+    return list(connection.run(warm).values())
+
+
+class Startup:
+    """The tasks logged in a recording directory."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def tasks(self):
+        return read_records(self.directory, "tasks")
+
+    @staticmethod
+    def latency(task):
+        return task["end"] - task["unpickled"]
+
+    def first_latency(self):
+        """Latency of the first task of every worker process, by pid."""
+        return {task["pid"]: self.latency(task) for task in self.tasks() if task["first"]}
+
+    def steady_latency(self):
+        """Median latency of the other tasks, None without any."""
+        latencies = [self.latency(task) for task in self.tasks() if not task["first"]]
+        return statistics.median(latencies) if latencies else None
+
+    def overhead(self):
+        """Median over the worker processes of the extra latency of their first task."""
+        steady = self.steady_latency()
+        first = self.first_latency()
+        if steady is None or not first:
+            return None
+        return statistics.median(latency - steady for latency in first.values())
+
+    def summary(self):
+        """First and steady-state task latencies of every worker process, by pid."""
+        summary = {}
+        for pid, first in self.first_latency().items():
+            others = [self.latency(t) for t in self.tasks() if t["pid"] == pid and not t["first"]]
+            summary[pid] = {"first": first, "steady": statistics.median(others) if others else None}
+        return summary
+
+
+@contextlib.contextmanager
+def recording(directory=None):
+    """
+    Yield a Startup logging the tasks run within the block to directory,
+    which the workers must be able to write to. By default, a temporary
+    directory.
+    """
+    directory = directory or tempfile.mkdtemp(prefix="roottest-worker-startup-")
+    os.makedirs(directory, exist_ok=True)
+    def ProcessAndMerge(original, backend, ranges, mapper, reducer):
+        timed = functools.partial(_timed_mapper, _Stamp(), mapper, directory)
+        return original(backend, ranges, timed, reducer)
+
+    pickle_by_value(sys.modules[__name__])
+    with process_and_merge(ProcessAndMerge):
+        yield Startup(directory)
@@ -0,0 +1,221 @@
+# File: roottest/python/perfcommon.py
+
+"""Helpers shared by the roottest performance benchmarks.
+
+Benchmarks describe their results as flat dictionaries of named metrics. These
+can be
+
+ * compared against a stored baseline (a JSON file next to the benchmark),
+   with a relative tolerance per metric;
+ * appended to a history file, one JSON record per line, in the directory
+   given by ROOTTEST_PERF_HISTORY_DIR, so results can be tracked over time;
+ * printed as a plain text table.
+
+Setting ROOTTEST_UPDATE_BASELINES=1 makes check_baseline overwrite the stored
+baseline with the current results instead of comparing against it.
+"""
+
+import json
+import math
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+
+__all__ = [
+    'measure', 'summarize', 'peak_rss_mb', 'rss_mb', 'RSSSampler', 'history_dir', 'append_history',
+    'load_history', 'check_baseline', 'format_table',
+]
+
+
+def summarize(values):
+    """Return min, median, mean and standard deviation of a list of values."""
+    values = sorted(values)
+    n = len(values)
+    if not n:
+        return {'min': 0., 'median': 0., 'mean': 0., 'stddev': 0., 'n': 0}
+    mid = n // 2
+    median = values[mid] if n % 2 else (values[mid - 1] + values[mid]) / 2.
+    mean = sum(values) / n
+    stddev = math.sqrt(sum((v - mean) ** 2 for v in values) / n)
+    return {'min': values[0], 'median': median, 'mean': mean, 'stddev': stddev, 'n': n}
+
+
+def measure(func, repeat=5, warmup=1):
+    """
+    Call func warmup + repeat times and return the wall and cpu time
+    statistics of the last repeat calls, as returned by summarize, together
+    with the return value of the last call.
+    """
+    for _ in range(warmup):
+        func()
+    walls, cpus = [], []
+    result = None
+    for _ in range(repeat):
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        result = func()
+        walls.append(time.perf_counter() - wall0)
+        cpus.append(time.process_time() - cpu0)
+    return {'wall': summarize(walls), 'cpu': summarize(cpus), 'result': result}
+
+
+def peak_rss_mb(children=False):
+    """Peak resident set size of this process (or of its children), in MB."""
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024. * 1024.) if sys.platform == 'darwin' else peak / 1024.
+
+
+def rss_mb():
+    """Current resident set size of this process in MB, None where /proc is not available."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') / (1024. * 1024.)
+
+
+class RSSSampler:
+    """
+    Peak resident set size of this process during a block, sampled every
+    interval seconds by a thread, unlike peak_rss_mb which covers the whole
+    life of the process:
+
+        with RSSSampler() as rss:
+            run()
+        rss.peak - rss.start
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.start = self.peak = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        current = rss_mb()
+        if current is not None:
+            self.peak = current if self.peak is None else max(self.peak, current)
+
+    def __enter__(self):
+        self.start = self.peak = rss_mb()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    @property
+    def increase(self):
+        """Peak minus the size at the start of the block, in MB."""
+        return None if self.start is None else self.peak - self.start
+
+
+def history_dir():
+    """Directory where result histories are kept, None if not configured."""
+    return os.environ.get('ROOTTEST_PERF_HISTORY_DIR') or None
+
+
+def append_history(name, metrics, directory=None, **context):
+    """
+    Append one record with the given metrics to <directory>/<name>.jsonl.
+    Extra keyword arguments are stored as context of the measurement. Does
+    nothing if no history directory is configured.
+    """
+    directory = directory or history_dir()
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    record = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'host': platform.node(),
+        'metrics': metrics,
+    }
+    record.update(context)
+    filename = os.path.join(directory, name + '.jsonl')
+    with open(filename, 'a') as f:
+        f.write(json.dumps(record, sort_keys=True) + '\n')
+    return filename
+
+
+def load_history(name, directory=None):
+    """Return the list of records stored by append_history, oldest first."""
+    directory = directory or history_dir()
+    if not directory:
+        return []
+    filename = os.path.join(directory, name + '.jsonl')
+    if not os.path.exists(filename):
+        return []
+    with open(filename) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def check_baseline(metrics, baseline_file, tolerance=0.25, higher_is_better=()):
+    """
+    Compare metrics against the values stored in baseline_file.
+
+    A metric regresses if it is worse than its baseline by more than the
+    relative tolerance (a number, or a dictionary of per-metric tolerances).
+    Metrics are lower-is-better unless listed in higher_is_better. Metrics
+    without baseline value are ignored. Returns the list of regressions as
+    human readable strings; an empty list means the check passed.
+    """
+    if os.environ.get('ROOTTEST_UPDATE_BASELINES') == '1':
+        with open(baseline_file, 'w') as f:
+            json.dump(metrics, f, indent=2, sort_keys=True)
+            f.write('\n')
+        return []
+
+    if not os.path.exists(baseline_file):
+        return []
+    with open(baseline_file) as f:
+        baseline = json.load(f)
+
+    regressions = []
+    for key, value in sorted(metrics.items()):
+        if key not in baseline or not isinstance(value, (int, float)):
+            continue
+        ref = baseline[key]
+        tol = tolerance.get(key, 0.25) if isinstance(tolerance, dict) else tolerance
+        if key in higher_is_better:
+            worse = value < ref * (1. - tol)
+        else:
+            worse = value > ref * (1. + tol)
+        if worse:
+            regressions.append(f"{key}: {value:.6g} vs baseline {ref:.6g} (tolerance {tol:.0%})")
+    return regressions
+
+
+def format_table(rows, columns, title=None):
+    """
+    Format a list of dictionaries as a text table. columns is a list of
+    (key, header) or (key, header, format) tuples.
+    """
+    cells = []
+    for row in rows:
+        line = []
+        for column in columns:
+            key, fmt = column[0], column[2] if len(column) > 2 else '{}'
+            value = row.get(key, '')
+            line.append('' if value is None or value == '' else fmt.format(value))
+        cells.append(line)
+    headers = [column[1] for column in columns]
+    widths = [max([len(h)] + [len(line[i]) for line in cells]) for i, h in enumerate(headers)]
+    out = []
+    if title:
+        out.append(title)
+    out.append('  '.join(h.rjust(w) for h, w in zip(headers, widths)))
+    out.append('  '.join('-' * w for w in widths))
+    for line in cells:
+        out.append('  '.join(c.rjust(w) for c, w in zip(line, widths)))
+    return '\n'.join(out)
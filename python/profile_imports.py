@@ -0,0 +1,232 @@
+# File: roottest/python/profile_imports.py
+
+"""Import-time profile of the PyROOT test modules.
+
+For every test module, the `import ROOT` and `from ROOT import ...`
+statements are replayed in a fresh interpreter started with `-X importtime`.
+This measures
+
+ * the cold `import ROOT`, split into the modules it pulls in;
+ * the first (lazy) lookup of every name imported from ROOT, which is where
+   cppyy asks cling for the class, function or global;
+ * `from ROOT import *`, for the modules that use it.
+
+The results are aggregated in a report, written as JSON with --json, and
+appended to the performance history (see perfcommon.py) so that regressions
+in the PyROOT pythonizations and lookups show up over time. With --check, the
+run fails if the median of a metric is worse than the median of the last
+--window recorded runs by more than --tolerance.
+
+Usage: profile_imports.py [options] [test modules or directories]
+"""
+
+import argparse
+import ast
+import glob
+import json
+import os
+import subprocess
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from perfcommon import append_history, format_table, load_history, summarize
+
+HISTORY_NAME = 'pyroot_importtime'
+
+# Replays the ROOT imports of one module, timing each step. Printed as JSON on
+# stdout; -X importtime output goes to stderr.
+PROBE = '''
+import json, sys, time
+names, star = json.loads(sys.argv[1]), sys.argv[2] == '1'
+t0 = time.perf_counter()
+import ROOT
+result = {'import': time.perf_counter() - t0, 'lookups': {}, 'failed': []}
+for name in names:
+    t0 = time.perf_counter()
+    try:
+        getattr(ROOT, name)
+    except Exception:
+        result['failed'].append(name)
+    result['lookups'][name] = time.perf_counter() - t0
+if star:
+    t0 = time.perf_counter()
+    exec('from ROOT import *', {})
+    result['star'] = time.perf_counter() - t0
+print(json.dumps(result))
+'''
+
+
+def root_imports(filename):
+    """
+    Return the names imported from ROOT anywhere in a module, whether
+    it imports ROOT at all, and whether it uses `from ROOT import *`.
+    """
+    with open(filename) as f:
+        try:
+            tree = ast.parse(f.read(), filename)
+        except SyntaxError:
+            return [], False, False
+    names, uses_root, star = [], False, False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            if any(alias.name == 'ROOT' for alias in node.names):
+                uses_root = True
+        elif isinstance(node, ast.ImportFrom) and node.module == 'ROOT' and not node.level:
+            uses_root = True
+            for alias in node.names:
+                if alias.name == '*':
+                    star = True
+                elif alias.name not in names:
+                    names.append(alias.name)
+    return names, uses_root, star
+
+
+def parse_importtime(stderr):
+    """Return {module: (self_us, cumulative_us)} from -X importtime output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            modules[name.strip()] = (int(self_us), int(cumulative_us))
+        except ValueError:
+            continue
+    return modules
+
+
+def profile_module(filename, repeat):
+    """Run the probe repeat times for one test module."""
+    names, uses_root, star = root_imports(filename)
+    if not uses_root:
+        return None
+    runs = []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', PROBE, json.dumps(names), '1' if star else '0'],
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        if proc.returncode != 0:
+            sys.stderr.write(f'{filename}: probe failed\n{proc.stderr[-2000:]}\n')
+            return None
+        run = json.loads(proc.stdout.strip().splitlines()[-1])
+        run['modules'] = parse_importtime(proc.stderr)
+        runs.append(run)
+
+    lookups = {name: summarize([run['lookups'][name] for run in runs])['median'] for name in names}
+    modules = {}
+    for run in runs:
+        for module, (self_us, _) in run['modules'].items():
+            modules.setdefault(module, []).append(self_us * 1e-6)
+    return {
+        'module': os.path.relpath(filename),
+        'import': summarize([run['import'] for run in runs])['median'],
+        'root_cumulative': summarize([run['modules'].get('ROOT', (0, 0))[1] * 1e-6 for run in runs])['median'],
+        'lookups': lookups,
+        'lookup_total': sum(lookups.values()),
+        'star': summarize([run['star'] for run in runs])['median'] if star else None,
+        'failed': runs[-1]['failed'],
+        'module_self': {module: summarize(times)['median'] for module, times in modules.items()},
+    }
+
+
+def find_modules(paths):
+    modules = []
+    for path in paths:
+        if os.path.isdir(path):
+            for pattern in ('*.py', '*/*.py', '*/*/*.py'):
+                modules += sorted(glob.glob(os.path.join(path, pattern)))
+        else:
+            modules.append(path)
+    skip = ('conftest.py', 'test_all.py', os.path.basename(__file__))
+    return [m for m in modules if os.path.basename(m) not in skip]
+
+
+def aggregate(profiles, top):
+    """Suite-wide metrics: medians over modules and the costliest lookups."""
+    names = {}
+    for profile in profiles:
+        for name, t in profile['lookups'].items():
+            names.setdefault(name, []).append(t)
+    stars = [p['star'] for p in profiles if p['star'] is not None]
+    metrics = {
+        'modules': len(profiles),
+        'import_root_median': summarize([p['import'] for p in profiles])['median'],
+        'lookup_total_median': summarize([p['lookup_total'] for p in profiles])['median'],
+        'import_star_median': summarize(stars)['median'] if stars else 0.,
+    }
+    slowest_names = sorted(names.items(), key=lambda item: max(item[1]), reverse=True)[:top]
+    module_self = {}
+    for profile in profiles:
+        for module, t in profile['module_self'].items():
+            module_self.setdefault(module, []).append(t)
+    slowest_modules = sorted(((m, summarize(t)['median']) for m, t in module_self.items()),
+                             key=lambda item: item[1], reverse=True)[:top]
+    return metrics, slowest_names, slowest_modules
+
+
+def check_history(metrics, window, tolerance):
+    """Compare the current metrics with the median of the recorded runs."""
+    history = load_history(HISTORY_NAME)[-window:]
+    regressions = []
+    for key, value in metrics.items():
+        previous = [record['metrics'][key] for record in history if key in record['metrics']]
+        if key == 'modules' or not previous:
+            continue
+        reference = summarize(previous)['median']
+        if value > reference * (1. + tolerance):
+            regressions.append(f'{key}: {value:.4f}s vs {reference:.4f}s over the last {len(previous)} runs')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('paths', nargs='*', help='test modules or directories (default: this directory)')
+    parser.add_argument('--repeat', type=int, default=3, help='interpreter starts per module')
+    parser.add_argument('--top', type=int, default=15, help='length of the "slowest" lists')
+    parser.add_argument('--json', help='write the full report to this file')
+    parser.add_argument('--check', action='store_true', help='fail on regressions with respect to the history')
+    parser.add_argument('--window', type=int, default=10, help='number of recorded runs to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='relative tolerance of --check')
+    args = parser.parse_args()
+
+    paths = args.paths or [os.path.dirname(os.path.abspath(__file__))]
+    profiles = [p for p in (profile_module(m, args.repeat) for m in find_modules(paths)) if p]
+    if not profiles:
+        print('No module importing ROOT found')
+        return 1
+
+    metrics, slowest_names, slowest_modules = aggregate(profiles, args.top)
+
+    print(format_table(sorted(profiles, key=lambda p: p['import'] + p['lookup_total'], reverse=True),
+                       [('module', 'module'), ('import', 'import ROOT [s]', '{:.3f}'),
+                        ('lookup_total', 'lookups [s]', '{:.3f}'), ('star', 'import * [s]', '{:.3f}')],
+                       title='Per module (medians)'))
+    print()
+    print(format_table([{'name': n, 'max': max(t), 'modules': len(t)} for n, t in slowest_names],
+                       [('name', 'name'), ('max', 'first lookup [s]', '{:.4f}'), ('modules', 'used by')],
+                       title='Slowest first lookups from ROOT'))
+    print()
+    print(format_table([{'module': m, 'self': t} for m, t in slowest_modules],
+                       [('module', 'module'), ('self', 'self [s]', '{:.4f}')],
+                       title='Slowest modules imported by `import ROOT`'))
+    print()
+    for key, value in sorted(metrics.items()):
+        print(f'{key}: {value}')
+
+    failed = [(p['module'], name) for p in profiles for name in p['failed']]
+    for module, name in failed:
+        print(f'warning: lookup of ROOT.{name} failed in {module}')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'metrics': metrics, 'profiles': profiles}, f, indent=1)
+
+    regressions = check_history(metrics, args.window, args.tolerance) if args.check else []
+    append_history(HISTORY_NAME, metrics, python=sys.version.split()[0])
+    for regression in regressions:
+        print(f'Import-time regression: {regression}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
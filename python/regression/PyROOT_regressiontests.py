@@ -918,6 +918,10 @@ class Regression26OverloadedOperator( MyTestCase ):
 
 ## actual test run
 if __name__ == '__main__':
+   if pytest_workers() > 1:
+      # distribute the test classes over ROOTTEST_PYTEST_WORKERS processes
+      sys.exit( run_pytest( __file__ ) )
+
    from MyTextTestRunner import MyTextTestRunner
 
    loader = unittest.TestLoader()
@@ -0,0 +1,208 @@
+# File: roottest/root/io/compression/compressionMatrix.py
+
+"""Compression ratio and write/read throughput of ROOT I/O per algorithm and level.
+
+The other tests of this directory check that every compression setting
+round-trips; this benchmark measures them on representative roottest data:
+
+ * event:  Event objects of root/io/event, split, as written by MainEvent
+           (needs the libCompressionEvent library built next to this test);
+ * jagged: the jagged arrays of root/tree/cache/jagged.root;
+ * bigfile: the TotemNtuple of root/dataframe/bigFile.root.
+
+Every dataset is first copied uncompressed, then, for each algorithm of
+--algorithms at each level of --levels, its entries are copied (repeated up
+to --size-mb uncompressed MB) into a file written with that setting and read
+back entirely. The table reports, per dataset and setting, the compression
+ratio of the tree (uncompressed over compressed bytes), the write
+throughput, including the reading of the uncompressed source, the same for
+every setting, and the read throughput, both in uncompressed MB per second,
+medians of --repeat runs. The entries of the small datasets repeat many times
+in the copies, which favours the algorithms with large windows.
+
+Results are appended to the performance history, with the LZ4 and ZSTD
+versions ROOT was built with, and compared with
+compressionMatrix.baseline.json (refreshed with ROOTTEST_UPDATE_BASELINES=1).
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, os.pardir, 'python'))
+
+import ROOT
+
+from perfcommon import append_history, check_baseline, format_table, summarize
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOTTEST_DIR = os.path.join(HERE, os.pardir, os.pardir, os.pardir)
+BASELINE = os.path.splitext(os.path.abspath(__file__))[0] + '.baseline.json'
+
+ALGORITHMS = {'ZLIB': 1, 'LZMA': 2, 'LZ4': 4, 'ZSTD': 5}
+
+COPY_CODE = r'''
+#include "TFile.h"
+#include "TTree.h"
+
+// Copy entries of source, cycling over them, into a new file with the given compression settings.
+// Returns the uncompressed and compressed bytes of the copy.
+std::pair<Long64_t, Long64_t> roottest_compression_copy(TTree *source, const char *filename, int settings,
+                                                        Long64_t entries)
+{
+   TFile out(filename, "RECREATE", "", settings);
+   TTree *copy = source->CloneTree(0);
+   const Long64_t n = source->GetEntries();
+   for (Long64_t i = 0; i < entries; ++i) {
+      source->GetEntry(i % n);
+      copy->Fill();
+   }
+   copy->Write();
+   std::pair<Long64_t, Long64_t> bytes{copy->GetTotBytes(), copy->GetZipBytes()};
+   source->CopyAddresses(copy, true);
+   out.Close();
+   return bytes;
+}
+
+// Read all entries of the tree treename of filename, return the bytes unpacked.
+Long64_t roottest_compression_read(const char *filename, const char *treename)
+{
+   TFile in(filename);
+   auto tree = in.Get<TTree>(treename);
+   Long64_t nbytes = 0;
+   for (Long64_t i = 0, n = tree->GetEntries(); i < n; ++i)
+      nbytes += tree->GetEntry(i);
+   return nbytes;
+}
+'''
+
+
+def library_versions():
+    """The LZ4_VERSION and ZSTD_VERSION of root-config --config, as the top-level CMakeLists.txt reads them."""
+    try:
+        config = subprocess.run(['root-config', '--config'], capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return {}
+    versions = {}
+    for item in config.split():
+        for name in ('LZ4_VERSION', 'ZSTD_VERSION'):
+            if item.startswith(name + '='):
+                versions[name.lower()] = item.split('=', 1)[1]
+    return versions
+
+
+def first_tree(filename):
+    f = ROOT.TFile.Open(filename)
+    name = next(key.GetName() for key in f.GetListOfKeys() if key.GetClassName() == 'TTree')
+    f.Close()
+    return name
+
+
+def write_events(filename, nevents):
+    """Write nevents Event objects, split, uncompressed, as MainEvent does. False without libCompressionEvent."""
+    if ROOT.gSystem.Load('libCompressionEvent') < 0:
+        return False
+    ROOT.gRandom.SetSeed(1)
+    f = ROOT.TFile(filename, 'RECREATE', '', 0)
+    tree = ROOT.TTree('T', 'An example of a ROOT tree')
+    tree.SetAutoSave(1000000000)
+    event = ROOT.Event()
+    tree.Branch('event', event, 64000, 99)
+    for i in range(nevents):
+        event.Build(i, 600, 1.)
+        tree.Fill()
+    tree.Write()
+    f.Close()
+    return True
+
+
+def sources(workdir, args):
+    """Uncompressed copies of the datasets, by name: (file name, tree name)."""
+    found = {}
+    event = os.path.join(workdir, 'event.root')
+    if write_events(event, args.events):
+        found['event'] = (event, 'T')
+    else:
+        print('libCompressionEvent not found, skipping the event dataset')
+    for name, original in (('jagged', os.path.join(ROOTTEST_DIR, 'root', 'tree', 'cache', 'jagged.root')),
+                           ('bigfile', os.path.join(ROOTTEST_DIR, 'root', 'dataframe', 'bigFile.root'))):
+        treename = first_tree(original)
+        uncompressed = os.path.join(workdir, f'{name}.root')
+        f = ROOT.TFile.Open(original)
+        tree = f.Get(treename)
+        ROOT.roottest_compression_copy(tree, uncompressed, 0, tree.GetEntries())
+        f.Close()
+        found[name] = (uncompressed, treename)
+    return found
+
+
+def measure(source, treename, settings, entries, target):
+    """Write and read back one copy, return (uncompressed bytes, compressed bytes, write s, read s)."""
+    f = ROOT.TFile.Open(source)
+    tree = f.Get(treename)
+    start = time.perf_counter()
+    bytes_ = ROOT.roottest_compression_copy(tree, target, settings, entries)
+    write = time.perf_counter() - start
+    f.Close()
+    start = time.perf_counter()
+    ROOT.roottest_compression_read(target, treename)
+    read = time.perf_counter() - start
+    os.remove(target)
+    return bytes_.first, bytes_.second, write, read
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--algorithms', nargs='+', default=list(ALGORITHMS), choices=list(ALGORITHMS))
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 5, 9], help='compression levels')
+    parser.add_argument('--size-mb', type=float, default=64., help='uncompressed MB written per setting')
+    parser.add_argument('--events', type=int, default=200, help='Event objects of the event dataset')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per dataset and setting')
+    parser.add_argument('--tolerance', type=float, default=0.3, help='relative tolerance with respect to the baseline')
+    args = parser.parse_args()
+
+    ROOT.gROOT.SetBatch(True)
+    ROOT.gErrorIgnoreLevel = ROOT.kError
+    ROOT.gInterpreter.Declare(COPY_CODE)
+    settings = [('none', 0)] + [(algorithm, level) for algorithm in args.algorithms for level in args.levels]
+
+    rows, metrics = [], {}
+    with tempfile.TemporaryDirectory(prefix='roottest-compression-') as workdir:
+        for dataset, (source, treename) in sources(workdir, args).items():
+            f = ROOT.TFile.Open(source)
+            tree = f.Get(treename)
+            entries = max(tree.GetEntries(), int(args.size_mb * 1024 ** 2 * tree.GetEntries() / tree.GetTotBytes()))
+            f.Close()
+            for algorithm, level in settings:
+                value = ALGORITHMS[algorithm] * 100 + level if level else 0
+                runs = [measure(source, treename, value, entries, os.path.join(workdir, 'copy.root'))
+                        for _ in range(args.repeat)]
+                total, zipped = runs[-1][0], runs[-1][1]
+                mb = total / 1024 ** 2
+                row = dict(dataset=dataset, algorithm=algorithm, level=level, ratio=total / zipped,
+                           write=mb / summarize([run[2] for run in runs])['median'],
+                           read=mb / summarize([run[3] for run in runs])['median'])
+                rows.append(row)
+                key = f'{dataset}.{algorithm}{level}' if level else f'{dataset}.none'
+                metrics[f'{key}.ratio'] = row['ratio']
+                metrics[f'{key}.write_mb_s'] = row['write']
+                metrics[f'{key}.read_mb_s'] = row['read']
+
+    print(format_table(rows, [('dataset', 'dataset'), ('algorithm', 'algorithm'), ('level', 'level'),
+                              ('ratio', 'ratio', '{:.2f}'), ('write', 'write [MB/s]', '{:.1f}'),
+                              ('read', 'read [MB/s]', '{:.1f}')],
+                       title=f'{args.size_mb:g} uncompressed MB per setting, medians of {args.repeat} runs'))
+
+    append_history('io_compression_matrix', metrics, root=ROOT.gROOT.GetVersion(), **library_versions())
+    # All the metrics are higher-is-better
+    regressions = check_baseline(metrics, BASELINE, args.tolerance, higher_is_better=list(metrics))
+    for regression in regressions:
+        print(f'Compression regression: {regression}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,392 @@
+# File: roottest/root/io/perf/ioperf.py
+
+"""Wall time, CPU time and bytes of the I/O workloads of root/io/perf.
+
+The macros of this directory were run by hand, from the Makefile (perftest)
+or io.sh, and only printed their timings. This runner executes them as
+workloads, each with an untimed setup, --warmup untimed runs and --repeat
+timed ones:
+
+ * julius_write_*, julius_read_*: jwrite and jread of julius.C, without and
+   with compression;
+ * buffer_write*, buffer_read*:   the in-memory streaming of WriteBuffer.C and
+                                  ReadBuffer.C (loaded as rrun.C and setup.C
+                                  do), of ints and of mixed ints and floats;
+ * sergei_*:                      ProduceTree and TestTree of
+                                  SergeiShortTest.C, with 1 and 10 active
+                                  branches, with the tree in the page cache
+                                  or, as SergeiHardTest.C intends, not;
+ * directories:                   directories.C, many directories of
+                                  histograms;
+ * stl_*:                         stl/readvec.C, vectors written and read as
+                                  an object, split and streamed;
+ * slowreading_*:                 slowreading/Read.C, the DST files of every
+                                  version read with the newest NuEvent
+                                  library, in a separate ROOT process as the
+                                  Makefile does;
+ * posix_*:                       io.c, the plain POSIX reads of io.sh,
+                                  built with the C compiler if there is one;
+                                  as in io.sh, another file is read in full
+                                  before every read, and the file read is
+                                  also dropped from the page cache.
+
+For every workload, the medians of the wall and CPU times (of this process
+and of its subprocesses) and the bytes read and written are printed, written
+as JSON to --json (by default ioperf-<date>-<time>.json, one file per run),
+appended to the performance history and compared with ioperf.baseline.json
+(refreshed with ROOTTEST_UPDATE_BASELINES=1).
+
+Not run: the datasets of userdatasets, which are not available locally;
+orrun.C, which loads a library built with an old ROOT that is not in the
+tree; SergeiHardTest.C and SergeiHardTest_2.C, whose ProduceTree and
+TestTree are those of SergeiShortTest.C (the three cannot be loaded in one
+process) read after a dummy file twice the size of the memory, which the
+cold sergei workloads replace by dropping the tree from the page cache.
+"""
+
+import argparse
+import ctypes
+import functools
+import json
+import os
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, os.pardir, 'python'))
+
+import ROOT
+
+from perfcommon import append_history, check_baseline, format_table, summarize
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.splitext(os.path.abspath(__file__))[0] + '.baseline.json'
+
+# Runs Read.C and prints the bytes it read, for the slowreading workloads
+SLOWREADING_MACRO = r'''
+int ioperf_slowreading(const char *library, const char *filename)
+{
+   Long_t result = gROOT->ProcessLine(TString::Format(".x %s(\"%s\", \"%s\", 1)", "READ_C", library, filename));
+   printf("ioperf bytes read: %lld\n", TFile::GetFileBytesRead());
+   return result;
+}
+'''
+
+
+class Workload:
+    """
+    A setup, run once before the measurements, a run, and a preparation,
+    untimed, before every run. The run returns the bytes (read, written) it
+    does outside of TFile, None without any.
+    """
+
+    def __init__(self, run, setup=None, prepare=None):
+        self.run = run
+        self.setup = setup
+        self.prepare = prepare
+
+
+def drop_cache(filename):
+    """Write the pages of filename to disk and drop them from the page cache."""
+    fd = os.open(filename, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+def compile_macro(path):
+    """Compile and load a macro with ACLiC, in the build directory. False if it does not compile."""
+    return bool(ROOT.gSystem.CompileMacro(path, 'k'))
+
+
+def root_exe():
+    exe = os.path.join(str(ROOT.TROOT.GetBinDir()), 'root.exe')
+    return exe if os.path.exists(exe) else shutil.which('root.exe')
+
+
+def run_command(command):
+    output = subprocess.run(command, capture_output=True, text=True)
+    if output.returncode != 0:
+        raise RuntimeError(f'{" ".join(command)} failed:\n{output.stdout}{output.stderr}')
+    return output.stdout
+
+
+def julius_workloads(args):
+    if not compile_macro(os.path.join(HERE, 'julius.C')):
+        raise RuntimeError('julius.C does not compile')
+    workloads = {}
+    for compress in (0, 1):
+        workloads[f'julius_write_c{compress}'] = Workload(lambda c=compress: ROOT.jwrite(args.rows, c))
+        workloads[f'julius_read_c{compress}'] = Workload(lambda: ROOT.jread(0.5),
+                                                         setup=lambda c=compress: ROOT.jwrite(args.rows, c))
+    return workloads
+
+
+def streamed_bytes(classname):
+    """Bytes of one object of classname streamed by TClass::Streamer."""
+    buffer = ROOT.TBufferFile(ROOT.TBuffer.kWrite)
+    cls = ROOT.TClass.GetClass(classname)
+    obj = cls.New()
+    cls.Streamer(obj, buffer)
+    cls.Destructor(obj)
+    return buffer.Length()
+
+
+def buffer_workloads(args):
+    for macro in ('WriteBuffer.C', 'ReadBuffer.C'):
+        if not compile_macro(os.path.join(HERE, macro)):
+            raise RuntimeError(f'{macro} does not compile')
+
+    def stream(function, nbytes, read):
+        function(args.objects)
+        return (nbytes, 0) if read else (0, nbytes)
+
+    workloads = {}
+    # The two macros define their own classes
+    for name, function, cls, read in (('buffer_write', 'WriteBuffer', 'allints', False),
+                                      ('buffer_write_mix', 'WriteBufferMix', 'floatint', False),
+                                      ('buffer_read', 'ReadBuffer', 'allint', True),
+                                      ('buffer_read_mix', 'ReadBufferMix', 'fltint', True)):
+        nbytes = args.objects * streamed_bytes(cls)
+        workloads[name] = Workload(functools.partial(stream, getattr(ROOT, function), nbytes, read))
+    return workloads
+
+
+def sergei_workloads(args):
+    if not compile_macro(os.path.join(HERE, 'SergeiShortTest.C')):
+        raise RuntimeError('SergeiShortTest.C does not compile')
+
+    def produce():
+        ROOT.ProduceTree('TreeFile.root', 'TestTree', args.entries, 0, 10, 10, 1000)
+
+    def test(active):
+        real, cpu = ctypes.c_float(), ctypes.c_float()
+        ROOT.TestTree('TreeFile.root', 'TestTree', 10, 10, active, real, cpu)
+
+    def cold():
+        drop_cache('TreeFile.root')
+
+    return {
+        'sergei_produce': Workload(produce),
+        'sergei_read_1': Workload(lambda: test(1), setup=produce),
+        'sergei_read_10': Workload(lambda: test(10), setup=produce),
+        'sergei_cold_read_1': Workload(lambda: test(1), setup=produce, prepare=cold),
+        'sergei_cold_read_10': Workload(lambda: test(10), setup=produce, prepare=cold),
+    }
+
+
+def directories_workloads(args):
+    if not compile_macro(os.path.join(HERE, 'directories.C')):
+        raise RuntimeError('directories.C does not compile')
+    return {'directories': Workload(lambda: ROOT.directories(100, 2, 24))}
+
+
+def stl_workloads(args):
+    if not compile_macro(os.path.join(HERE, 'stl', 'readvec.C')):
+        raise RuntimeError('stl/readvec.C does not compile')
+
+    def read(what):
+        # As readvec, closing the file
+        f = ROOT.TFile.Open('vec.root')
+        if what == 'object':
+            ROOT.readobj(f)
+        else:
+            tree = ROOT.readtree(f)
+            (ROOT.readsplit if what == 'split' else ROOT.readstrm)(tree)
+        f.Close()
+
+    def write():
+        ROOT.writefile('vec.root', 2000, args.vectors)
+
+    return {
+        'stl_write': Workload(write),
+        'stl_read_object': Workload(lambda: read('object'), setup=write),
+        'stl_read_split': Workload(lambda: read('split'), setup=write),
+        'stl_read_streamed': Workload(lambda: read('streamed'), setup=write),
+    }
+
+
+def slowreading_workloads(args):
+    exe = root_exe()
+    if exe is None:
+        print('root.exe not found, skipping the slowreading workloads')
+        return {}
+    source = os.path.join(HERE, 'slowreading')
+    with open('ioperf_slowreading.C', 'w') as f:
+        f.write(SLOWREADING_MACRO.replace('READ_C', os.path.join(source, 'Read.C')))
+
+    def build(library):
+        run_command([exe, '-b', '-l', '-q', '-e', f'gSystem->SetBuildDir(".", true); '
+                     f'if (!gSystem->CompileMacro("{os.path.join(source, library)}.cxx", "k")) exit(1);'])
+
+    def read(library, version):
+        filename = os.path.join(source, 'rootfiles', f'DST_{version}.root')
+        output = run_command([exe, '-b', '-l', '-q', f'ioperf_slowreading.C("{library}_cxx", "{filename}")'])
+        return int(re.search(r'ioperf bytes read: (\d+)', output).group(1)), 0
+
+    # The library of the newest version reading the files of all versions
+    return {f'slowreading_{version}': Workload(lambda version=version: read('NuEvent_62', version),
+                                               setup=lambda: build('NuEvent_62'))
+            for version in (60, 61, 62)}
+
+
+def posix_workloads(args):
+    cc = shutil.which(os.environ.get('CC', 'cc'))
+    if cc is None:
+        print('No C compiler found, skipping the posix workloads')
+        return {}
+    # io.c predates C99: implicit int
+    run_command([cc, '-std=gnu89', '-w', '-O2', '-o', 'io', os.path.join(HERE, 'io.c')])
+    size, buffer = args.file_mb, 64
+
+    def create(filename='posix1.dat'):
+        # io.c does not return a status
+        subprocess.run(['./io', '-c', filename, str(size), str(buffer)], capture_output=True)
+        return 0, os.path.getsize(filename)
+
+    def setup():
+        create('posix1.dat')
+        create('posix2.dat')
+
+    def prepare():
+        # As io.sh, read the other file in full, and make sure posix2.dat is not served from memory
+        subprocess.run(['./io', '-r', 'posix1.dat', str(buffer)], capture_output=True)
+        drop_cache('posix2.dat')
+
+    def read(mode, interval=None):
+        command = ['./io', mode, 'posix2.dat', str(buffer)] + ([str(interval)] if interval else [])
+        output = subprocess.run(command, capture_output=True, text=True).stdout
+        if mode == '-r':
+            return os.path.getsize('posix2.dat'), 0
+        return int(re.search(r'(\d+) read:', output).group(1)) * buffer * 1000, 0
+
+    return {
+        'posix_create': Workload(create),
+        'posix_read': Workload(lambda: read('-r'), setup=setup, prepare=prepare),
+        'posix_seq_5of10': Workload(lambda: read('-s', 5), setup=setup, prepare=prepare),
+        'posix_noseq_5of10': Workload(lambda: read('-t', 5), setup=setup, prepare=prepare),
+    }
+
+
+GROUPS = {
+    'julius': julius_workloads,
+    'buffer': buffer_workloads,
+    'sergei': sergei_workloads,
+    'directories': directories_workloads,
+    'stl': stl_workloads,
+    'slowreading': slowreading_workloads,
+    'posix': posix_workloads,
+}
+
+
+def _cpu():
+    """CPU time of this process and of its terminated subprocesses."""
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+def run_once(workload):
+    """Run a workload once, return (wall s, cpu s, bytes read, bytes written)."""
+    if workload.prepare:
+        workload.prepare()
+    read0, written0 = ROOT.TFile.GetFileBytesRead(), ROOT.TFile.GetFileBytesWritten()
+    wall0, cpu0 = time.perf_counter(), _cpu()
+    extra = workload.run()
+    wall, cpu = time.perf_counter() - wall0, _cpu() - cpu0
+    read = ROOT.TFile.GetFileBytesRead() - read0
+    written = ROOT.TFile.GetFileBytesWritten() - written0
+    if isinstance(extra, tuple):
+        read, written = read + extra[0], written + extra[1]
+    return wall, cpu, read, written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--workloads', nargs='+', default=list(GROUPS), choices=list(GROUPS))
+    parser.add_argument('--warmup', type=int, default=1, help='untimed runs per workload')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per workload')
+    parser.add_argument('--rows', type=int, default=100000, help='rows of the julius ntuple')
+    parser.add_argument('--objects', type=int, default=10000000, help='objects streamed by the buffer workloads')
+    parser.add_argument('--entries', type=int, default=200000, help='entries of the sergei tree')
+    parser.add_argument('--vectors', type=int, default=100, help='entries of the stl tree')
+    parser.add_argument('--file-mb', type=int, default=256, help='size of the posix file in MB')
+    parser.add_argument('--json', default=time.strftime('ioperf-%Y%m%d-%H%M%S.json'),
+                        help='write the results to this file')
+    parser.add_argument('--tolerance', type=float, default=0.3,
+                        help='relative tolerance of the times with respect to the baseline')
+    parser.add_argument('--bytes-tolerance', type=float, default=0.05,
+                        help='relative tolerance of the bytes with respect to the baseline')
+    args = parser.parse_args()
+    args.json = os.path.abspath(args.json)
+
+    ROOT.gROOT.SetBatch(True)
+    ROOT.gErrorIgnoreLevel = ROOT.kError
+    # TestTree of SergeiShortTest.C uses it
+    ROOT.gROOT.ProcessLine('if (!gBenchmark) gBenchmark = new TBenchmark();')
+    errors = []
+    results, metrics, tolerances = {}, {}, {}
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='roottest-ioperf-') as workdir:
+        # The macros write their files in the working directory
+        os.chdir(workdir)
+        ROOT.gSystem.SetBuildDir(workdir, True)
+        try:
+            for group in args.workloads:
+                try:
+                    workloads = GROUPS[group](args)
+                except RuntimeError as error:
+                    errors.append(f'{group}: {error}')
+                    continue
+                for name, workload in workloads.items():
+                    try:
+                        if workload.setup:
+                            workload.setup()
+                        for _ in range(args.warmup):
+                            run_once(workload)
+                        runs = [run_once(workload) for _ in range(args.repeat)]
+                    except RuntimeError as error:
+                        errors.append(f'{name}: {error}')
+                        continue
+                    wall, cpu = summarize([run[0] for run in runs]), summarize([run[1] for run in runs])
+                    read, written = runs[-1][2], runs[-1][3]
+                    results[name] = {'wall_s': wall, 'cpu_s': cpu, 'bytes_read': read, 'bytes_written': written}
+                    metrics[f'{name}.wall_s'] = wall['median']
+                    metrics[f'{name}.cpu_s'] = cpu['median']
+                    metrics[f'{name}.bytes'] = read + written
+                    tolerances.update({f'{name}.wall_s': args.tolerance, f'{name}.cpu_s': args.tolerance,
+                                       f'{name}.bytes': args.bytes_tolerance})
+        finally:
+            os.chdir(cwd)
+
+    rows = [dict(workload=name, wall=result['wall_s']['median'], cpu=result['cpu_s']['median'],
+                 read=result['bytes_read'] / 1024 ** 2, written=result['bytes_written'] / 1024 ** 2,
+                 throughput=(result['bytes_read'] + result['bytes_written']) / 1024 ** 2
+                 / max(result['wall_s']['median'], 1e-9))
+            for name, result in results.items()]
+    print(format_table(rows, [('workload', 'workload'), ('wall', 'wall [s]', '{:.3f}'), ('cpu', 'cpu [s]', '{:.3f}'),
+                              ('read', 'read [MB]', '{:.1f}'), ('written', 'written [MB]', '{:.1f}'),
+                              ('throughput', 'MB/s', '{:.1f}')],
+                       title=f'Medians of {args.repeat} runs after {args.warmup} warm-up runs'))
+    with open(args.json, 'w') as f:
+        json.dump({'root': ROOT.gROOT.GetVersion(), 'warmup': args.warmup, 'repeat': args.repeat,
+                   'workloads': results, 'errors': errors}, f, indent=2, sort_keys=True)
+    print(f'Results written to {args.json}')
+
+    append_history('io_perf', metrics, root=ROOT.gROOT.GetVersion())
+    regressions = check_baseline(metrics, BASELINE, tolerances)
+    for regression in regressions:
+        print(f'I/O performance regression: {regression}')
+    for error in errors:
+        print(f'ERROR: {error}')
+    return 1 if regressions or errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+# Reads the AliESDs tree of root/tree/cache from a local file server (see
+# scripts/fileserver.py), with a small latency per request, and checks that
+#  - TTreeCache turns the reads of the baskets into a few multi-range requests;
+#  - reading still works against a server that answers a multi-range request
+#    with its first range only.
+
+import os
+import sys
+
+import ROOT
+
+ROOTTEST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, os.pardir)
+sys.path.append(os.path.join(ROOTTEST_DIR, 'scripts'))
+
+from fileserver import FileServer
+
+FILES_DIR = os.path.join(ROOTTEST_DIR, 'root', 'tree', 'cache')
+
+
+def read_tree(url, cachesize):
+    """Read all entries of esdTree, return the number of bytes read."""
+    f = ROOT.TFile.Open(url)
+    if not f or f.IsZombie():
+        raise RuntimeError(f'Could not open {url}')
+    tree = f.Get('esdTree')
+    tree.SetCacheSize(cachesize)
+    if cachesize:
+        tree.AddBranchToCache('*', True)
+        tree.StopCacheLearningPhase()
+    nbytes = sum(tree.GetEntry(i) for i in range(tree.GetEntries()))
+    f.Close()
+    return nbytes
+
+
+def main():
+    ROOT.gROOT.SetBatch(True)
+    ROOT.gErrorIgnoreLevel = ROOT.kError
+    status = 0
+
+    with FileServer(FILES_DIR, latency=0.002) as server:
+        url = server.url('AliESDs-0.root')
+        server.reset_stats()
+        uncached_bytes = read_tree(url, 0)
+        uncached = server.stats(reset=True)['requests']
+        cached_bytes = read_tree(url, 30000000)
+        cached = server.stats(reset=True)['requests']
+
+    print(f'requests without TTreeCache: {uncached}, with TTreeCache: {cached}')
+    if cached_bytes != uncached_bytes:
+        print(f'ERROR: read {cached_bytes} bytes with TTreeCache instead of {uncached_bytes}')
+        status = 1
+    if cached * 10 > uncached:
+        print('ERROR: TTreeCache did not reduce the number of requests')
+        status = 1
+
+    with FileServer(FILES_DIR, ranges='first') as server:
+        first_bytes = read_tree(server.url('AliESDs-0.root'), 30000000)
+    if first_bytes != uncached_bytes:
+        print(f'ERROR: read {first_bytes} bytes from a server without multi-range support instead of {uncached_bytes}')
+        status = 1
+
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
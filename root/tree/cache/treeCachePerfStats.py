@@ -0,0 +1,240 @@
+# File: roottest/root/tree/cache/treeCachePerfStats.py
+
+"""TTreeCache effectiveness, from structured TTreePerfStats measurements.
+
+The other tests of this directory print the TTreePerfStats and cache
+counters of a read and compare the text with per-compression reference
+files. This harness reads the same kind of trees with and without TTreeCache
+and records, for every scenario:
+
+ * read_calls, bytes_read: read calls and bytes read from the file(s);
+ * unzip_s, disk_s:        time spent unzipping baskets and reading the file;
+ * miss_calls:             read calls that did not go through the cache;
+ * efficiency:             TTreeCache::GetEfficiency, the fraction of the
+                           prefetched baskets that were used;
+ * miss_efficiency:        TTreeCache::GetMissEfficiency, for the scenarios
+                           reading branches outside of the cache;
+ * call_reduction:         read calls without cache over read calls with it.
+
+The scenarios cover a single file and a chain of the AliESDs files, the
+jagged arrays of jagged.root, and a generated tree with variable cluster
+sizes, also read with branches missing from the cache, with and without the
+miss cache. The measurements are printed, written as JSON with --json,
+appended to the performance history and compared with the baseline of the
+default compression algorithm (treeCachePerfStats.<algorithm>.baseline.json,
+refreshed with ROOTTEST_UPDATE_BASELINES=1), with a tolerance for the counts
+and a looser one for the times.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, os.pardir, 'python'))
+
+import ROOT
+
+from perfcommon import append_history, check_baseline, format_table
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+CACHE_SIZE = 30000000
+
+# Cluster sizes of the generated tree, cycled through as in variableCluster.C
+VARCLUSTER_CODE = r'''
+#include "TFile.h"
+#include "TTree.h"
+#include <vector>
+
+void roottest_write_varcluster(const char *filename, Long64_t entries)
+{
+   TFile f(filename, "RECREATE");
+   TTree tree("varcluster", "variable cluster sizes");
+   const Long64_t clusterSizes[] = {200, 500, 300};
+   int cursor = 0;
+   Long64_t clusterSize = clusterSizes[cursor];
+   tree.SetAutoFlush(clusterSize);
+   int value;
+   std::vector<float> values;
+   tree.Branch("value", &value);
+   tree.Branch("values", &values);
+   Long64_t clusterStart = 0;
+   for (Long64_t i = 0; i < entries; ++i) {
+      if (i - clusterStart == clusterSize) {
+         cursor = (cursor + 1) % 3;
+         clusterSize = clusterSizes[cursor];
+         clusterStart = i;
+         tree.SetAutoFlush(clusterSize);
+      }
+      value = i;
+      values.assign(i % 17, 0.5f * i);
+      tree.Fill();
+   }
+   tree.Write();
+}
+'''
+
+TIMES = ('unzip_s', 'disk_s')
+ALGORITHMS = {0: 'global', 1: 'ZLIB', 2: 'LZMA', 3: 'old', 4: 'LZ4', 5: 'ZSTD'}
+
+
+def default_algorithm():
+    """Name of the compression algorithm of the files ROOT writes by default."""
+    f = ROOT.TMemFile('roottest_default_compression.root', 'RECREATE')
+    algorithm = f.GetCompressionAlgorithm()
+    f.Close()
+    return ALGORITHMS.get(algorithm, str(algorithm))
+
+
+class Reading:
+    """How a scenario reads its tree: the branches in the cache, those read, and the miss cache."""
+
+    def __init__(self, files, treename=None, cached='*', read=None, optimize_misses=False):
+        self.files = files
+        self.treename = treename
+        self.cached = cached
+        self.read = read
+        self.optimize_misses = optimize_misses
+
+    def open(self):
+        """A fresh chain on the files, so that every measurement starts with cold caches."""
+        treename = self.treename
+        if treename is None:
+            # The first tree of the first file
+            f = ROOT.TFile.Open(self.files[0])
+            treename = next(key.GetName() for key in f.GetListOfKeys() if key.GetClassName() == 'TTree')
+            f.Close()
+        chain = ROOT.TChain(treename)
+        for filename in self.files:
+            chain.Add(filename)
+        return chain
+
+
+def scenarios(workdir):
+    varcluster = os.path.join(workdir, 'varcluster.root')
+    ROOT.gInterpreter.Declare(VARCLUSTER_CODE)
+    ROOT.roottest_write_varcluster(varcluster, 10000)
+    aliesds = [os.path.join(HERE, f'AliESDs-{i}.root') for i in (0, 1)]
+    return {
+        'single': Reading(aliesds[:1], 'esdTree'),
+        'chain': Reading(aliesds, 'esdTree'),
+        'jagged': Reading([os.path.join(HERE, 'jagged.root')]),
+        'varcluster': Reading([varcluster]),
+        'misses': Reading([varcluster], cached=['value'], read=['value', 'values']),
+        'misscache': Reading([varcluster], cached=['value'], read=['value', 'values'], optimize_misses=True),
+    }
+
+
+def _cache_of(chain):
+    f = chain.GetCurrentFile()
+    return f.GetCacheRead(chain.GetTree()) if f else None
+
+
+def read(reading, cachesize):
+    """Read all entries of the scenario, return its measurements and the bytes unpacked by GetEntry."""
+    chain = reading.open()
+    nentries = chain.GetEntries()
+    chain.SetCacheSize(cachesize)
+    chain.LoadTree(0)
+    if cachesize:
+        for branch in ([reading.cached] if isinstance(reading.cached, str) else reading.cached):
+            chain.AddBranchToCache(branch, True)
+        chain.StopCacheLearningPhase()
+        # The chain moves the same cache from file to file
+        _cache_of(chain).SetOptimizeMisses(reading.optimize_misses)
+    if reading.read:
+        chain.SetBranchStatus('*', False)
+        for branch in reading.read:
+            chain.SetBranchStatus(branch, True)
+    perfstats = ROOT.TTreePerfStats('ioperf', chain)
+
+    # The cache counters belong to the file being read; collect them at the last entry of every file
+    lasts = set(n - 1 for n in itertools.accumulate(element.GetEntries() for element in chain.GetListOfFiles()))
+    caches = []
+    unpacked = 0
+    for entry in range(nentries):
+        unpacked += chain.GetEntry(entry)
+        if entry in lasts:
+            cache = _cache_of(chain)
+            if cache:
+                caches.append((cache.GetNoCacheReadCalls(), cache.GetEfficiency(), cache.GetMissEfficiency()))
+    perfstats.Finish()
+
+    stats = {
+        'read_calls': perfstats.GetReadCalls(),
+        'bytes_read': perfstats.GetBytesRead(),
+        'unzip_s': perfstats.GetUnzipTime(),
+        'disk_s': perfstats.GetDiskTime(),
+    }
+    if caches:
+        stats['miss_calls'] = sum(c[0] for c in caches)
+        stats['efficiency'] = sum(c[1] for c in caches) / len(caches)
+        if reading.read:
+            stats['miss_efficiency'] = sum(c[2] for c in caches) / len(caches)
+    return stats, unpacked
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--json', help='write the measurements to this file')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='relative tolerance of the counts with respect to the baseline')
+    parser.add_argument('--time-tolerance', type=float, default=1.,
+                        help='relative tolerance of the times with respect to the baseline')
+    args = parser.parse_args()
+
+    ROOT.gROOT.SetBatch(True)
+    # The AliESDs files are read without their dictionaries
+    ROOT.gErrorIgnoreLevel = ROOT.kError
+    algorithm = default_algorithm()
+    errors = []
+    results, metrics, tolerances = {}, {}, {}
+
+    with tempfile.TemporaryDirectory(prefix='roottest-treecache-') as workdir:
+        for name, reading in scenarios(workdir).items():
+            cached, cached_bytes = read(reading, CACHE_SIZE)
+            uncached, uncached_bytes = read(reading, 0)
+            if cached_bytes != uncached_bytes:
+                errors.append(f'{name}: unpacked {cached_bytes} bytes with TTreeCache instead of {uncached_bytes}')
+            cached['call_reduction'] = uncached['read_calls'] / max(cached['read_calls'], 1)
+            if not reading.read and cached['read_calls'] >= uncached['read_calls']:
+                errors.append(f"{name}: {cached['read_calls']} read calls with TTreeCache, "
+                              f"{uncached['read_calls']} without")
+            results[name] = {'cached': cached, 'uncached': uncached}
+            for key, value in cached.items():
+                metrics[f'{name}.{key}'] = value
+                tolerances[f'{name}.{key}'] = args.time_tolerance if key in TIMES else args.tolerance
+            metrics[f'{name}.uncached_read_calls'] = uncached['read_calls']
+            tolerances[f'{name}.uncached_read_calls'] = args.tolerance
+
+    rows = [dict(scenario=name, **result['cached'], uncached_read_calls=result['uncached']['read_calls'])
+            for name, result in results.items()]
+    print(format_table(rows, [('scenario', 'scenario'), ('read_calls', 'read calls'),
+                              ('uncached_read_calls', 'without cache'), ('call_reduction', 'reduction', '{:.1f}'),
+                              ('bytes_read', 'bytes read'), ('miss_calls', 'misses'),
+                              ('efficiency', 'efficiency', '{:.3f}'), ('miss_efficiency', 'miss eff.', '{:.3f}'),
+                              ('unzip_s', 'unzip [s]', '{:.4f}'), ('disk_s', 'disk [s]', '{:.4f}')],
+                       title=f'TTreeCache of {CACHE_SIZE} bytes, {algorithm} compression by default'))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'algorithm': algorithm, 'root': ROOT.gROOT.GetVersion(), 'scenarios': results},
+                      f, indent=2, sort_keys=True)
+
+    append_history('tree_cache_perfstats', metrics, root=ROOT.gROOT.GetVersion(), algorithm=algorithm)
+    baseline = os.path.join(HERE, f'treeCachePerfStats.{algorithm}.baseline.json')
+    regressions = check_baseline(metrics, baseline, tolerances,
+                                 higher_is_better=[m for m in metrics
+                                                   if m.endswith(('.efficiency', '.miss_efficiency',
+                                                                  '.call_reduction'))])
+    for regression in regressions:
+        print(f'TTreeCache regression: {regression}')
+    for error in errors:
+        print(f'ERROR: {error}')
+    return 1 if regressions or errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -171,10 +171,27 @@ perftrack: $(ROOTTEST_LOC)scripts/pt_collector $(ROOTTEST_LOC)scripts/ptpreload.
           CALLROOTEXE="$< "$(ROOTTEST_LOC)" root.exe"
 
 # For now logs.tar.gz is a phony target
+# perftrack.tar.gz is assembled from one gzipped tar part per directory, kept
+# in perftrack.parts between invocations. A part is rebuilt only when one of its
+# files changed or its list of files did, so the cost scales with the changed
+# tests. The parts are written without the end-of-archive blocks (two blocks of
+# 512 bytes with a blocking factor of 1), which are appended once at the end;
+# concatenated gzip members form a valid gzip file.
+PERFTRACK_FILES = -name 'pt_*.root' -o -name 'pt_*.gif' -o -name pt_index.html -o -name perftrack_history.root
 perftrack.tar.gz: $(ROOTTEST_LOC)scripts/pt_createIndex_C.so
-	$(CMDECHO) rm -f perftrack.tar perftrack.tar.gz; touch perftrack.tar ; \
-                $(CALLROOTEXEBUILD) -b -l -q $(ROOTTEST_LOC)/scripts/pt_createIndex.C+ ; \
-		find . -type f -name 'pt_*.root' -o -name 'pt_*.gif' -o -name pt_index.html | xargs -I{}  tar --transform=s/pt_index.html/index.html/ -u -f perftrack.tar "{}" ; gzip  perftrack.tar
+	$(CMDECHO) $(CALLROOTEXEBUILD) -b -l -q $(ROOTTEST_LOC)/scripts/pt_createIndex.C+ ; \
+		mkdir -p perftrack.parts ; rm -f perftrack.parts.list ; \
+		for dir in `find . -path ./perftrack.parts -prune -o -type f \( $(PERFTRACK_FILES) \) -print | xargs -n1 dirname | sort -u` ; do \
+		   part=perftrack.parts/`echo $$dir | sed -e 's,^\./,,' -e 's,^\.$$,top,' -e 's,/,__,g'` ; \
+		   echo $$part.tar.gz >> perftrack.parts.list ; \
+		   files=`find $$dir -maxdepth 1 -type f \( $(PERFTRACK_FILES) \) | sort` ; \
+		   if [ "$$files" != "`cat $$part.files 2>/dev/null`" ] || [ -n "`find $$files -newer $$part.tar.gz 2>/dev/null`" ] ; then \
+		      tar --transform=s/pt_index.html/index.html/ -b 1 -c -f - $$files | head -c -1024 | gzip > $$part.tar.gz ; \
+		      echo "$$files" > $$part.files ; \
+		   fi ; \
+		done ; \
+		find perftrack.parts -name '*.tar.gz' | grep -v -x -F -f perftrack.parts.list | sed -e 's,\.tar\.gz$$,,' | xargs -I{} rm -f {}.tar.gz {}.files ; \
+		( cat `cat perftrack.parts.list` ; head -c 1024 /dev/zero | gzip ) > perftrack.tar.gz
 
 #	$(CMDECHO) cd $(ROOTTEST_LOC) && find . -type f -name 'pt_*.root' | xargs -I{} bash -c 'mkdir -p $(ROOTTEST_LOC)/../perftrack/`dirname "{}"` && cp "{}" "$(ROOTTEST_LOC)/../perftrack/{}"' || true
 #	$(CMDECHO) cd $(ROOTTEST_LOC) && find . -type f -name 'pt_*.gif'  | xargs -I{} bash -c 'mkdir -p $(ROOTTEST_LOC)/../perftrack/`dirname "{}"` && cp "{}" "$(ROOTTEST_LOC)/../perftrack/{}"' || true
@@ -0,0 +1,338 @@
+"""Local stand-in for the remote file servers used by the I/O tests.
+
+Serves the files of a directory over HTTP/1.1, with the features TWebFile and
+TDavixFile rely on (HEAD, single and multi-range GET requests, keep-alive) and
+with configurable network conditions, so that remote reading, TTreeCache and
+prefetching can be tested and benchmarked without network access:
+
+  --latency SECONDS     delay before answering each request
+  --bandwidth BYTES/S   throughput of each connection
+  --ranges MODE         answer to requests with several byte ranges:
+                          multi  multipart/byteranges response (default)
+                          first  only the first range
+                          none   ignore Range headers, send the whole file
+
+The server counts the requests and bytes it serves; the counters are
+available as JSON at /_fileserver/stats (add ?reset=1 to clear them).
+
+Usage:
+  fileserver.py serve [options]           serve until killed; the first line
+                                          on stdout is the URL of the server
+  fileserver.py run [options] -- CMD...   run CMD with the URL of a server
+                                          in ROOTTEST_FILESERVER_URL and
+                                          return its exit code
+
+From Python, FileServer runs the server in a subprocess, so that clients
+holding the GIL (PyROOT) do not block it:
+
+  with FileServer(directory, latency=0.01) as server:
+      f = ROOT.TFile.Open(server.url("file.root"))
+"""
+
+import argparse
+import http.server
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+STATS_PATH = '/_fileserver/stats'
+CHUNK_SIZE = 16 * 1024
+
+
+def parse_ranges(header, size):
+    """
+    Parse the value of a Range header into a list of (first, last) byte
+    positions, both included. Returns None if the header is not a valid
+    bytes range, an empty list if no range can be satisfied.
+    """
+    match = re.match(r'^\s*bytes\s*=\s*(.+)$', header)
+    if not match:
+        return None
+    ranges = []
+    for spec in match.group(1).split(','):
+        spec = spec.strip()
+        first, sep, last = spec.partition('-')
+        if not sep:
+            return None
+        try:
+            if not first:
+                # suffix range: the last N bytes
+                length = int(last)
+                first, last = max(0, size - length), size - 1
+            else:
+                first = int(first)
+                last = min(int(last), size - 1) if last else size - 1
+        except ValueError:
+            return None
+        if first <= last and first < size:
+            ranges.append((first, last))
+    return ranges
+
+
+class Stats:
+    """Request and byte counters, shared by the handler threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = 0
+        self.heads = 0
+        self.ranges = 0
+        self.bytes = 0
+        self.files = {}
+
+    def record(self, method, path, nranges, nbytes):
+        with self.lock:
+            self.requests += 1
+            self.heads += method == 'HEAD'
+            self.ranges += nranges
+            self.bytes += nbytes
+            f = self.files.setdefault(path, {'requests': 0, 'ranges': 0, 'bytes': 0})
+            f['requests'] += 1
+            f['ranges'] += nranges
+            f['bytes'] += nbytes
+
+    def as_dict(self):
+        with self.lock:
+            return {'requests': self.requests, 'heads': self.heads, 'ranges': self.ranges,
+                    'bytes': self.bytes, 'files': dict(self.files)}
+
+
+class ThrottledHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_HEAD(self):
+        self.serve(head=True)
+
+    def do_GET(self):
+        if self.path.split('?')[0] == STATS_PATH:
+            self.send_stats()
+        else:
+            self.serve(head=False)
+
+    def send_stats(self):
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        body = json.dumps(self.server.stats.as_dict()).encode()
+        if query.get('reset') == ['1']:
+            with self.server.stats.lock:
+                self.server.stats.reset()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def translate_path(self):
+        path = urllib.parse.unquote(urllib.parse.urlsplit(self.path).path)
+        parts = [p for p in path.split('/') if p and p not in ('.', '..')]
+        return os.path.join(self.server.root, *parts)
+
+    def serve(self, head):
+        time.sleep(self.server.latency)
+        filename = self.translate_path()
+        if not os.path.isfile(filename):
+            self.send_error(404)
+            return
+        size = os.path.getsize(filename)
+
+        ranges = None
+        if self.server.ranges != 'none' and 'Range' in self.headers:
+            ranges = parse_ranges(self.headers['Range'], size)
+            if ranges == []:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            if ranges and self.server.ranges == 'first':
+                ranges = ranges[:1]
+
+        with open(filename, 'rb') as f:
+            if not ranges:
+                self.send_response(200)
+                self.send_header('Content-Length', str(size))
+                self.send_header('Accept-Ranges', 'none' if self.server.ranges == 'none' else 'bytes')
+                parts = [(None, 0, size)]
+            elif len(ranges) == 1:
+                first, last = ranges[0]
+                self.send_response(206)
+                self.send_header('Content-Range', f'bytes {first}-{last}/{size}')
+                self.send_header('Content-Length', str(last - first + 1))
+                parts = [(None, first, last - first + 1)]
+            else:
+                boundary = 'roottest_fileserver_boundary'
+                parts = []
+                for first, last in ranges:
+                    header = (f'\r\n--{boundary}\r\nContent-Type: application/octet-stream\r\n'
+                              f'Content-Range: bytes {first}-{last}/{size}\r\n\r\n').encode()
+                    parts.append((header, first, last - first + 1))
+                trailer = f'\r\n--{boundary}--\r\n'.encode()
+                length = sum(len(h) + n for h, _, n in parts) + len(trailer)
+                self.send_response(206)
+                self.send_header('Content-Type', f'multipart/byteranges; boundary={boundary}')
+                self.send_header('Content-Length', str(length))
+                parts.append((trailer, 0, 0))
+            self.end_headers()
+            # Counted before sending, so that a client sees its own requests
+            self.server.stats.record(self.command, urllib.parse.urlsplit(self.path).path,
+                                     len(ranges) if ranges else 0, 0 if head else sum(n for _, _, n in parts))
+            if head:
+                return
+
+            throttle = Throttle(self.server.bandwidth)
+            for header, first, length in parts:
+                if header:
+                    self.wfile.write(header)
+                    throttle.sent(len(header))
+                f.seek(first)
+                while length > 0:
+                    chunk = f.read(min(CHUNK_SIZE, length))
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    throttle.sent(len(chunk))
+                    length -= len(chunk)
+
+
+class Throttle:
+    """Sleep as needed to keep the bytes sent below a bandwidth."""
+
+    def __init__(self, bandwidth):
+        self.bandwidth = bandwidth
+        self.start = time.perf_counter()
+        self.total = 0
+
+    def sent(self, nbytes):
+        if not self.bandwidth:
+            return
+        self.total += nbytes
+        delay = self.start + self.total / self.bandwidth - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class ThrottledServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, root, host='127.0.0.1', port=0, latency=0., bandwidth=None, ranges='multi',
+                 verbose=False):
+        super().__init__((host, port), ThrottledHandler)
+        self.root = os.path.abspath(root)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.ranges = ranges
+        self.verbose = verbose
+        self.stats = Stats()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+class FileServer:
+    """A file server running in a subprocess, see the module documentation."""
+
+    def __init__(self, root, latency=0., bandwidth=None, ranges='multi', host='127.0.0.1'):
+        self.options = server_options(root, latency, bandwidth, ranges, host)
+        self.proc = None
+        self.base_url = None
+
+    def start(self):
+        self.proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), 'serve'] + self.options,
+                                     stdout=subprocess.PIPE, universal_newlines=True)
+        self.base_url = self.proc.stdout.readline().strip()
+        if not self.base_url:
+            self.proc.wait()
+            raise RuntimeError('The file server did not start')
+        return self
+
+    def stop(self):
+        if self.proc:
+            self.proc.terminate()
+            self.proc.wait()
+            self.proc.stdout.close()
+            self.proc = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def url(self, path=''):
+        return f'{self.base_url}/{path.lstrip("/")}'
+
+    def stats(self, reset=False):
+        """The counters of the server, cleared afterwards if reset is set."""
+        with urllib.request.urlopen(self.url(STATS_PATH) + ('?reset=1' if reset else '')) as response:
+            return json.load(response)
+
+    def reset_stats(self):
+        self.stats(reset=True)
+
+
+def server_options(root, latency, bandwidth, ranges, host):
+    options = ['--root', root, '--latency', str(latency), '--ranges', ranges, '--host', host]
+    if bandwidth:
+        options += ['--bandwidth', str(bandwidth)]
+    return options
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('command', choices=['serve', 'run'])
+    parser.add_argument('--root', default='.', help='directory to serve (default: current directory)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0, help='port to listen on (default: any free port)')
+    parser.add_argument('--latency', type=float, default=0., help='seconds before answering each request')
+    parser.add_argument('--bandwidth', type=float, default=None, help='bytes per second for each connection')
+    parser.add_argument('--ranges', choices=['multi', 'first', 'none'], default='multi',
+                        help='answer to multi-range requests')
+    parser.add_argument('--stats', help='(run) write the counters of the server as JSON to this file')
+    parser.add_argument('--verbose', action='store_true', help='log every request on stderr')
+    # Everything after -- is the command of `run`
+    argv, cmd = sys.argv[1:], []
+    if '--' in argv:
+        argv, cmd = argv[:argv.index('--')], argv[argv.index('--') + 1:]
+    args = parser.parse_args(argv)
+
+    server = ThrottledServer(args.root, args.host, args.port, args.latency, args.bandwidth, args.ranges,
+                             args.verbose)
+    if args.command == 'serve':
+        print(server.url, flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if not cmd:
+        parser.error('run needs a command after --')
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    env = dict(os.environ, ROOTTEST_FILESERVER_URL=server.url)
+    try:
+        returncode = subprocess.call(cmd, env=env)
+    finally:
+        server.shutdown()
+        if args.stats:
+            with open(args.stats, 'w') as f:
+                json.dump(server.stats.as_dict(), f, indent=1)
+    return returncode
+
+
+if __name__ == '__main__':
+    sys.exit(main())